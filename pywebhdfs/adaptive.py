@@ -0,0 +1,138 @@
+"""
+Adaptive concurrency for parallel client features
+
+An AdaptiveLimiter can be passed wherever a parallel feature takes a
+fixed concurrency (the bulk operations, status_many, glob, du) or thread
+count (read_array):
+
+    >>> limiter = AdaptiveLimiter(initial=4, maximum=64,
+    >>>                           target_latency=0.2, metrics=metrics)
+    >>> hdfs.delete_many(paths, concurrency=limiter)
+
+It adjusts the number of calls in flight the way TCP adjusts its window
+(additive increase, multiplicative decrease): every call that completes
+within target_latency grows the limit by 1/limit, i.e. by about one per
+round of calls, and a call that is slower, or fails with
+errors.RetriableException (HTTP 503 included), multiplies it by backoff,
+at most once per round trip so that one slow round does not collapse the
+limit. Other errors leave it unchanged. The limit is reported as the
+<name>_limit gauge, the calls in flight as <name>_in_flight.
+
+The limiter can be shared by threads and Tornado coroutines; calls wait
+for a free slot in acquire() (threads) or by polling try_acquire()
+(coroutines).
+"""
+import threading
+import time
+from functools import wraps
+
+from pywebhdfs import errors
+
+
+OVERLOAD_ERRORS = (errors.RetriableException,)
+
+
+class AdaptiveLimiter(object):
+    """
+    AIMD limit of concurrent calls between minimum and maximum
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=64,
+                 target_latency=0.25, backoff=0.5, metrics=None,
+                 name='adaptive_concurrency'):
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError('expected 1 <= minimum <= initial <= maximum')
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.metrics = metrics
+        self.name = name
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._decreased_at = 0.0
+        self._condition = threading.Condition()
+        self._report()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def try_acquire(self):
+        """
+        take a slot if one is free, returns the start time of the call to
+        pass to release() or None
+        """
+        with self._condition:
+            if self._in_flight >= int(self._limit):
+                return None
+            self._in_flight += 1
+            return time.time()
+
+    def acquire(self):
+        """
+        wait for a free slot, returns the start time of the call
+        """
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+            return time.time()
+
+    def release(self, started, error=None):
+        """
+        free the slot of a call started at started, adjusting the limit by
+        its latency and error
+        """
+        now = time.time()
+        latency = now - started
+        with self._condition:
+            self._in_flight -= 1
+            if isinstance(error, OVERLOAD_ERRORS) or \
+                    latency > self.target_latency:
+                # one decrease per round trip: calls started before the
+                # last decrease saw the old limit
+                if started >= self._decreased_at:
+                    self._limit = max(float(self.minimum),
+                                      self._limit * self.backoff)
+                    self._decreased_at = now
+            elif error is None:
+                self._limit = min(float(self.maximum),
+                                  self._limit + 1.0 / self._limit)
+            self._condition.notify_all()
+        self._report()
+
+    def wrap(self, function):
+        """
+        function running every call in a slot of the limiter, for threads
+        """
+        @wraps(function)
+        def limited(*args, **kwargs):
+            started = self.acquire()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                self.release(started, e)
+                raise
+            self.release(started)
+            return result
+        return limited
+
+    def _report(self):
+        if self.metrics is not None:
+            self.metrics.set_gauge(self.name + '_limit', self.limit)
+            self.metrics.set_gauge(self.name + '_in_flight', self._in_flight)
+
+
+def pool_size(concurrency, tasks):
+    """
+    threads needed to run tasks with concurrency, an int or an
+    AdaptiveLimiter
+    """
+    if isinstance(concurrency, AdaptiveLimiter):
+        concurrency = concurrency.maximum
+    return min(concurrency, tasks)
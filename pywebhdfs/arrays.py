@@ -0,0 +1,104 @@
+"""
+Loading fixed-width binary records from HDFS into NumPy arrays
+
+read_array() sizes the destination from GETFILESTATUS, preallocates the
+array and fills its memory directly with parallel ranged reads, so the
+file is never held in a separate bytes object:
+
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', user_name='hdfs')
+    >>> features = hdfs.read_array('user/hdfs/features.bin', dtype='<f4',
+    >>>                            shape=(-1, 128), threads=8)
+
+The ranges are cut on record boundaries. Records are the rows of the
+array, i.e. everything but its first dimension.
+
+NumPy is an optional dependency, only needed by this module.
+"""
+from multiprocessing.pool import ThreadPool
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pywebhdfs import adaptive, errors
+
+
+DEFAULT_THREADS = 4
+# bytes fetched by a single ranged read
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+
+
+def record_ranges(count, record_size, part_size):
+    """
+    (offset, length) byte ranges covering count records of record_size
+    bytes, each close to part_size bytes and holding whole records
+    """
+    records_per_part = max(1, part_size // record_size)
+    return [(first * record_size,
+             min(records_per_part, count - first) * record_size)
+            for first in xrange(0, count, records_per_part)]
+
+
+def read_array(hdfs, path, dtype, shape=None, offset=0,
+               threads=DEFAULT_THREADS, part_size=DEFAULT_PART_SIZE):
+    """
+    read a file of fixed-width binary records into a new array
+
+    shape defaults to a one dimensional array of every item in the file.
+    A first dimension of -1 (or None) is derived from the file length; a
+    file that does not hold a whole number of records raises ValueError.
+    offset skips a header at the start of the file. threads may be a
+    pywebhdfs.adaptive.AdaptiveLimiter.
+    """
+    if numpy is None:
+        raise ImportError('read_array requires numpy')
+    dtype = numpy.dtype(dtype)
+    shape = tuple(shape) if shape is not None else (-1,)
+    record_size = dtype.itemsize * int(numpy.prod(shape[1:]))
+
+    length = hdfs.get_file_dir_status(path)['FileStatus']['length']
+    available = length - offset
+    if shape[0] in (-1, None):
+        count, remainder = divmod(available, record_size)
+        if remainder:
+            raise ValueError(
+                '{0} bytes of {1} are not a whole number of {2} byte '
+                'records'.format(available, path, record_size))
+        shape = (count,) + shape[1:]
+    else:
+        count = shape[0]
+        if count * record_size > available:
+            raise ValueError(
+                '{0} holds {1} bytes, {2} are needed for shape {3}'.format(
+                    path, available, count * record_size, shape))
+
+    array = numpy.empty(shape, dtype)
+    # the array's memory as flat bytes, ranged reads land right in it
+    target = array.reshape(-1).view(numpy.uint8)
+
+    def fill(byte_range):
+        start, size = byte_range
+        received = hdfs.read_into(path, target[start:start + size],
+                                  offset + start)
+        if received != size:
+            raise errors.PyWebHdfsException(
+                msg='short read of {0} at offset {1}: {2} of {3} '
+                    'bytes'.format(path, offset + start, received, size))
+
+    ranges = record_ranges(count, record_size, part_size)
+    if isinstance(threads, adaptive.AdaptiveLimiter):
+        fill = threads.wrap(fill)
+    threads = adaptive.pool_size(threads, len(ranges))
+    if threads <= 1:
+        for byte_range in ranges:
+            fill(byte_range)
+        return array
+
+    pool = ThreadPool(threads)
+    try:
+        pool.map(fill, ranges)
+    finally:
+        pool.terminate()
+        pool.join()
+    return array
@@ -0,0 +1,519 @@
+"""
+Reproducible benchmarks for the pywebhdfs clients
+
+The suites run offline against pywebhdfs.fakehdfs.FakeWebHdfsServer and
+write their results as JSON so that runs of different releases can be
+compared:
+
+    python -m pywebhdfs.benchmark --output 0.2.3.json
+    python -m pywebhdfs.benchmark --output new.json --compare 0.2.3.json
+
+Every result records ops/sec, p50/p99 latency in milliseconds, bytes/sec
+for data transfers and the process high-water RSS after the benchmark.
+The fake server runs in the benchmark process, so the memory figures
+include it and are only comparable between runs of this harness.
+"""
+from __future__ import absolute_import
+
+import argparse
+import httplib
+import json
+import platform
+import resource
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from tornado import gen, ioloop
+
+from pywebhdfs import operations, protocol
+from pywebhdfs.fakehdfs import FakeWebHdfsServer
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+DEFAULT_ITERATIONS = 200
+DEFAULT_PAYLOAD_SIZES = (64 * 1024, 1024 * 1024, 16 * 1024 * 1024)
+DEFAULT_CONCURRENCY = (1, 4, 8)
+
+SUITES = OrderedDict()
+
+
+def suite(name):
+    """
+    decorator registering a benchmark suite, a function taking a
+    BenchmarkContext and returning a list of results
+    """
+    def register(func):
+        SUITES[name] = func
+        return func
+    return register
+
+
+class BenchmarkContext(object):
+    """
+    Configuration and fixtures shared by the benchmark suites
+    """
+
+    def __init__(self, server, iterations=DEFAULT_ITERATIONS,
+                 payload_sizes=DEFAULT_PAYLOAD_SIZES,
+                 concurrency=DEFAULT_CONCURRENCY):
+        self.server = server
+        self.iterations = iterations
+        self.payload_sizes = payload_sizes
+        self.concurrency = concurrency
+        self.io_loop = ioloop.IOLoop.current()
+
+    def sync_client(self, **kwargs):
+        return PyWebHdfsClient(user_name='bench',
+                               **dict(self.server.client_kwargs(), **kwargs))
+
+    def tornado_client(self, **kwargs):
+        return TornadoPyWebHdfsClient(
+            user_name='bench', **dict(self.server.client_kwargs(), **kwargs))
+
+
+def percentile(samples, fraction):
+    """
+    nearest-rank percentile of the samples
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = int(round(fraction * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def make_result(name, latencies, elapsed, bytes_per_call=0, **extra):
+    """
+    summarize the per-call latencies (seconds) of a benchmark that took
+    elapsed seconds of wall time
+    """
+    calls = len(latencies)
+    result = OrderedDict([
+        ('name', name),
+        ('calls', calls),
+        ('seconds', elapsed),
+        ('ops_per_sec', calls / elapsed if elapsed else None),
+        ('p50_ms', _ms(percentile(latencies, 0.5))),
+        ('p99_ms', _ms(percentile(latencies, 0.99))),
+        ('bytes_per_sec',
+         calls * bytes_per_call / elapsed if bytes_per_call and elapsed
+         else None),
+        ('maxrss_kb', max_rss_kb())
+    ])
+    result.update(extra)
+    return result
+
+
+def measure(name, call, iterations, concurrency=1, bytes_per_call=0,
+            **extra):
+    """
+    run call(i) for every i in range(iterations) on concurrency threads
+    """
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(iterations))
+
+    def worker():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            start = time.time()
+            call(index)
+            elapsed = time.time() - start
+            with lock:
+                latencies.append(elapsed)
+
+    start = time.time()
+    if concurrency == 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker)
+                   for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.time() - start
+    return make_result(name, latencies, elapsed, bytes_per_call,
+                       concurrency=concurrency, **extra)
+
+
+def measure_batched(name, call, calls, batch=1000, **extra):
+    """
+    measure() for calls too cheap to time one at a time, the latency
+    samples are per-call averages over batches of calls
+    """
+    latencies = []
+    start = time.time()
+    for first in range(0, calls, batch):
+        last = min(first + batch, calls)
+        batch_start = time.time()
+        for index in xrange(first, last):
+            call(index)
+        latencies.append((time.time() - batch_start) / (last - first))
+    elapsed = time.time() - start
+    result = make_result(name, latencies, elapsed, **extra)
+    result['calls'] = calls
+    result['ops_per_sec'] = calls / elapsed if elapsed else None
+    return result
+
+
+def measure_async(context, name, call, iterations, concurrency=1,
+                  bytes_per_call=0, **extra):
+    """
+    run the coroutine call(i) for every i in range(iterations) with at
+    most concurrency calls in flight on the context's IOLoop
+    """
+    latencies = []
+    counter = iter(range(iterations))
+
+    @gen.coroutine
+    def worker():
+        for index in counter:
+            start = time.time()
+            yield call(index)
+            latencies.append(time.time() - start)
+
+    @gen.coroutine
+    def run():
+        yield [worker() for _ in range(concurrency)]
+
+    start = time.time()
+    context.io_loop.run_sync(run)
+    elapsed = time.time() - start
+    return make_result(name, latencies, elapsed, bytes_per_call,
+                       concurrency=concurrency, **extra)
+
+
+def max_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on OS X and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        rss //= 1024
+    return rss
+
+
+def _ms(seconds):
+    return seconds * 1000.0 if seconds is not None else None
+
+
+def _operations(prefix, payload):
+    """
+    (name, setup, call) for every client operation, setup runs on a
+    synchronous client before timing and call receives the client under
+    test and the iteration number
+    """
+    def create_files(name):
+        def setup(hdfs, iterations):
+            for i in range(iterations):
+                hdfs.create_file('{0}/{1}/{2}'.format(prefix, name, i),
+                                 payload, overwrite=True)
+        return setup
+
+    def create_file(name):
+        def setup(hdfs, iterations):
+            hdfs.create_file('{0}/{1}'.format(prefix, name), payload,
+                             overwrite=True)
+        return setup
+
+    def list_setup(hdfs, iterations):
+        for i in range(10):
+            hdfs.create_file('{0}/list/{1}'.format(prefix, i), payload,
+                             overwrite=True)
+
+    def no_setup(hdfs, iterations):
+        pass
+
+    return [
+        ('create_file', no_setup,
+         lambda hdfs, i: hdfs.create_file(
+             '{0}/create/{1}'.format(prefix, i), payload, overwrite=True)),
+        ('append_file', create_file('append'),
+         lambda hdfs, i: hdfs.append_file(
+             '{0}/append'.format(prefix), payload)),
+        ('read_file', create_file('read'),
+         lambda hdfs, i: hdfs.read_file('{0}/read'.format(prefix))),
+        ('make_dir', no_setup,
+         lambda hdfs, i: hdfs.make_dir('{0}/mkdir/{1}'.format(prefix, i))),
+        ('rename_file_dir', create_files('rename'),
+         lambda hdfs, i: hdfs.rename_file_dir(
+             '{0}/rename/{1}'.format(prefix, i),
+             '/{0}/rename/renamed-{1}'.format(prefix, i))),
+        ('delete_file_dir', create_files('delete'),
+         lambda hdfs, i: hdfs.delete_file_dir(
+             '{0}/delete/{1}'.format(prefix, i))),
+        ('get_file_dir_status', create_file('status'),
+         lambda hdfs, i: hdfs.get_file_dir_status(
+             '{0}/status'.format(prefix))),
+        ('list_dir', list_setup,
+         lambda hdfs, i: hdfs.list_dir('{0}/list'.format(prefix))),
+        ('set_owner', create_file('owner'),
+         lambda hdfs, i: hdfs.set_owner(
+             '{0}/owner'.format(prefix), 'bench', 'bench')),
+        ('get_acl_status', create_file('acl'),
+         lambda hdfs, i: hdfs.get_acl_status('{0}/acl'.format(prefix)))
+    ]
+
+
+@suite('operations')
+def operation_benchmarks(context):
+    """
+    ops/sec and latency of every method of both clients with a small
+    payload and a single caller
+    """
+    payload = 'x' * 1024
+    setup_client = context.sync_client()
+    results = []
+    for kind, hdfs in (('sync', context.sync_client()),
+                       ('tornado', context.tornado_client())):
+        prefix = 'bench/operations/{0}'.format(kind)
+        for name, setup, call in _operations(prefix, payload):
+            if not hasattr(hdfs, name):
+                continue
+            setup(setup_client, context.iterations)
+            result_name = '{0}.{1}'.format(kind, name)
+            if kind == 'sync':
+                results.append(measure(
+                    result_name, lambda i: call(hdfs, i),
+                    context.iterations))
+            else:
+                results.append(measure_async(
+                    context, result_name, lambda i: call(hdfs, i),
+                    context.iterations))
+        setup_client.delete_file_dir(prefix, recursive=True)
+    return results
+
+
+@suite('throughput')
+def throughput_benchmarks(context):
+    """
+    read and write throughput of both clients across payload sizes and
+    concurrency levels
+    """
+    setup_client = context.sync_client()
+    results = []
+    for size in context.payload_sizes:
+        payload = 'x' * size
+        for concurrency in context.concurrency:
+            calls = max(concurrency * 2, min(context.iterations,
+                                             (64 * 1024 * 1024) // size))
+            for kind, hdfs in (('sync', context.sync_client()),
+                               ('tornado', context.tornado_client())):
+                prefix = 'bench/throughput/{0}'.format(kind)
+                path = prefix + '/{0}'
+                extra = dict(payload_bytes=size)
+
+                def write(i):
+                    return hdfs.create_file(path.format(i), payload,
+                                            overwrite=True)
+
+                def read(i):
+                    return hdfs.read_file(path.format(i))
+
+                for direction, call in (('write', write), ('read', read)):
+                    name = '{0}.{1}.{2}b.c{3}'.format(kind, direction, size,
+                                                      concurrency)
+                    if kind == 'sync':
+                        results.append(measure(
+                            name, call, calls, concurrency, size, **extra))
+                    else:
+                        results.append(measure_async(
+                            context, name, call, calls, concurrency, size,
+                            **extra))
+                setup_client.delete_file_dir(prefix, recursive=True)
+    return results
+
+
+# canned answers driving a protocol Call through every state of its
+# operation without any I/O
+_CORE_NAMENODE_REDIRECT = protocol.Response(
+    httplib.TEMPORARY_REDIRECT,
+    {'location': 'http://datanode:50075/webhdfs/v1/user/hdfs/bench'}, '')
+_CORE_RESPONSES = {
+    protocol.RESULT_TRUE: '{"boolean": true}',
+    protocol.RESULT_JSON: '{"FileStatus": {"length": 1024, "type": "FILE"}}',
+    protocol.RESULT_BODY: 'x' * 1024
+}
+
+
+@suite('core')
+def core_benchmarks(context):
+    """
+    per-call overhead of the sans-IO protocol core shared by both clients:
+    building the URI, headers and redirect request and parsing the result
+    of every operation, with canned responses instead of a server
+    """
+    core = protocol.WebHdfsProtocol('http://namenode:50070/webhdfs/v1/',
+                                    'hdfs')
+    calls = context.iterations * 50
+    results = []
+
+    for operation, spec in sorted(protocol.SPECS.items()):
+        final = protocol.Response(spec.expected_status, {},
+                                  _CORE_RESPONSES[spec.result])
+
+        def call(i, operation=operation, spec=spec, final=final):
+            state = core.call(operation, 'user/hdfs/bench', 'x' * 16)
+            with state:
+                state.start()
+                if spec.redirect is not protocol.NO_REDIRECT:
+                    state.receive(_CORE_NAMENODE_REDIRECT)
+                state.receive(final)
+        results.append(measure_batched('core.{0}'.format(operation.lower()),
+                                       call, calls))
+    return results
+
+
+def _legacy_create_uri(base_uri, user_name, path, operation, **kwargs):
+    """
+    the URI builder of pywebhdfs 0.2.3 and earlier, kept as the baseline of
+    the 'uri' suite
+    """
+    auth_param = str()
+    if user_name:
+        auth_param = '&user.name={user_name}'.format(user_name=user_name)
+    keyword_params = str()
+    for key in kwargs:
+        keyword_params = '{params}&{key}={value}'.format(
+            params=keyword_params, key=key, value=str(kwargs[key]).lower())
+    return '{base_uri}{path}{operation}{keyword_args}{auth}'.format(
+        base_uri=base_uri, path=path,
+        operation='?op={operation}'.format(operation=operation),
+        keyword_args=keyword_params, auth=auth_param)
+
+
+@suite('uri')
+def uri_benchmarks(context):
+    """
+    request URI building as done by a metadata crawl: a million calls (at
+    the default iterations) over a working set of a thousand paths,
+    against the 0.2.3 builder
+    """
+    base_uri = 'http://namenode:50070/webhdfs/v1/'
+    core = protocol.WebHdfsProtocol(base_uri, 'hdfs')
+    paths = ['user/hdfs/warehouse/table/dt=2015-01-{0:02d}/part-{1:05d}'
+             .format(i % 31, i) for i in range(1000)]
+    calls = context.iterations * 5000
+    results = []
+    for label, params in (('', {}),
+                          ('.params', {'offset': 1024, 'length': 4096,
+                                       'overwrite': True})):
+        results.append(measure_batched(
+            'uri.legacy' + label,
+            lambda i: _legacy_create_uri(base_uri, 'hdfs', paths[i % 1000],
+                                         operations.LISTSTATUS, **params),
+            calls))
+        results.append(measure_batched(
+            'uri.create_uri' + label,
+            lambda i: core.create_uri(paths[i % 1000], operations.LISTSTATUS,
+                                      params),
+            calls))
+    return results
+
+
+def run(suites=None, iterations=DEFAULT_ITERATIONS,
+        payload_sizes=DEFAULT_PAYLOAD_SIZES, concurrency=DEFAULT_CONCURRENCY,
+        latency=0.0, bandwidth=None):
+    """
+    run the named suites (all by default) and return the JSON document
+    """
+    report = OrderedDict([
+        ('python', platform.python_version()),
+        ('platform', platform.platform()),
+        ('timestamp', time.time()),
+        ('config', OrderedDict([
+            ('iterations', iterations),
+            ('payload_sizes', list(payload_sizes)),
+            ('concurrency', list(concurrency)),
+            ('latency', latency),
+            ('bandwidth', bandwidth)
+        ])),
+        ('results', [])
+    ])
+    with FakeWebHdfsServer(latency=latency, bandwidth=bandwidth) as server:
+        context = BenchmarkContext(server, iterations, payload_sizes,
+                                   concurrency)
+        for name in suites or SUITES:
+            report['results'].extend(SUITES[name](context))
+    return report
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    returns a description of every result of current that is more than
+    threshold (a fraction) slower than the same result in baseline
+    """
+    previous = dict((result['name'], result)
+                    for result in baseline['results'])
+    regressions = []
+    for result in current['results']:
+        old = previous.get(result['name'])
+        if old is None:
+            continue
+        if old['ops_per_sec'] and result['ops_per_sec'] is not None and \
+                result['ops_per_sec'] < old['ops_per_sec'] * (1 - threshold):
+            regressions.append('{0}: ops/sec {1:.1f} -> {2:.1f}'.format(
+                result['name'], old['ops_per_sec'], result['ops_per_sec']))
+        if old['p99_ms'] and result['p99_ms'] is not None and \
+                result['p99_ms'] > old['p99_ms'] * (1 + threshold):
+            regressions.append('{0}: p99 {1:.2f}ms -> {2:.2f}ms'.format(
+                result['name'], old['p99_ms'], result['p99_ms']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the pywebhdfs clients against a local '
+                    'WebHDFS stand-in')
+    parser.add_argument('--suite', action='append', choices=list(SUITES),
+                        help='suite to run, may be repeated (default: all)')
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--payload-size', type=int, action='append',
+                        dest='payload_sizes',
+                        help='payload size in bytes for the throughput '
+                             'suite, may be repeated')
+    parser.add_argument('--concurrency', type=int, action='append',
+                        help='concurrency level for the throughput suite, '
+                             'may be repeated')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the fake server delays each request')
+    parser.add_argument('--bandwidth', type=int, default=None,
+                        help='bytes/sec limit of each fake data transfer')
+    parser.add_argument('--output', help='write the JSON report to a file')
+    parser.add_argument('--compare',
+                        help='JSON report of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='fraction a result may regress before it is '
+                             'reported (default: 0.1)')
+    args = parser.parse_args(argv)
+
+    report = run(suites=args.suite, iterations=args.iterations,
+                 payload_sizes=args.payload_sizes or DEFAULT_PAYLOAD_SIZES,
+                 concurrency=args.concurrency or DEFAULT_CONCURRENCY,
+                 latency=args.latency, bandwidth=args.bandwidth)
+
+    document = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(document + '\n')
+    else:
+        print(document)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(baseline, report, args.threshold)
+        for regression in regressions:
+            sys.stderr.write('REGRESSION {0}\n'.format(regression))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
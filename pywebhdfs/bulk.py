@@ -0,0 +1,290 @@
+"""
+Bulk namespace operations
+
+The *_many methods of the clients run one call per path with at most
+concurrency calls in flight and return a BulkResult per input item, in
+input order. A failing path does not stop the batch, its exception is
+returned in the BulkResult instead:
+
+    >>> results = hdfs.delete_many(expired_paths, recursive=True,
+    >>>                            concurrency=32)
+    >>> failed = [r for r in results if not r.ok]
+
+Redundant work is skipped before anything is sent. Repeated items are
+called once, make_dirs_many skips directories created as the parent of
+another directory of the batch and a recursive delete_many skips paths
+below another path of the batch. Skipped items share the BulkResult of
+the call that covers them. status_many lists a directory once rather
+than getting the status of many of its children, see StatusLookup.
+"""
+from collections import OrderedDict, namedtuple
+from multiprocessing.pool import ThreadPool
+
+from pywebhdfs import adaptive, errors, operations
+from pywebhdfs.protocol import normalize_path
+
+
+DEFAULT_CONCURRENCY = 16
+# requested children of one directory from which status_many considers
+# listing the directory instead of asking for each child's status, and the
+# share of the directory's children they must make up for it to be listed
+LIST_THRESHOLD = 8
+LIST_RATIO = 0.1
+
+
+class BulkResult(namedtuple('BulkResult', 'path result error')):
+    """
+    Outcome of one item of a bulk call: the result of the call, or the
+    exception it raised in error
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class Batch(object):
+    """
+    The unique calls needed for a list of items
+
+    tasks are the items to actually call, results() maps their outcomes
+    back to every input item. key identifies repeated items, cover(keys)
+    returns {key: covering key} for items made redundant by another item.
+    """
+
+    def __init__(self, items, key=None, cover=None):
+        self.items = list(items)
+        keys = [key(item) if key is not None else item
+                for item in self.items]
+        covered = cover(set(keys)) if cover is not None else {}
+
+        self.tasks = []
+        positions = {}
+        for item, item_key in zip(self.items, keys):
+            if item_key not in covered and item_key not in positions:
+                positions[item_key] = len(self.tasks)
+                self.tasks.append(item)
+        self._task_of = [positions[covered.get(item_key, item_key)]
+                         for item_key in keys]
+
+    def results(self, outcomes, name=None):
+        """
+        BulkResults of the items from the (result, error) outcomes of
+        tasks, name turns an item into the path reported for it
+        """
+        return [BulkResult(name(item) if name is not None else item,
+                           *outcomes[task])
+                for item, task in zip(self.items, self._task_of)]
+
+
+def _ancestors(path):
+    while path != '/':
+        path = path.rsplit('/', 1)[0] or '/'
+        yield path
+
+
+def _covered_by_descendant(paths):
+    """
+    directories created implicitly by MKDIRS of a deeper path of the batch
+    """
+    covered = {}
+    for path in paths:
+        for ancestor in _ancestors(path):
+            if ancestor in paths and ancestor not in covered:
+                covered[ancestor] = path
+    # a covering path can itself be covered by a deeper one
+    for ancestor, path in covered.items():
+        while path in covered:
+            path = covered[path]
+        covered[ancestor] = path
+    return covered
+
+
+def _covered_by_ancestor(paths):
+    """
+    paths removed by the recursive delete of an ancestor in the batch
+    """
+    covered = {}
+    for path in paths:
+        top = None
+        for ancestor in _ancestors(path):
+            if ancestor in paths:
+                top = ancestor
+        if top is not None:
+            covered[path] = top
+    return covered
+
+
+def path_batch(paths):
+    return Batch(paths, normalize_path)
+
+
+class StatusLookup(object):
+    """
+    Plans the calls answering the status of many paths
+
+    Paths are grouped by parent directory and answered by a GETFILESTATUS
+    per path, or by a single LISTSTATUS of the parent. The listing costs
+    one namenode call however many children are requested, but transfers
+    the status of every child of the directory: listing 8 children of a
+    directory of a million files is far worse than asking for them one by
+    one. A group of at least list_threshold paths first gets the status of
+    its parent (from the metadata cache when the client has one) and the
+    parent is listed when the group makes up at least list_ratio of its
+    childrenNum. list_ratio=None lists every group of list_threshold paths
+    without that extra call, list_threshold=None always uses GETFILESTATUS.
+
+    tasks are (operation, path) calls to run, resolve() consumes their
+    (result, error) outcomes and returns the calls still needed: the
+    listings or statuses decided from the parents' status, and the
+    children of a directory that could not be listed (other than because
+    it does not exist) retried with GETFILESTATUS. outcomes then holds a
+    (result, error) per path shaped like get_file_dir_status.
+    """
+
+    def __init__(self, paths, list_threshold=LIST_THRESHOLD,
+                 list_ratio=LIST_RATIO):
+        self.paths = list(paths)
+        self.list_ratio = list_ratio
+        self.outcomes = [None] * len(self.paths)
+        groups = OrderedDict()
+        for index, path in enumerate(self.paths):
+            path = normalize_path(path)
+            if path == '/':
+                groups[(path, None)] = [(index, path)]
+                continue
+            parent, name = path.rsplit('/', 1)
+            groups.setdefault((parent or '/', True), []).append(
+                (index, name))
+
+        self.tasks = []
+        self._members = {}
+        # parents whose status decides how their requested children are
+        # looked up, and those children
+        self._sizing = {}
+        for (parent, children), members in groups.items():
+            if not children or list_threshold is None or \
+                    len(members) < list_threshold:
+                self.tasks.extend(self._statuses(members))
+            elif list_ratio is None:
+                self.tasks.append(self._add(operations.LISTSTATUS, parent,
+                                            members))
+            else:
+                # a parent may be requested itself, its status is shared
+                task = (operations.GETFILESTATUS, parent.lstrip('/') or '/')
+                if task not in self._members:
+                    self.tasks.append(task)
+                self._sizing[task] = (parent, members)
+
+    def _add(self, operation, path, members):
+        # clients take paths without the leading slash
+        task = (operation, path.lstrip('/') if operation ==
+                operations.LISTSTATUS else path)
+        self._members[task] = members
+        return task
+
+    def _statuses(self, members):
+        tasks = []
+        for index, _ in members:
+            task = self._add(operations.GETFILESTATUS, self.paths[index],
+                             [(index, None)])
+            if task not in self._sizing:
+                tasks.append(task)
+        return tasks
+
+    def resolve(self, tasks, outcomes):
+        retry = []
+        for task, (result, error) in zip(tasks, outcomes):
+            if task in self._sizing:
+                retry.extend(self._sized(task, result, error))
+            members = self._members.pop(task, None)
+            if members is None:
+                continue
+            if task[0] == operations.GETFILESTATUS:
+                self.outcomes[members[0][0]] = (result, error)
+            elif error is None:
+                self._split_listing(task[1], members, result)
+            elif isinstance(error, errors.FileNotFound):
+                for index, _ in members:
+                    self.outcomes[index] = (None, error)
+            else:
+                for index, _ in members:
+                    fallback = (operations.GETFILESTATUS, self.paths[index])
+                    self._members[fallback] = [(index, None)]
+                    retry.append(fallback)
+        return retry
+
+    def _sized(self, task, result, error):
+        """
+        the calls looking up the children of a parent, from the parent's
+        status
+        """
+        parent, members = self._sizing.pop(task)
+        if isinstance(error, errors.FileNotFound):
+            for index, _ in members:
+                self.outcomes[index] = (None, error)
+            return []
+        status = result['FileStatus'] if error is None else {}
+        children = status.get('childrenNum')
+        if status.get('type') == 'DIRECTORY' and \
+                (children is None or
+                 len(members) >= self.list_ratio * children):
+            return [self._add(operations.LISTSTATUS, parent, members)]
+        return self._statuses(members)
+
+    def _split_listing(self, parent, members, listing):
+        # names of the listing are unicode, requested names UTF-8
+        children = dict((status['pathSuffix'].encode('utf-8'), status)
+                        for status in listing['FileStatuses']['FileStatus'])
+        for index, name in members:
+            status = children.get(name)
+            if status is None:
+                self.outcomes[index] = (None, errors.FileNotFound(
+                    msg='File does not exist: /{0}/{1}'.format(
+                        parent, name).replace('//', '/')))
+            else:
+                status = dict(status)
+                status['pathSuffix'] = ''
+                self.outcomes[index] = ({'FileStatus': status}, None)
+
+
+def make_dirs_batch(paths):
+    return Batch(paths, normalize_path, _covered_by_descendant)
+
+
+def delete_batch(paths, recursive):
+    return Batch(paths, normalize_path,
+                 _covered_by_ancestor if recursive else None)
+
+
+def rename_batch(pairs):
+    return Batch(pairs, lambda pair: (normalize_path(pair[0]),
+                                      normalize_path(pair[1])))
+
+
+def run(function, tasks, concurrency=DEFAULT_CONCURRENCY):
+    """
+    (result, error) of function(task) for every task, from at most
+    concurrency threads, or as many as a pywebhdfs.adaptive.AdaptiveLimiter
+    allows
+    """
+    if isinstance(concurrency, adaptive.AdaptiveLimiter):
+        function = concurrency.wrap(function)
+
+    def attempt(task):
+        try:
+            return function(task), None
+        except Exception as e:
+            return None, e
+
+    threads = adaptive.pool_size(concurrency, len(tasks))
+    if threads <= 1:
+        return [attempt(task) for task in tasks]
+    pool = ThreadPool(threads)
+    try:
+        return pool.map(attempt, tasks, chunksize=1)
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,307 @@
+"""
+Local disk cache of HDFS file contents
+
+ContentCache keeps copies of HDFS files in a local directory so that
+repeated reads of the same reference data skip the cluster:
+
+    >>> cache = ContentCache('/var/cache/pywebhdfs', max_bytes=10 * 2 ** 30,
+    >>>                      ttl=300)
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', user_name='hdfs',
+    >>>                        content_cache=cache)
+    >>> hdfs.read_file('user/hdfs/reference/geo.csv')   # cached from now on
+    >>> geo = cache.mmap(hdfs, 'user/hdfs/reference/geo.csv')
+
+An entry is keyed by the client's namenode and user and the file's path,
+length and modificationTime. A cached copy is served without contacting the cluster for ttl seconds
+after it was last validated; after that (or always, with ttl=None) a
+GETFILESTATUS decides whether it is still current. Creates, appends,
+renames and deletes made through the client drop the entries of their
+paths; entries below a renamed or deleted directory are left to expire.
+
+The directory can be shared by every process on a host. Entries are
+written to a temporary file and renamed into place, a per-entry lock
+file (removed once the download is done) keeps processes from
+downloading the same file twice, and readers
+holding an open file or mmap keep their copy when it is replaced or
+evicted. Entries are evicted least recently used first once the cached
+bytes exceed max_bytes.
+"""
+import errno
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from pywebhdfs import errors
+
+
+DATA_SUFFIX = '.data'
+META_SUFFIX = '.meta'
+LOCK_SUFFIX = '.lock'
+
+
+class ContentCache(object):
+    """
+    Size bounded, cross-process cache of HDFS file contents in directory
+    """
+
+    def __init__(self, directory, max_bytes, ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def read(self, hdfs, path):
+        """
+        returns the content of path, from the cache when it is current
+        """
+        with self.open(hdfs, path) as cached:
+            return cached.read()
+
+    def mmap(self, hdfs, path):
+        """
+        returns a read-only mmap of the cached copy of path, an empty string
+        for empty files (which cannot be mapped)
+        """
+        with self.open(hdfs, path) as cached:
+            if os.fstat(cached.fileno()).st_size == 0:
+                return ''
+            return mmap.mmap(cached.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def open(self, hdfs, path):
+        """
+        returns the cached copy of path opened for reading, downloading it
+        first if it is missing or stale
+        """
+        key = self._key(hdfs, path)
+        meta = self._load_meta(key)
+        if meta is not None and not self._expired(meta):
+            cached = self._open_data(meta)
+            if cached is not None:
+                return self._hit(cached, meta)
+
+        status = hdfs.get_file_dir_status(path)['FileStatus']
+        if meta is not None and self._matches(meta, status):
+            cached = self._open_data(meta)
+            if cached is not None:
+                meta['validated'] = time.time()
+                self._store_meta(key, meta)
+                return self._hit(cached, meta)
+
+        with self._locked(key):
+            # another process may have downloaded it while we waited
+            meta = self._load_meta(key)
+            if meta is not None and self._matches(meta, status):
+                cached = self._open_data(meta)
+                if cached is not None:
+                    return self._hit(cached, meta)
+            meta = self._populate(hdfs, path, key, status)
+            cached = open(self._data_path(meta), 'rb')
+
+        with self._lock:
+            self.misses += 1
+        self.evict()
+        return cached
+
+    def invalidate(self, hdfs, path):
+        """
+        drop the cached copy of path
+        """
+        key = self._key(hdfs, path)
+        meta = self._load_meta(key)
+        _remove(self._meta_path(key))
+        if meta is not None:
+            _remove(self._data_path(meta))
+
+    def evict(self):
+        """
+        remove least recently used entries until the cache holds at most
+        max_bytes
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(DATA_SUFFIX):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            _remove(os.path.join(self.directory, name))
+            _remove(os.path.join(self.directory,
+                                 name.split('-', 1)[0] + META_SUFFIX))
+            total -= size
+        return total
+
+    def stats(self):
+        """
+        hit, miss and bytes saved counters of this process
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'bytes_saved': self.bytes_saved}
+
+    def _hit(self, cached, meta):
+        # the data file's mtime doubles as its last use for LRU eviction
+        try:
+            os.utime(self._data_path(meta), None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += meta['length']
+        return cached
+
+    def _populate(self, hdfs, path, key, status):
+        meta = {
+            'path': path,
+            'length': status['length'],
+            'modificationTime': status['modificationTime'],
+            'file': '{0}-{1}-{2}{3}'.format(
+                key, status['length'], status['modificationTime'],
+                DATA_SUFFIX)
+        }
+        fd, temp = tempfile.mkstemp(dir=self.directory, prefix='.download-')
+        try:
+            with os.fdopen(fd, 'wb') as local:
+                stream = hdfs.read_stream(path, codec=None)
+                try:
+                    shutil.copyfileobj(stream, local, 1024 * 1024)
+                finally:
+                    stream.close()
+                size = local.tell()
+            if size != status['length']:
+                raise errors.PyWebHdfsException(
+                    msg='{0} changed while it was cached: {1} of {2} '
+                        'bytes'.format(path, size, status['length']))
+            os.rename(temp, self._data_path(meta))
+        except BaseException:
+            _remove(temp)
+            raise
+
+        previous = self._load_meta(key)
+        meta['validated'] = time.time()
+        self._store_meta(key, meta)
+        if previous is not None and previous['file'] != meta['file']:
+            _remove(self._data_path(previous))
+        return meta
+
+    def _expired(self, meta):
+        return self.ttl is None or \
+            time.time() - meta.get('validated', 0) > self.ttl
+
+    @staticmethod
+    def _matches(meta, status):
+        return meta['length'] == status['length'] and \
+            meta['modificationTime'] == status['modificationTime']
+
+    def _open_data(self, meta):
+        try:
+            return open(self._data_path(meta), 'rb')
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+    def _load_meta(self, key):
+        try:
+            with open(self._meta_path(key)) as meta:
+                return json.load(meta)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        except ValueError:
+            # written by a process that died half way, treat as missing
+            pass
+        return None
+
+    def _store_meta(self, key, meta):
+        fd, temp = tempfile.mkstemp(dir=self.directory, prefix='.meta-')
+        with os.fdopen(fd, 'w') as out:
+            json.dump(meta, out)
+        os.rename(temp, self._meta_path(key))
+
+    def _locked(self, key):
+        return _FileLock(os.path.join(self.directory, key + LOCK_SUFFIX))
+
+    @staticmethod
+    def _key(hdfs, path):
+        # the same path on another namenode, or readable by another user,
+        # is another file
+        return hashlib.sha1(' '.join(
+            _encode(part) for part in (hdfs.base_uri, hdfs.user_name or '',
+                                       '/' + path.lstrip('/')))).hexdigest()
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, key + META_SUFFIX)
+
+    def _data_path(self, meta):
+        return os.path.join(self.directory, meta['file'])
+
+
+def _encode(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+class _FileLock(object):
+    """
+    Exclusive flock on a lock file, held for the duration of a with block
+
+    The lock file is removed when the lock is released. A process that was
+    waiting on the removed file finds it no longer at path once it gets
+    the lock and starts over with the file now there.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        while True:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            try:
+                current = os.stat(self.path).st_ino
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                current = None
+            if current == os.fstat(self._file.fileno()).st_ino:
+                return self
+            self._file.close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _remove(self.path)
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        return False
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
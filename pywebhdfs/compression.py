@@ -0,0 +1,456 @@
+"""
+Streaming compression codecs for HDFS files
+
+Data is compressed and decompressed incrementally while it flows to or
+from the cluster, so neither side ever holds a whole file in memory:
+
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', user_name='hdfs')
+    >>> with open('access.log', 'rb') as log:
+    >>>     hdfs.write_stream('user/hdfs/logs/access.log.gz', log, threads=4)
+    >>> stream = hdfs.read_stream('user/hdfs/logs/access.log.gz')
+    >>> first_kb = stream.read(1024)
+
+The codec is picked from the file extension unless one is named
+explicitly. gzip, bzip2 and deflate use the standard library; zstd needs
+the zstandard package and snappy the python-snappy package. snappy data
+uses the block framing of Hadoop's SnappyCodec so the files can be read
+by MapReduce jobs and `hadoop fs -text`.
+
+Parallel compression splits the input into blocks that are compressed
+independently on a thread pool (zlib, bz2, zstandard and snappy release
+the GIL) and concatenated. The result is a multi-member gzip file, a
+multi-stream bzip2 file and so on, which Hadoop and the readers here
+decompress as a single stream.
+"""
+import bz2
+import struct
+import zlib
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import snappy
+except ImportError:
+    snappy = None
+
+from pywebhdfs import errors
+
+
+# pick the codec from the extension of the HDFS path
+AUTO = 'auto'
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# uncompressed size of the blocks compressed in parallel
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+# Hadoop's io.compression.codec.snappy.buffersize default
+SNAPPY_BLOCK_SIZE = 256 * 1024
+
+
+class Codec(object):
+    """
+    A compression format. compressor() and decompressor() return objects
+    with the compress()/decompress() and flush() methods of zlib's
+    compression objects.
+    """
+
+    name = None
+    extensions = ()
+    # True when independently compressed blocks can be concatenated
+    concatenable = True
+
+    def compressor(self):
+        raise NotImplementedError
+
+    def decompressor(self):
+        raise NotImplementedError
+
+    def compress_block(self, data):
+        """
+        compress data as a complete, self contained stream
+        """
+        compressor = self.compressor()
+        return compressor.compress(data) + compressor.flush()
+
+
+class _Concatenated(object):
+    """
+    Decompressor continuing with a fresh decompression object after the
+    end of every member of concatenated streams
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._current = factory()
+
+    def decompress(self, data):
+        output = []
+        while data:
+            try:
+                output.append(self._current.decompress(data))
+            except EOFError:
+                # bz2 refuses input once its stream has ended
+                self._current = self._factory()
+                continue
+            data = getattr(self._current, 'unused_data', '')
+            if data:
+                self._current = self._factory()
+        return ''.join(output)
+
+    def flush(self):
+        flush = getattr(self._current, 'flush', None)
+        return flush() if flush is not None else ''
+
+
+class GzipCodec(Codec):
+
+    name = 'gzip'
+    extensions = ('.gz',)
+    _wbits = 16 + zlib.MAX_WBITS
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def compressor(self):
+        return zlib.compressobj(self.level, zlib.DEFLATED, self._wbits)
+
+    def decompressor(self):
+        return _Concatenated(lambda: zlib.decompressobj(self._wbits))
+
+
+class DeflateCodec(GzipCodec):
+    """
+    zlib streams as written by Hadoop's DefaultCodec
+    """
+
+    name = 'deflate'
+    extensions = ('.deflate',)
+    concatenable = False
+    _wbits = zlib.MAX_WBITS
+
+
+class Bzip2Codec(Codec):
+
+    name = 'bzip2'
+    extensions = ('.bz2',)
+
+    def __init__(self, level=9):
+        self.level = level
+
+    def compressor(self):
+        return bz2.BZ2Compressor(self.level)
+
+    def decompressor(self):
+        return _Concatenated(bz2.BZ2Decompressor)
+
+
+class ZstdCodec(Codec):
+
+    name = 'zstd'
+    extensions = ('.zst', '.zstd')
+
+    def __init__(self, level=3):
+        self.level = level
+
+    def compressor(self):
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+    def decompressor(self):
+        return _Concatenated(
+            lambda: zstandard.ZstdDecompressor().decompressobj())
+
+    def compress_block(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+
+class _HadoopSnappyCompressor(object):
+    """
+    Hadoop BlockCompressorStream framing: every block is the big endian
+    uncompressed length followed by the length prefixed snappy chunk
+    """
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._pending = []
+        self._pending_size = 0
+
+    def compress(self, data):
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size < self.block_size:
+            return ''
+        data = ''.join(self._pending)
+        full = len(data) - len(data) % self.block_size
+        output = [_snappy_block(data[start:start + self.block_size])
+                  for start in xrange(0, full, self.block_size)]
+        self._pending = [data[full:]]
+        self._pending_size = len(data) - full
+        return ''.join(output)
+
+    def flush(self):
+        data = ''.join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        return _snappy_block(data) if data else ''
+
+
+def _snappy_block(data):
+    compressed = snappy.compress(data)
+    return struct.pack('>II', len(data), len(compressed)) + compressed
+
+
+class _HadoopSnappyDecompressor(object):
+
+    def __init__(self):
+        self._pending = ''
+        # uncompressed bytes still expected from the current block
+        self._remaining = 0
+
+    def decompress(self, data):
+        data = self._pending + data
+        position = 0
+        output = []
+        while len(data) - position >= 4:
+            length, = struct.unpack_from('>I', data, position)
+            if self._remaining == 0:
+                self._remaining = length
+                position += 4
+                continue
+            end = position + 4 + length
+            if end > len(data):
+                break
+            chunk = snappy.decompress(data[position + 4:end])
+            self._remaining -= len(chunk)
+            output.append(chunk)
+            position = end
+        self._pending = data[position:]
+        return ''.join(output)
+
+    def flush(self):
+        if self._pending or self._remaining:
+            raise errors.PyWebHdfsException(msg='truncated snappy stream')
+        return ''
+
+
+class SnappyCodec(Codec):
+
+    name = 'snappy'
+    extensions = ('.snappy',)
+
+    def __init__(self, block_size=SNAPPY_BLOCK_SIZE):
+        self.block_size = block_size
+
+    def compressor(self):
+        return _HadoopSnappyCompressor(self.block_size)
+
+    def decompressor(self):
+        return _HadoopSnappyDecompressor()
+
+
+CODECS = dict((codec.name, codec) for codec in [
+    GzipCodec(), DeflateCodec(), Bzip2Codec(), ZstdCodec(), SnappyCodec()
+])
+
+# the package each optional codec needs
+_DEPENDENCIES = {
+    ZstdCodec.name: ('zstandard', lambda: zstandard),
+    SnappyCodec.name: ('python-snappy', lambda: snappy)
+}
+
+
+def get_codec(name):
+    """
+    returns the codec registered under name, raising ValueError for unknown
+    codecs and for codecs whose optional dependency is not installed
+    """
+    try:
+        codec = CODECS[name]
+    except KeyError:
+        raise ValueError('unknown compression codec {0!r}'.format(name))
+    package, module = _DEPENDENCIES.get(name, (None, lambda: True))
+    if module() is None:
+        raise ValueError('the {0} codec requires the {1} package'.format(
+            name, package))
+    return codec
+
+
+def codec_for_path(path):
+    """
+    returns the codec matching the extension of path, or None
+    """
+    lowered = path.lower()
+    for codec in CODECS.values():
+        for extension in codec.extensions:
+            if lowered.endswith(extension):
+                return get_codec(codec.name)
+    return None
+
+
+def resolve(codec, path):
+    """
+    turns the codec argument of the client methods (AUTO, None, a codec
+    name or a Codec) into a Codec or None
+    """
+    if codec == AUTO:
+        return codec_for_path(path)
+    if codec is None or isinstance(codec, Codec):
+        return codec
+    return get_codec(codec)
+
+
+def compress(data, codec):
+    return resolve(codec, '').compress_block(data)
+
+
+def decompress(data, codec):
+    decompressor = resolve(codec, '').decompressor()
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def _read_blocks(source, size):
+    """
+    split a string or file like object into blocks of at most size bytes
+    """
+    if isinstance(source, basestring):
+        for start in xrange(0, len(source), size):
+            yield source[start:start + size]
+        return
+    while True:
+        block = source.read(size)
+        if not block:
+            return
+        yield block
+
+
+class _ChunkReader(object):
+    """
+    read() on top of a generator of chunks
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._offset = 0
+        self._exhausted = False
+
+    def chunks(self):
+        raise NotImplementedError
+
+    def read(self, size=-1):
+        if not hasattr(self, '_chunks'):
+            self._chunks = self.chunks()
+        if size is None or size < 0:
+            data = self._buffer[self._offset:] + ''.join(self._chunks)
+            self._buffer, self._offset = '', 0
+            return data
+        while len(self._buffer) - self._offset < size and \
+                not self._exhausted:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._exhausted = True
+            else:
+                self._buffer = self._buffer[self._offset:] + chunk
+                self._offset = 0
+        data = self._buffer[self._offset:self._offset + size]
+        self._offset += len(data)
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        pass
+
+
+class DecompressingReader(_ChunkReader):
+    """
+    File like object decompressing the file like object raw as it is read
+    """
+
+    def __init__(self, raw, codec, chunk_size=DEFAULT_CHUNK_SIZE):
+        super(DecompressingReader, self).__init__()
+        self.raw = raw
+        self.codec = codec
+        self.chunk_size = chunk_size
+
+    def chunks(self):
+        """
+        generator of decompressed chunks of varying size
+        """
+        decompressor = self.codec.decompressor()
+        for block in _read_blocks(self.raw, self.chunk_size):
+            data = decompressor.decompress(block)
+            if data:
+                yield data
+        data = decompressor.flush()
+        if data:
+            yield data
+
+    def close(self):
+        close = getattr(self.raw, 'close', None)
+        if close is not None:
+            close()
+
+
+class CompressingReader(_ChunkReader):
+    """
+    File like object compressing a string or file like source as it is
+    read. Iterating over it yields the compressed chunks, which makes it
+    usable as a streamed (chunked) request body.
+
+    With threads > 1 blocks of block_size bytes are compressed in parallel,
+    at most two blocks per thread are held in memory. Codecs that cannot be
+    concatenated (deflate) are always compressed on the calling thread.
+    """
+
+    def __init__(self, source, codec, chunk_size=DEFAULT_CHUNK_SIZE,
+                 threads=None, block_size=DEFAULT_BLOCK_SIZE):
+        super(CompressingReader, self).__init__()
+        self.source = source
+        self.codec = codec
+        self.chunk_size = chunk_size
+        self.threads = threads
+        self.block_size = block_size
+
+    def __iter__(self):
+        return self.chunks()
+
+    def chunks(self):
+        """
+        generator of compressed chunks of varying size
+        """
+        if self.threads and self.threads > 1 and self.codec.concatenable:
+            return self._parallel_chunks()
+        return self._serial_chunks()
+
+    def _serial_chunks(self):
+        compressor = self.codec.compressor()
+        for block in _read_blocks(self.source, self.chunk_size):
+            data = compressor.compress(block)
+            if data:
+                yield data
+        data = compressor.flush()
+        if data:
+            yield data
+
+    def _parallel_chunks(self):
+        pool = ThreadPool(self.threads)
+        pending = deque()
+        try:
+            for block in _read_blocks(self.source, self.block_size):
+                pending.append(
+                    pool.apply_async(self.codec.compress_block, (block,)))
+                if len(pending) >= 2 * self.threads:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+        finally:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,272 @@
+"""
+Packed containers of many small blobs
+
+Millions of tiny files cost the namenode an inode and a block each and
+make every read a namenode call plus a datanode connection. A container
+packs them into one large HDFS file, with a JSON index of the offset and
+length of every member stored next to it (<path>.index):
+
+    >>> with ContainerWriter(hdfs, 'user/hdfs/thumbs.pack') as writer:
+    >>>     for name, data in thumbnails:
+    >>>         writer.add(name, data)
+
+    >>> reader = ContainerReader(hdfs, 'user/hdfs/thumbs.pack')
+    >>> reader.read('cat.jpg')                    # one ranged OPEN
+    >>> reader.read_many(['cat.jpg', 'dog.jpg'])  # {name: data}
+
+The writer buffers members and writes them with create_file, then
+append_file, every buffer_bytes. The index is written last, on close, so
+an index never names data that is not there; a writer left without
+closing leaves a container without index, which cannot be opened.
+
+Readers load an index once and keep it in an IndexCache shared by all
+readers by default, along with the length and modificationTime of the
+data file. Every read checks them against a GETFILESTATUS of the data
+file (served from the client's metadata cache when it has one) so a
+container rewritten by another process is never read with its old index.
+read_many reads the requested members with
+pywebhdfs.vectored: members less than gap bytes apart are read with a
+single ranged OPEN and the merged reads are sent concurrently.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from pywebhdfs import bulk, vectored
+
+
+DEFAULT_BUFFER_BYTES = 8 * 1024 * 1024
+INDEX_VERSION = 1
+
+
+def index_path(path):
+    """
+    HDFS path of the index of the container at path
+    """
+    return path + '.index'
+
+
+class Index(object):
+    """
+    Members of a container: names in the order they were added and the
+    (offset, length) of each
+    """
+
+    def __init__(self, names, ranges):
+        self.names = names
+        self.ranges = ranges
+
+    @property
+    def length(self):
+        """
+        bytes of the data file the members take
+        """
+        return max([offset + length
+                    for offset, length in self.ranges.values()] or [0])
+
+    @classmethod
+    def from_json(cls, document):
+        index = json.loads(document)
+        if index.get('version') != INDEX_VERSION:
+            raise ValueError('unsupported container index version {0}'
+                             .format(index.get('version')))
+        names = [name for name, _, _ in index['members']]
+        ranges = dict((name, (offset, length))
+                      for name, offset, length in index['members'])
+        return cls(names, ranges)
+
+    def to_json(self):
+        return json.dumps({
+            'version': INDEX_VERSION,
+            'members': [[name] + list(self.ranges[name])
+                        for name in self.names]})
+
+
+class IndexCache(object):
+    """
+    Thread safe LRU of the loaded indexes of up to max_entries containers
+
+    An index is stored with the version of its container, the (length,
+    modificationTime) of the data file, and only returned for that version.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, version):
+        with self._lock:
+            entry = self._indexes.pop(path, None)
+            if entry is None or entry[0] != version:
+                return None
+            self._indexes[path] = entry
+            return entry[1]
+
+    def set(self, path, version, index):
+        with self._lock:
+            self._indexes.pop(path, None)
+            self._indexes[path] = (version, index)
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+
+    def discard(self, path):
+        with self._lock:
+            self._indexes.pop(path, None)
+
+
+# shared by the readers and writers not given a cache of their own
+INDEX_CACHE = IndexCache()
+
+
+class ContainerWriter(object):
+    """
+    Packs members into a new container, see the module documentation
+
+    create_kwargs are passed to the create_file of the data file, e.g.
+    overwrite=True. The index is always overwritten.
+    """
+
+    def __init__(self, hdfs, path, buffer_bytes=DEFAULT_BUFFER_BYTES,
+                 index_cache=None, **create_kwargs):
+        self.hdfs = hdfs
+        self.path = path
+        self.buffer_bytes = buffer_bytes
+        self.index_cache = index_cache if index_cache is not None \
+            else INDEX_CACHE
+        self.create_kwargs = create_kwargs
+        self._names = []
+        self._ranges = dict()
+        self._buffer = []
+        self._buffered = 0
+        self._written = 0
+        self._created = False
+        self._closed = False
+
+    def add(self, name, data):
+        """
+        add a member, a byte string (or bytearray), returns its (offset,
+        length) in the container
+        """
+        if self._closed:
+            raise ValueError('container writer is closed')
+        if isinstance(data, bytearray):
+            data = bytes(data)
+        elif not isinstance(data, str):
+            # the length of unicode counts characters, not bytes
+            raise TypeError('container members are byte strings, got {0}'
+                            .format(type(data).__name__))
+        if name in self._ranges:
+            raise ValueError('duplicate container member {0}'.format(name))
+        member = (self._written + self._buffered, len(data))
+        self._names.append(name)
+        self._ranges[name] = member
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.buffer_bytes:
+            self.flush()
+        return member
+
+    def flush(self):
+        """
+        write the buffered members to the data file
+        """
+        if self._created and not self._buffered:
+            return
+        data = ''.join(self._buffer)
+        if self._created:
+            self.hdfs.append_file(self.path, data)
+        else:
+            self.hdfs.create_file(self.path, data, **self.create_kwargs)
+            self._created = True
+        self._written += len(data)
+        self._buffer = []
+        self._buffered = 0
+
+    def close(self):
+        """
+        write the remaining members and the index, returns the Index
+        """
+        index = Index(self._names, self._ranges)
+        if self._closed:
+            return index
+        self.flush()
+        self.hdfs.create_file(index_path(self.path), index.to_json(),
+                              overwrite=True)
+        self.index_cache.discard(self.path)
+        self._closed = True
+        return index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # an interrupted container is left without its index
+        if exc_type is None:
+            self.close()
+        return False
+
+
+class ContainerReader(object):
+    """
+    Reads members of a container, see the module documentation
+    """
+
+    def __init__(self, hdfs, path, index_cache=None,
+                 gap=vectored.DEFAULT_GAP,
+                 concurrency=bulk.DEFAULT_CONCURRENCY):
+        self.hdfs = hdfs
+        self.path = path
+        self.index_cache = index_cache if index_cache is not None \
+            else INDEX_CACHE
+        self.gap = gap
+        self.concurrency = concurrency
+
+    @property
+    def index(self):
+        status = self.hdfs.get_file_dir_status(self.path)['FileStatus']
+        version = (status['length'], status['modificationTime'])
+        index = self.index_cache.get(self.path, version)
+        if index is None:
+            index = Index.from_json(
+                self.hdfs.read_file(index_path(self.path)))
+            if index.length != status['length']:
+                # the data file was rewritten, its index is not yet
+                raise ValueError('index of {0} does not match its data'
+                                 .format(self.path))
+            self.index_cache.set(self.path, version, index)
+        return index
+
+    def names(self):
+        """
+        member names in the order they were added
+        """
+        return list(self.index.names)
+
+    def __contains__(self, name):
+        return name in self.index.ranges
+
+    def __len__(self):
+        return len(self.index.names)
+
+    def read(self, name):
+        """
+        data of a member, KeyError if the container has no such member
+        """
+        offset, length = self.index.ranges[name]
+        if not length:
+            return ''
+        return self.hdfs.read_file(self.path, offset=offset, length=length)
+
+    def read_many(self, names):
+        """
+        {name: data} of the members, nearby members are read together
+        """
+        ranges = self.index.ranges
+        members = list(set(names))
+        views = vectored.read_ranges(
+            self.hdfs, self.path, [ranges[name] for name in members],
+            self.gap, concurrency=self.concurrency,
+            metrics=self.hdfs.metrics)
+        return dict((name, view.tobytes())
+                    for name, view in zip(members, views))
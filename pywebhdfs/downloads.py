@@ -0,0 +1,183 @@
+"""
+Downloading HDFS files to local disk
+
+download() sizes the local file from GETFILESTATUS, preallocates it and
+fetches the file in parts of part_size bytes on parallel ranged reads.
+Each part is streamed: every chunk_size bytes read from the network are
+written at their offset of the local file before the next are read, so
+a thread holds one chunk in memory whatever the part size, and no file
+pointer is shared between threads:
+
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', user_name='hdfs')
+    >>> hdfs.download('user/hdfs/big.parquet', '/data/big.parquet',
+    >>>               threads=8)
+
+The parts written so far are recorded in a sidecar progress file,
+<local_path>.progress, once they are synced to disk. A download that
+was interrupted resumes with the missing parts only, provided the HDFS
+file still has the same length and modification time. The sidecar is
+removed once every part was written and the local file has the size of
+the HDFS file.
+"""
+import json
+import os
+import threading
+
+from pywebhdfs import bulk, compression, errors
+
+
+DEFAULT_THREADS = 4
+# bytes fetched by a single ranged read
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+
+
+def progress_path(local_path):
+    """
+    path of the sidecar recording the progress of a download to local_path
+    """
+    return local_path + '.progress'
+
+
+def parts(length, part_size):
+    """
+    (offset, length) parts of a file of length bytes
+    """
+    return [(offset, min(part_size, length - offset))
+            for offset in xrange(0, length, part_size)]
+
+
+def preallocate(fd, length):
+    """
+    reserve length bytes for the file open as fd, sparsely where the
+    platform cannot allocate them up front
+    """
+    if hasattr(os, 'posix_fallocate'):
+        os.posix_fallocate(fd, 0, length)
+    else:
+        os.ftruncate(fd, length)
+
+
+def write_at(fd, offset, data):
+    """
+    write all of data at offset of the file open as fd, the file's offset
+    is left alone where the platform has pwrite and fd must not be shared
+    between threads where it has not
+    """
+    view = memoryview(data)
+    while len(view):
+        if hasattr(os, 'pwrite'):
+            written = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+
+class Progress(object):
+    """
+    The parts of a download already on disk, kept in the sidecar file
+    """
+
+    def __init__(self, local_path, source):
+        self.path = progress_path(local_path)
+        # identifies the HDFS file and the way it is split
+        self.source = source
+        self.done = set()
+        self._lock = threading.Lock()
+
+    def load(self, local_path):
+        """
+        pick up the parts of an earlier download of the same source, the
+        local file must still have its preallocated size
+        """
+        try:
+            with open(self.path) as sidecar:
+                recorded = json.load(sidecar)
+        except (IOError, ValueError):
+            return
+        if recorded.get('source') != self.source or \
+                not os.path.exists(local_path) or \
+                os.path.getsize(local_path) != self.source['length']:
+            return
+        self.done = set(recorded['done'])
+
+    def add(self, part):
+        with self._lock:
+            self.done.add(part)
+            temporary = self.path + '.tmp'
+            with open(temporary, 'w') as sidecar:
+                json.dump({'source': self.source,
+                           'done': sorted(self.done)}, sidecar)
+            os.rename(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def download(hdfs, path, local_path, threads=DEFAULT_THREADS,
+             part_size=DEFAULT_PART_SIZE, resume=True,
+             chunk_size=compression.DEFAULT_CHUNK_SIZE):
+    """
+    copy the file at path to local_path, returns its length in bytes,
+    see the module documentation
+    """
+    status = hdfs.get_file_dir_status(path)['FileStatus']
+    length = status['length']
+    progress = Progress(local_path, {
+        'path': path, 'length': length,
+        'modificationTime': status.get('modificationTime'),
+        'part_size': part_size})
+    if resume:
+        progress.load(local_path)
+
+    if not progress.done:
+        fd = os.open(local_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                     0o666)
+        try:
+            preallocate(fd, length)
+        finally:
+            os.close(fd)
+
+    pending = [(index, part) for index, part in
+               enumerate(parts(length, part_size))
+               if index not in progress.done]
+
+    def fetch(task):
+        index, (offset, size) = task
+        chunk = bytearray(min(chunk_size, size))
+        view = memoryview(chunk)
+        received = 0
+        stream = hdfs.read_stream(path, codec=None, offset=offset,
+                                  length=size)
+        # a descriptor per part, its file offset is not shared
+        fd = os.open(local_path, os.O_WRONLY)
+        try:
+            while received < size:
+                count = stream.readinto(view[:size - received])
+                if not count:
+                    break
+                write_at(fd, offset + received, view[:count])
+                received += count
+            if received != size:
+                raise errors.PyWebHdfsException(
+                    msg='short read of {0} at offset {1}: {2} of {3} '
+                        'bytes'.format(path, offset, received, size))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+            stream.close()
+        progress.add(index)
+
+    for _, error in bulk.run(fetch, pending, threads):
+        if error is not None:
+            raise error
+
+    size = os.path.getsize(local_path)
+    if size != length:
+        raise errors.PyWebHdfsException(
+            msg='{0} holds {1} bytes, {2} has {3}'.format(
+                local_path, size, path, length))
+    progress.remove()
+    return length
@@ -19,3 +19,11 @@ class FileNotFound(PyWebHdfsException):
 
 class MethodNotAllowed(PyWebHdfsException):
     pass
+
+
+class RetriableException(PyWebHdfsException):
+    """
+    The namenode is overloaded or not ready (HTTP 503 or a RemoteException
+    of class RetriableException), the call may succeed later
+    """
+    pass
@@ -0,0 +1,899 @@
+"""
+A local, in-process stand-in for a WebHDFS cluster
+
+FakeWebHdfsServer runs a namenode endpoint and one or more datanode
+endpoints on localhost, backed by a temporary directory. Data operations
+are answered by the namenode with a 307 redirect to a datanode exactly as
+WebHDFS does, errors are returned as RemoteException JSON documents, and
+latency, bandwidth and faults can be configured to exercise the clients
+and the benchmark harness without a Hadoop installation.
+
+>>> from pywebhdfs.fakehdfs import FakeWebHdfsServer
+>>> from pywebhdfs.webhdfs import PyWebHdfsClient
+>>> with FakeWebHdfsServer() as server:
+>>>     hdfs = PyWebHdfsClient(user_name='hdfs', **server.client_kwargs())
+>>>     hdfs.create_file('user/hdfs/file.txt', 'data')
+>>>     hdfs.read_file('user/hdfs/file.txt', offset=1, length=2)
+'at'
+"""
+import BaseHTTPServer
+import SocketServer
+import errno
+import httplib
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from urllib import quote, unquote
+from urlparse import parse_qsl, urlparse
+
+from pywebhdfs import operations
+
+
+WEBHDFS_PREFIX = '/webhdfs/v1/'
+
+NAMENODE = 'namenode'
+DATANODE = 'datanode'
+
+_CHUNK_SIZE = 64 * 1024
+
+# Java exception classes returned in RemoteException documents and the
+# HTTP status WebHDFS answers them with
+_EXCEPTION_STATUS = {
+    'FileNotFoundException': httplib.NOT_FOUND,
+    'IllegalArgumentException': httplib.BAD_REQUEST,
+    'UnsupportedOperationException': httplib.BAD_REQUEST,
+    'AccessControlException': httplib.FORBIDDEN,
+    'FileAlreadyExistsException': httplib.FORBIDDEN,
+    'PathIsNotEmptyDirectoryException': httplib.FORBIDDEN,
+    'IOException': httplib.INTERNAL_SERVER_ERROR,
+    'RetriableException': httplib.SERVICE_UNAVAILABLE,
+    'StandbyException': httplib.FORBIDDEN
+}
+
+_JAVA_PACKAGES = {
+    'FileNotFoundException': 'java.io',
+    'IOException': 'java.io',
+    'IllegalArgumentException': 'java.lang',
+    'UnsupportedOperationException': 'java.lang',
+    'AccessControlException': 'org.apache.hadoop.security',
+    'FileAlreadyExistsException': 'org.apache.hadoop.fs',
+    'PathIsNotEmptyDirectoryException': 'org.apache.hadoop.fs',
+    'RetriableException': 'org.apache.hadoop.ipc',
+    'StandbyException': 'org.apache.hadoop.ipc'
+}
+
+
+class RemoteException(Exception):
+    """
+    raised by the fake file system to produce a WebHDFS error response
+    """
+
+    def __init__(self, exception, message, status=None):
+        self.exception = exception
+        self.message = message
+        self.status = status or _EXCEPTION_STATUS.get(
+            exception, httplib.INTERNAL_SERVER_ERROR)
+        super(RemoteException, self).__init__(message)
+
+    def to_json(self):
+        return json.dumps({'RemoteException': {
+            'exception': self.exception,
+            'javaClassName': '{0}.{1}'.format(
+                _JAVA_PACKAGES.get(self.exception, 'java.io'),
+                self.exception),
+            'message': self.message}})
+
+
+# exceptions the namenode throws where the local file system fails with
+# errno, anything else is an IOException
+_ERRNO_EXCEPTIONS = {
+    errno.ENOENT: 'FileNotFoundException',
+    errno.EEXIST: 'FileAlreadyExistsException',
+    errno.ENOTDIR: 'FileAlreadyExistsException',
+    errno.EISDIR: 'FileAlreadyExistsException',
+    errno.ENOTEMPTY: 'PathIsNotEmptyDirectoryException',
+    errno.EACCES: 'AccessControlException',
+    errno.EPERM: 'AccessControlException'
+}
+
+
+def _remote_exception(error):
+    """
+    RemoteException for an OSError or IOError of the local file system
+    """
+    return RemoteException(
+        _ERRNO_EXCEPTIONS.get(error.errno, 'IOException'),
+        error.strerror or str(error))
+
+
+class Fault(object):
+    """
+    A fault injected into matching requests
+
+    :param operation: WebHDFS operation to match, None matches all
+    :param role: NAMENODE or DATANODE, None matches both
+    :param datanode: index of the datanode to match, None matches all
+    :param status: HTTP status to fail with, None to only delay
+    :param exception: Java exception class reported in the error body
+    :param delay: seconds to sleep before handling the request
+    :param count: number of requests to affect, None for all
+    """
+
+    def __init__(self, operation=None, role=None, datanode=None,
+                 status=httplib.INTERNAL_SERVER_ERROR, exception='IOException',
+                 delay=0.0, count=1):
+        self.operation = operation
+        self.role = role
+        self.datanode = datanode
+        self.status = status
+        self.exception = exception
+        self.delay = delay
+        self.count = count
+
+    def matches(self, operation, role, datanode):
+        return ((self.operation is None or self.operation == operation) and
+                (self.role is None or self.role == role) and
+                (self.datanode is None or self.datanode == datanode) and
+                (self.count is None or self.count > 0))
+
+
+def _locked(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class FakeFileSystem(object):
+    """
+    HDFS namespace semantics on top of a local directory
+
+    Namespace operations are serialized by a lock, uploaded data is staged
+    outside of it so that slow transfers do not block other requests.
+    """
+
+    def __init__(self, root, staging):
+        self.root = root
+        self.staging = staging
+        self.lock = threading.RLock()
+        self._attributes = dict()
+
+    def local_path(self, path):
+        path = '/' + path.strip('/')
+        local = os.path.normpath(os.path.join(self.root, path.lstrip('/')))
+        if local != self.root and \
+                not local.startswith(self.root + os.sep):
+            raise RemoteException('IllegalArgumentException',
+                                  'Invalid path name {0}'.format(path))
+        return local
+
+    @staticmethod
+    def normalize(path):
+        return '/' + path.strip('/')
+
+    def _require(self, path):
+        local = self.local_path(path)
+        if not os.path.exists(local):
+            raise RemoteException(
+                'FileNotFoundException',
+                'File does not exist: {0}'.format(self.normalize(path)))
+        return local
+
+    @_locked
+    def status(self, path, suffix=''):
+        local = self._require(path)
+        stat = os.stat(local)
+        is_dir = os.path.isdir(local)
+        attributes = self._attributes.get(self.normalize(path), {})
+        return {
+            'accessTime': 0 if is_dir else int(stat.st_atime * 1000),
+            'blockSize': 0 if is_dir else attributes.get('blocksize',
+                                                         134217728),
+            'childrenNum': len(os.listdir(local)) if is_dir else 0,
+            'fileId': stat.st_ino,
+            'group': attributes.get('group', 'supergroup'),
+            'length': 0 if is_dir else stat.st_size,
+            'modificationTime': int(stat.st_mtime * 1000),
+            'owner': attributes.get('owner', 'hdfs'),
+            'pathSuffix': suffix,
+            'permission': attributes.get('permission',
+                                         '755' if is_dir else '644'),
+            'replication': 0 if is_dir else attributes.get('replication', 3),
+            'storagePolicy': 0,
+            'type': 'DIRECTORY' if is_dir else 'FILE'
+        }
+
+    @_locked
+    def list(self, path):
+        local = self._require(path)
+        if not os.path.isdir(local):
+            return [self.status(path)]
+        return [self.status(self.normalize(path) + '/' + name, suffix=name)
+                for name in sorted(os.listdir(local))]
+
+    @_locked
+    def mkdirs(self, path, owner=None, permission=None):
+        local = self.local_path(path)
+        if os.path.isfile(local):
+            raise RemoteException(
+                'FileAlreadyExistsException',
+                'Path is not a directory: {0}'.format(self.normalize(path)))
+        if not os.path.isdir(local):
+            os.makedirs(local)
+            self._set_attributes(path, owner=owner, permission=permission)
+        return True
+
+    def create(self, path, data, overwrite=False, owner=None,
+               permission=None, replication=None, blocksize=None):
+        self._check_create(path, overwrite)
+        staged = self._stage(data)
+        with self.lock:
+            self._check_create(path, overwrite)
+            local = self.local_path(path)
+            parent = os.path.dirname(local)
+            if not os.path.isdir(parent):
+                os.makedirs(parent)
+            shutil.move(staged, local)
+            self._set_attributes(path, owner=owner, permission=permission,
+                                 replication=replication, blocksize=blocksize)
+
+    def append(self, path, data):
+        self._check_append(path)
+        staged = self._stage(data)
+        try:
+            with self.lock:
+                local = self._check_append(path)
+                with open(local, 'ab') as target:
+                    with open(staged, 'rb') as source:
+                        shutil.copyfileobj(source, target)
+        finally:
+            os.remove(staged)
+
+    @_locked
+    def _check_create(self, path, overwrite):
+        local = self.local_path(path)
+        if os.path.isdir(local):
+            raise RemoteException(
+                'FileAlreadyExistsException',
+                '{0} already exists as a directory'.format(
+                    self.normalize(path)))
+        if os.path.exists(local) and not overwrite:
+            raise RemoteException(
+                'FileAlreadyExistsException',
+                '{0} for client already exists'.format(self.normalize(path)))
+
+    @_locked
+    def _check_append(self, path):
+        local = self._require(path)
+        if os.path.isdir(local):
+            raise RemoteException(
+                'FileNotFoundException',
+                'Failed to append to non-existent file {0}'.format(
+                    self.normalize(path)))
+        return local
+
+    def _stage(self, data):
+        handle, staged = tempfile.mkstemp(dir=self.staging)
+        with os.fdopen(handle, 'wb') as target:
+            for chunk in data:
+                target.write(chunk)
+        return staged
+
+    @_locked
+    def open(self, path, offset=0, length=None):
+        """
+        returns the size of the requested range and a file object
+        positioned at its start
+        """
+        local = self._require(path)
+        if os.path.isdir(local):
+            raise RemoteException(
+                'FileNotFoundException',
+                'Path is not a file: {0}'.format(self.normalize(path)))
+        size = os.path.getsize(local)
+        if offset < 0 or offset > size:
+            raise RemoteException(
+                'IOException',
+                'Offset={0} out of the range [0, {1})'.format(offset, size))
+        remaining = size - offset
+        if length is not None:
+            remaining = min(remaining, length)
+        source = open(local, 'rb')
+        source.seek(offset)
+        return remaining, source
+
+    @_locked
+    def rename(self, path, destination):
+        local = self.local_path(path)
+        target = self.local_path(destination)
+        if not os.path.exists(local) or local == self.root:
+            return False
+        if os.path.isdir(target):
+            target = os.path.join(target, os.path.basename(local))
+            destination = self.normalize(destination) + '/' + \
+                os.path.basename(local)
+        if os.path.exists(target) or \
+                not os.path.isdir(os.path.dirname(target)):
+            return False
+        os.rename(local, target)
+        self._move_attributes(path, destination)
+        return True
+
+    @_locked
+    def delete(self, path, recursive=False):
+        local = self.local_path(path)
+        if not os.path.exists(local) or local == self.root:
+            return False
+        if os.path.isdir(local):
+            if os.listdir(local) and not recursive:
+                raise RemoteException(
+                    'PathIsNotEmptyDirectoryException',
+                    '{0} is non empty'.format(self.normalize(path)))
+            shutil.rmtree(local)
+        else:
+            os.remove(local)
+        self._move_attributes(path, None)
+        return True
+
+    @_locked
+    def concat(self, path, sources):
+        target = self._require(path)
+        locals_ = [self._require(source) for source in sources]
+        with open(target, 'ab') as out:
+            for local in locals_:
+                with open(local, 'rb') as source:
+                    shutil.copyfileobj(source, out)
+        for source in sources:
+            self.delete(source)
+
+    @_locked
+    def set_owner(self, path, owner=None, group=None):
+        self._require(path)
+        self._set_attributes(path, owner=owner, group=group)
+
+    @_locked
+    def acl_status(self, path):
+        status = self.status(path)
+        return {'AclStatus': {
+            'entries': [],
+            'group': status['group'],
+            'owner': status['owner'],
+            'permission': status['permission'],
+            'stickyBit': False
+        }}
+
+    @_locked
+    def content_summary(self, path):
+        local = self._require(path)
+        length = files = directories = consumed = 0
+        for directory, names, file_names in os.walk(local):
+            directories += 1
+            for name in file_names:
+                size = os.path.getsize(os.path.join(directory, name))
+                relative = os.path.relpath(os.path.join(directory, name),
+                                           self.root)
+                replication = self._attributes.get(
+                    self.normalize(relative), {}).get('replication', 3)
+                files += 1
+                length += size
+                consumed += size * int(replication)
+        if os.path.isfile(local):
+            files = 1
+            length = os.path.getsize(local)
+            consumed = length * int(self._attributes.get(
+                self.normalize(path), {}).get('replication', 3))
+        attributes = self._attributes.get(self.normalize(path), {})
+        return {
+            'directoryCount': directories,
+            'fileCount': files,
+            'length': length,
+            'quota': attributes.get('quota', -1),
+            'spaceConsumed': consumed,
+            'spaceQuota': attributes.get('spaceQuota', -1),
+            'typeQuota': {}
+        }
+
+    @_locked
+    def quota_usage(self, path):
+        summary = self.content_summary(path)
+        return {
+            'fileAndDirectoryCount': summary['fileCount'] +
+            summary['directoryCount'],
+            'quota': summary['quota'],
+            'spaceConsumed': summary['spaceConsumed'],
+            'spaceQuota': summary['spaceQuota'],
+            'typeQuota': {}
+        }
+
+    @_locked
+    def set_quota(self, path, quota=None, space_quota=None):
+        """
+        namespace and space quota of a directory, reported by content
+        summaries and quota usage
+        """
+        self._require(path)
+        self._set_attributes(path, quota=quota, spaceQuota=space_quota)
+
+    def _set_attributes(self, path, **attributes):
+        entry = self._attributes.setdefault(self.normalize(path), {})
+        for key, value in attributes.items():
+            if value is not None:
+                entry[key] = value
+
+    def _move_attributes(self, path, destination):
+        source = self.normalize(path)
+        for key in list(self._attributes):
+            if key == source or key.startswith(source + '/'):
+                attributes = self._attributes.pop(key)
+                if destination is not None:
+                    moved = self.normalize(destination) + key[len(source):]
+                    self._attributes[moved] = attributes
+
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # clients dropping a keep-alive connection, e.g. after abandoning a
+        # streamed read, are expected and not worth a traceback
+        error = sys.exc_info()[1]
+        if isinstance(error, socket.error) and \
+                error.errno in (errno.EPIPE, errno.ECONNRESET):
+            return
+        BaseHTTPServer.HTTPServer.handle_error(self, request, client_address)
+
+
+class _WebHdfsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Request handler shared by the namenode and datanode endpoints, the
+    server attributes fake, role and index identify the endpoint
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        fake = self.server.fake
+        role = self.server.role
+        body_consumed = [False]
+
+        def body():
+            body_consumed[0] = True
+            return self._read_body(fake.bandwidth)
+
+        try:
+            parsed = urlparse(self.path)
+            if not parsed.path.startswith(WEBHDFS_PREFIX):
+                raise RemoteException('IllegalArgumentException',
+                                      'Unknown path {0}'.format(parsed.path))
+            path = unquote(parsed.path[len(WEBHDFS_PREFIX):])
+            params = dict(parse_qsl(parsed.query, keep_blank_values=True))
+            operation = params.get('op', '').upper()
+            fake.record_call(role, operation)
+            fake.before_request(operation, role, self.server.index)
+
+            handler = fake.handlers(role).get((method, operation))
+            if handler is None:
+                raise RemoteException(
+                    'IllegalArgumentException',
+                    'Invalid value for webhdfs parameter "op": '
+                    'No enum constant {0} for {1}'.format(operation, method))
+            handler(self, path, params, body)
+        except RemoteException as e:
+            self._send_error(e, body_consumed[0])
+        except socket.error:
+            # the connection to the client failed, there is no one to answer
+            raise
+        except EnvironmentError as e:
+            # the local file system refused, e.g. MKDIRS below a file
+            self._send_error(_remote_exception(e), body_consumed[0])
+
+    def _send_error(self, error, body_consumed):
+        if not body_consumed:
+            self._drain_body()
+        self._send(error.status, error.to_json())
+
+    def _read_body(self, bandwidth):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = self._read_chunked()
+        else:
+            chunks = self._read_length(
+                int(self.headers.get('Content-Length') or 0))
+        return _throttle(chunks, bandwidth)
+
+    def _read_length(self, length):
+        while length > 0:
+            chunk = self.rfile.read(min(length, _CHUNK_SIZE))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+    def _read_chunked(self):
+        while True:
+            size = int(self.rfile.readline().split(';')[0].strip(), 16)
+            if size == 0:
+                # trailers end with an empty line
+                while self.rfile.readline().strip():
+                    pass
+                return
+            yield self.rfile.read(size)
+            self.rfile.readline()
+
+    def _drain_body(self):
+        for _ in self._read_body(None):
+            pass
+
+    def _send(self, status, body='', headers=None,
+              content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, document, status=httplib.OK):
+        self._send(status, json.dumps(document))
+
+    def send_file(self, length, source, bandwidth):
+        self.send_response(httplib.OK)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+        try:
+            chunks = _read_chunks(source, length)
+            for chunk in _throttle(chunks, bandwidth):
+                self.wfile.write(chunk)
+        except IOError as e:
+            # the client stopped reading, e.g. a line iterator that found
+            # the end of its split
+            if e.errno not in (errno.EPIPE, errno.ECONNRESET):
+                raise
+            self.close_connection = 1
+        finally:
+            source.close()
+
+    def redirect(self, location):
+        self.send_response(httplib.TEMPORARY_REDIRECT)
+        self.send_header('Location', location)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class FakeWebHdfsServer(object):
+    """
+    Local WebHDFS namenode and datanode endpoints backed by a directory
+
+    :param root: directory backing the namespace, a temporary directory
+    that is removed on stop() when not given
+    :param datanodes: number of datanode endpoints to start
+    :param latency: seconds every request is delayed by
+    :param bandwidth: bytes per second each data transfer is limited to
+    :param host: interface to listen on
+    """
+
+    def __init__(self, root=None, datanodes=1, latency=0.0, bandwidth=None,
+                 host='127.0.0.1'):
+        self._owns_root = root is None
+        self.root = os.path.realpath(root or tempfile.mkdtemp(
+            prefix='fakehdfs-'))
+        self.staging = tempfile.mkdtemp(prefix='fakehdfs-staging-')
+        self.fs = FakeFileSystem(self.root, self.staging)
+        self.datanode_count = datanodes
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.listen_host = host
+        self.calls = Counter()
+        self.faults = []
+        self._servers = []
+        self._threads = []
+        self._lock = threading.Lock()
+        self._next_datanode = 0
+        self._handlers = {
+            NAMENODE: self._namenode_handlers(),
+            DATANODE: self._datanode_handlers()
+        }
+
+    # lifecycle
+
+    def start(self):
+        self._servers.append(self._serve(NAMENODE, 0))
+        for index in range(self.datanode_count):
+            self._servers.append(self._serve(DATANODE, index))
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._servers = []
+        self._threads = []
+        shutil.rmtree(self.staging, ignore_errors=True)
+        if self._owns_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def _serve(self, role, index):
+        server = _ThreadingHTTPServer((self.listen_host, 0), _WebHdfsHandler)
+        server.fake = self
+        server.role = role
+        server.index = index
+        thread = threading.Thread(target=server.serve_forever,
+                                  kwargs={'poll_interval': 0.05},
+                                  name='fakehdfs-{0}-{1}'.format(role, index))
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+        return server
+
+    # addresses
+
+    @property
+    def host(self):
+        return self._servers[0].server_address[0]
+
+    @property
+    def port(self):
+        return str(self._servers[0].server_address[1])
+
+    @property
+    def datanodes(self):
+        """
+        host:port of every datanode endpoint
+        """
+        return ['{0}:{1}'.format(*server.server_address)
+                for server in self._servers[1:]]
+
+    def client_kwargs(self):
+        """
+        keyword arguments pointing a PyWebHdfsClient at this server
+        """
+        return {'host': self.host, 'port': self.port}
+
+    # instrumentation
+
+    def inject_fault(self, **kwargs):
+        """
+        add a Fault, see Fault for the accepted keyword arguments
+        """
+        fault = Fault(**kwargs)
+        with self._lock:
+            self.faults.append(fault)
+        return fault
+
+    def clear_faults(self):
+        with self._lock:
+            self.faults = []
+
+    def record_call(self, role, operation):
+        with self._lock:
+            self.calls[(role, operation)] += 1
+
+    def call_count(self, operation, role=NAMENODE):
+        with self._lock:
+            return self.calls[(role, operation)]
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+
+    def before_request(self, operation, role, index):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            fault = next((f for f in self.faults
+                          if f.matches(operation, role, index)), None)
+            if fault is not None and fault.count is not None:
+                fault.count -= 1
+        if fault is None:
+            return
+        if fault.delay:
+            time.sleep(fault.delay)
+        if fault.status is not None:
+            raise RemoteException(
+                fault.exception,
+                'Injected fault for {0} on {1} {2}'.format(operation, role,
+                                                           index),
+                status=fault.status)
+
+    # request handling
+
+    def handlers(self, role):
+        return self._handlers[role]
+
+    def _namenode_handlers(self):
+        return {
+            ('GET', operations.OPEN): self._redirect,
+            ('GET', operations.GETFILESTATUS): self._get_file_status,
+            ('GET', operations.LISTSTATUS): self._list_status,
+            ('GET', operations.GETACLSTATUS): self._get_acl_status,
+            ('GET', operations.GETCONTENTSUMMARY): self._get_content_summary,
+            ('GET', operations.GETQUOTAUSAGE): self._get_quota_usage,
+            ('PUT', operations.CREATE): self._redirect,
+            ('PUT', operations.MKDIRS): self._mkdirs,
+            ('PUT', operations.RENAME): self._rename,
+            ('PUT', operations.SETOWNER): self._set_owner,
+            ('POST', operations.APPEND): self._redirect,
+            ('POST', operations.CONCAT): self._concat,
+            ('DELETE', operations.DELETE): self._delete
+        }
+
+    def _datanode_handlers(self):
+        return {
+            ('GET', operations.OPEN): self._open,
+            ('PUT', operations.CREATE): self._create,
+            ('POST', operations.APPEND): self._append
+        }
+
+    def choose_datanode(self, params):
+        """
+        next datanode in turn, skipping those listed in excludedatanodes
+        unless that leaves none
+        """
+        excluded = set(params.get('excludedatanodes', '').split(','))
+        candidates = [datanode for datanode in self.datanodes
+                      if datanode not in excluded] or self.datanodes
+        with self._lock:
+            datanode = candidates[self._next_datanode % len(candidates)]
+            self._next_datanode += 1
+        return datanode
+
+    def datanode_location(self, datanode, path, params):
+        query = '&'.join('{0}={1}'.format(key, quote(value, safe=''))
+                         for key, value in sorted(params.items()))
+        return 'http://{0}{1}{2}?{3}&namenoderpcaddress={4}:{5}'.format(
+            datanode, WEBHDFS_PREFIX, quote(path.lstrip('/')), query,
+            self.host, self.port)
+
+    def _redirect(self, handler, path, params, body):
+        operation = params['op'].upper()
+        if operation != operations.CREATE:
+            self.fs.status(path)
+        datanode = self.choose_datanode(params)
+        noredirect = params.pop('noredirect', 'false').lower() == 'true'
+        location = self.datanode_location(datanode, path, params)
+        if noredirect:
+            handler.send_json({'Location': location})
+        else:
+            handler.redirect(location)
+
+    def _get_file_status(self, handler, path, params, body):
+        status = self.fs.status(path)
+        handler.send_json({'FileStatus': status})
+
+    def _list_status(self, handler, path, params, body):
+        statuses = self.fs.list(path)
+        handler.send_json({'FileStatuses': {'FileStatus': statuses}})
+
+    def _get_acl_status(self, handler, path, params, body):
+        status = self.fs.acl_status(path)
+        handler.send_json(status)
+
+    def _get_content_summary(self, handler, path, params, body):
+        handler.send_json({'ContentSummary': self.fs.content_summary(path)})
+
+    def _get_quota_usage(self, handler, path, params, body):
+        handler.send_json({'QuotaUsage': self.fs.quota_usage(path)})
+
+    def _mkdirs(self, handler, path, params, body):
+        result = self.fs.mkdirs(path, owner=params.get('user.name'),
+                                permission=params.get('permission'))
+        handler.send_json({'boolean': result})
+
+    def _rename(self, handler, path, params, body):
+        result = self.fs.rename(path, params.get('destination', ''))
+        handler.send_json({'boolean': result})
+
+    def _delete(self, handler, path, params, body):
+        recursive = params.get('recursive', 'false').lower() == 'true'
+        result = self.fs.delete(path, recursive=recursive)
+        handler.send_json({'boolean': result})
+
+    def _set_owner(self, handler, path, params, body):
+        self.fs.set_owner(path, owner=params.get('owner'),
+                          group=params.get('group'))
+        handler.send_json({})
+
+    def _concat(self, handler, path, params, body):
+        sources = [source for source in params.get('sources', '').split(',')
+                   if source]
+        if not sources:
+            raise RemoteException('IllegalArgumentException',
+                                  'sources parameter is required')
+        self.fs.concat(path, sources)
+        handler.send_json({})
+
+    def _create(self, handler, path, params, body):
+        overwrite = params.get('overwrite', 'false').lower() == 'true'
+        self.fs.create(path, body(), overwrite=overwrite,
+                       owner=params.get('user.name'),
+                       permission=params.get('permission'),
+                       replication=_int_param(params, 'replication'),
+                       blocksize=_int_param(params, 'blocksize'))
+        location = 'hdfs://{0}:{1}/{2}'.format(self.host, self.port,
+                                               path.lstrip('/'))
+        handler._send(httplib.CREATED, headers={'Location': location})
+
+    def _append(self, handler, path, params, body):
+        self.fs.append(path, body())
+        handler._send(httplib.OK)
+
+    def _open(self, handler, path, params, body):
+        offset = _int_param(params, 'offset') or 0
+        length = _int_param(params, 'length')
+        size, source = self.fs.open(path, offset, length)
+        handler.send_file(size, source, self.bandwidth)
+
+
+def _int_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise RemoteException(
+            'IllegalArgumentException',
+            'Failed to parse "{0}" as a number for {1}'.format(value, name))
+
+
+def _read_chunks(source, length):
+    while length > 0:
+        chunk = source.read(min(length, _CHUNK_SIZE))
+        if not chunk:
+            return
+        length -= len(chunk)
+        yield chunk
+
+
+def _throttle(chunks, bandwidth):
+    """
+    yields the chunks no faster than bandwidth bytes per second
+    """
+    if not bandwidth:
+        for chunk in chunks:
+            yield chunk
+        return
+    start = time.time()
+    transferred = 0
+    for chunk in chunks:
+        yield chunk
+        transferred += len(chunk)
+        delay = transferred / float(bandwidth) - (time.time() - start)
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,245 @@
+"""
+Glob expansion on HDFS
+
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', user_name='hdfs')
+    >>> hdfs.glob('data/2026/*/events/part-*.gz')
+    ['data/2026/01/events/part-00000.gz', ...]
+
+The pattern is walked one path component at a time. Literal components
+are appended to the candidate paths without listing anything, only the
+final ones are checked with GETFILESTATUS. Components with wildcards list
+every candidate directory of their level in parallel and keep the
+matching children, so directories that do not match are never listed.
+
+Components support the Hadoop glob syntax: * and ? (never matching /),
+[abc], [a-z] and [!abc] (or [^abc]) character classes, {a,b} alternatives
+and \\ to escape a special character. Alternatives made of literals only,
+like data/{2025,2026}/, stay literal and are not listed.
+"""
+import re
+from collections import OrderedDict
+
+from pywebhdfs import errors, operations
+
+
+_MAGIC = '*?['
+
+
+def _expand_braces(text):
+    """
+    the alternatives of the {a,b} groups of text, nested groups included
+    """
+    depth = 0
+    start = None
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == '{':
+            if depth == 0:
+                start = index
+            depth += 1
+        elif char == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                prefix = text[:start]
+                suffix = text[index + 1:]
+                return [prefix + expanded
+                        for alternative in _split_alternatives(
+                            text[start + 1:index])
+                        for expanded in _expand_braces(alternative + suffix)]
+        index += 1
+    # no group, or an unbalanced brace which is taken literally
+    return [text]
+
+
+def _split_alternatives(text):
+    alternatives = []
+    depth = 0
+    start = 0
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            alternatives.append(text[start:index])
+            start = index + 1
+        index += 1
+    alternatives.append(text[start:])
+    return alternatives
+
+
+def _has_magic(text):
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char in _MAGIC:
+            return True
+        index += 1
+    return False
+
+
+def _unescape(text):
+    return re.sub(r'\\(.)', r'\1', text)
+
+
+def _translate(text):
+    """
+    regular expression source matching a component pattern
+    """
+    parts = []
+    index = 0
+    length = len(text)
+    while index < length:
+        char = text[index]
+        index += 1
+        if char == '\\' and index < length:
+            parts.append(re.escape(text[index]))
+            index += 1
+        elif char == '*':
+            parts.append('.*')
+        elif char == '?':
+            parts.append('.')
+        elif char == '[':
+            end = index
+            if end < length and text[end] in '!^':
+                end += 1
+            if end < length and text[end] == ']':
+                end += 1
+            while end < length and text[end] != ']':
+                end += 1
+            if end >= length:
+                parts.append('\\[')
+                continue
+            members = text[index:end].replace('\\', '\\\\')
+            if members[0] in '!^':
+                members = '^' + members[1:]
+            parts.append('[' + members + ']')
+            index = end + 1
+        else:
+            parts.append(re.escape(char))
+    return ''.join(parts)
+
+
+class Component(object):
+    """
+    One path component of a pattern: literal names, or a regular
+    expression matched against the names of a listing
+    """
+
+    __slots__ = ('names', 'regex')
+
+    def __init__(self, pattern):
+        alternatives = _expand_braces(pattern)
+        if any(_has_magic(alternative) for alternative in alternatives):
+            self.names = None
+            self.regex = re.compile('(?:{0})\\Z'.format('|'.join(
+                _translate(alternative) for alternative in alternatives)))
+        else:
+            self.names = list(OrderedDict.fromkeys(
+                _unescape(alternative) for alternative in alternatives))
+            self.regex = None
+
+    @property
+    def literal(self):
+        return self.names is not None
+
+
+def _join(directory, name):
+    return directory.rstrip('/') + '/' + name
+
+
+class Glob(object):
+    """
+    Expands a pattern without performing I/O
+
+    tasks are the (operation, path) calls of the first level,
+    resolve(tasks, outcomes) consumes their (result, error) outcomes and
+    returns the calls of the next level, until it returns none and
+    matches holds the sorted matching paths. Paths that do not exist
+    simply do not match, any other error of a call is raised.
+    """
+
+    def __init__(self, pattern):
+        if isinstance(pattern, unicode):
+            pattern = pattern.encode('utf-8')
+        self._absolute = pattern.startswith('/')
+        self.components = [Component(part)
+                           for part in pattern.split('/') if part]
+        self.matches = []
+        self._level = 0
+        self._frontier = ['/']
+        self.tasks = self._next_tasks()
+
+    def _next_tasks(self):
+        """
+        calls of the next level that needs any, after appending literal
+        components to the frontier
+        """
+        components = self.components
+        while self._level < len(components) and \
+                components[self._level].literal:
+            names = components[self._level].names
+            self._frontier = [_join(directory, name)
+                              for directory in self._frontier
+                              for name in names]
+            self._level += 1
+        if not self._frontier:
+            return []
+        if self._level == len(components):
+            # ends in literals (or is the root): only existence is checked
+            return [(operations.GETFILESTATUS, self._client_path(path))
+                    for path in OrderedDict.fromkeys(self._frontier)]
+        return [(operations.LISTSTATUS, self._client_path(path))
+                for path in OrderedDict.fromkeys(self._frontier)]
+
+    @staticmethod
+    def _client_path(path):
+        return path.lstrip('/')
+
+    def resolve(self, tasks, outcomes):
+        found = []
+        for (operation, path), (result, error) in zip(tasks, outcomes):
+            if error is not None:
+                if isinstance(error, errors.FileNotFound):
+                    continue
+                raise error
+            if operation == operations.GETFILESTATUS:
+                found.append('/' + path)
+            else:
+                found.extend(self._matching_children(path, result))
+
+        if tasks[0][0] == operations.GETFILESTATUS or \
+                self._level == len(self.components) - 1:
+            self.matches = sorted(self._result_path(path) for path in found)
+            return []
+        self._frontier = found
+        self._level += 1
+        return self._next_tasks()
+
+    def _matching_children(self, path, listing):
+        component = self.components[self._level]
+        last = self._level == len(self.components) - 1
+        children = []
+        for status in listing['FileStatuses']['FileStatus']:
+            name = status['pathSuffix'].encode('utf-8')
+            # the listing of a file is the file itself, with no name
+            if not name or not component.regex.match(name):
+                continue
+            if last or status['type'] == 'DIRECTORY':
+                children.append(_join('/' + path, name))
+        return children
+
+    def _result_path(self, path):
+        return path if self._absolute else path.lstrip('/')
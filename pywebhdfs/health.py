@@ -0,0 +1,154 @@
+"""
+Per-datanode health tracking and circuit breaking
+
+The namenode redirects data operations (CREATE, APPEND, OPEN) to a
+datanode it picks, and keeps picking a sick one now and then. A
+DatanodeHealth passed to a client as datanode_health= records the
+outcome and latency of every request sent to a datanode and opens the
+circuit of a datanode that fails too often:
+
+    >>> health = DatanodeHealth(error_rate=0.5, slow_latency=5,
+    >>>                         open_seconds=30, timeout=60)
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', user_name='hdfs',
+    >>>                        datanode_health=health)
+
+When a redirect points at a datanode whose circuit is open, the client
+asks the namenode again, listing the datanodes to avoid in the
+excludedatanodes parameter, up to max_redirects times. A CREATE or OPEN
+of an in-memory body that fails on its datanode (a 5xx, a timeout or a
+connection error) is re-requested the same way; appends are never
+repeated since the datanode may have written part of the data.
+
+A datanode's circuit opens once at least min_calls of its last window
+requests were recorded and error_rate of them failed or took longer than
+slow_latency seconds. After open_seconds one request is let through as a
+probe: its success closes the circuit, its failure opens it again. One
+tracker can be shared by any number of clients, threads and coroutines.
+With a metrics registry the number of open circuits is the
+<name>_open_circuits gauge.
+"""
+import threading
+import time
+from collections import deque
+from urlparse import urlparse
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+def datanode_of(location):
+    """
+    host:port of the datanode a redirect Location points at
+    """
+    return urlparse(location).netloc
+
+
+class _Circuit(object):
+
+    __slots__ = ('outcomes', 'state', 'opened_at', 'probing')
+
+    def __init__(self, window):
+        self.outcomes = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+
+
+class DatanodeHealth(object):
+    """
+    Thread safe circuit breakers of the datanodes a client talks to, see
+    the module documentation
+    """
+
+    def __init__(self, window=20, min_calls=4, error_rate=0.5,
+                 slow_latency=None, open_seconds=30.0, timeout=None,
+                 max_redirects=2, metrics=None, name='datanode_health'):
+        if not 0 < error_rate <= 1:
+            raise ValueError('error_rate must be in (0, 1]')
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_latency = slow_latency
+        self.open_seconds = open_seconds
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.metrics = metrics
+        self.name = name
+        self._circuits = dict()
+        self._lock = threading.Lock()
+
+    def state(self, datanode):
+        """
+        CLOSED, OPEN or HALF_OPEN
+        """
+        with self._lock:
+            circuit = self._circuits.get(datanode)
+            return circuit.state if circuit is not None else CLOSED
+
+    def available(self, datanode, probe=True):
+        """
+        whether a request may be sent to the datanode, an open circuit past
+        open_seconds lets a single probe through
+
+        With probe False only tells whether a request would be let through,
+        without taking the probe, for requests that are not sent yet.
+        """
+        with self._lock:
+            circuit = self._circuits.get(datanode)
+            if circuit is None or circuit.state == CLOSED:
+                return True
+            if circuit.state == OPEN and \
+                    time.time() - circuit.opened_at >= self.open_seconds:
+                if not probe:
+                    return True
+                circuit.state = HALF_OPEN
+                circuit.probing = False
+            if circuit.state == HALF_OPEN and not circuit.probing:
+                circuit.probing = probe
+                return True
+            return False
+
+    def excluded(self):
+        """
+        sorted datanodes that requests should avoid
+        """
+        with self._lock:
+            return sorted(datanode for datanode, circuit in
+                          self._circuits.items() if circuit.state != CLOSED)
+
+    def record(self, datanode, latency, failed=False):
+        """
+        record a request to the datanode that took latency seconds
+        """
+        failed = failed or (self.slow_latency is not None and
+                            latency > self.slow_latency)
+        with self._lock:
+            circuit = self._circuits.get(datanode)
+            if circuit is None:
+                circuit = self._circuits[datanode] = _Circuit(self.window)
+            if circuit.state == HALF_OPEN:
+                if failed:
+                    self._open(circuit)
+                else:
+                    circuit.state = CLOSED
+                    circuit.outcomes.clear()
+            else:
+                circuit.outcomes.append(failed)
+                failures = sum(circuit.outcomes)
+                if circuit.state == CLOSED and \
+                        len(circuit.outcomes) >= self.min_calls and \
+                        failures >= self.error_rate * len(circuit.outcomes):
+                    self._open(circuit)
+            open_circuits = sum(1 for c in self._circuits.values()
+                                if c.state != CLOSED)
+        if self.metrics is not None:
+            self.metrics.set_gauge(self.name + '_open_circuits',
+                                   open_circuits)
+
+    def _open(self, circuit):
+        circuit.state = OPEN
+        circuit.opened_at = time.time()
+        circuit.probing = False
+        circuit.outcomes.clear()
@@ -0,0 +1,276 @@
+"""
+Caches for WebHDFS metadata responses
+
+A client configured with metadata_cache= answers GETFILESTATUS,
+LISTSTATUS and GETACLSTATUS calls from the cache while the entry is
+fresh, and drops the affected entries when it changes the namespace
+itself (create, append, mkdirs, rename, delete, set_owner). Changes made
+by other clients are picked up when the entries expire after ttl
+seconds.
+
+Two implementations share the MetadataCache interface:
+
+InMemoryMetadataCache lives in the process, SharedMetadataCache lives in
+a memory mapped file that every process on the host opens, so pre-forked
+workers ask the namenode once instead of once per worker:
+
+    >>> cache = SharedMetadataCache('/dev/shm/pywebhdfs-metadata', ttl=30)
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', user_name='hdfs',
+    >>>                        metadata_cache=cache)
+
+Keys and values are byte strings; the clients store the JSON bodies of
+the responses.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_TTL = 30.0
+
+
+class MetadataCache(object):
+    """
+    Interface of the metadata caches, keys and values are byte strings
+    """
+
+    def get(self, key):
+        """
+        returns the fresh value stored under key or None
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        """
+        store value under key for ttl seconds (the cache default if None)
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class InMemoryMetadataCache(MetadataCache):
+    """
+    Thread safe in-process cache evicting the least recently used entry
+    beyond max_entries
+    """
+
+    def __init__(self, max_entries=10000, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] < time.time():
+                return None
+            # re-inserting moves the entry to the most recently used end
+            self._entries[key] = entry
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_MAGIC = 'PWHMETA1'
+# magic, slots, slot size
+_FILE_HEADER = struct.Struct('<8sII')
+_FILE_HEADER_SIZE = 64
+# sequence, expiry time, key hash, key length, value length
+_SLOT_HEADER = struct.Struct('<IdQHI')
+_SEQUENCE = struct.Struct('<I')
+
+
+class SharedMetadataCache(MetadataCache):
+    """
+    Cache in a memory mapped file shared by every process that opens it
+
+    The file is a fixed size hash table of slots (sparse on disk, pages
+    are only allocated once written). A key may live in any of the probes
+    slots following its hash; when all of them are taken the entry
+    expiring first is replaced. Values that do not fit into a slot are not
+    cached.
+
+    Reads take no lock: every slot carries a sequence number that writers
+    make odd while they modify the slot and even again when done, and a
+    reader retries a slot whose sequence was odd or changed while it was
+    being copied. Writers lock just the slot they write with a byte range
+    lock on the file, so processes never wait for each other on
+    different slots. Byte range locks are held per process, so the
+    threads of one process also take an instance lock while writing.
+    """
+
+    def __init__(self, path, slots=16384, slot_size=8192, probes=8,
+                 ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.probes = probes
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._map = self._open_map(slots, slot_size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        self.slots, self.slot_size = self._read_file_header()
+        self._capacity = self.slot_size - _SLOT_HEADER.size
+
+    def _open_map(self, slots, slot_size):
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size == 0:
+                # first process to open the file lays it out
+                size = _FILE_HEADER_SIZE + slots * slot_size
+                os.ftruncate(self._fd, size)
+                os.write(self._fd, _FILE_HEADER.pack(_MAGIC, slots,
+                                                     slot_size))
+            return mmap.mmap(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _read_file_header(self):
+        magic, slots, slot_size = _FILE_HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            raise ValueError(
+                '{0} is not a pywebhdfs metadata cache'.format(self.path))
+        return slots, slot_size
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def get(self, key):
+        key_hash = _hash(key)
+        now = time.time()
+        for offset in self._probe(key_hash):
+            entry = self._read_slot(offset)
+            if entry is None:
+                continue
+            expires, slot_hash, slot_key, value = entry
+            if slot_hash == key_hash and slot_key == key:
+                return value if expires >= now else None
+        return None
+
+    def set(self, key, value, ttl=None):
+        if len(key) + len(value) > self._capacity:
+            return
+        key_hash = _hash(key)
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        self._write(self._choose_slot(key, key_hash),
+                    (expires, key_hash, key, value))
+
+    def delete(self, key):
+        key_hash = _hash(key)
+        for offset in self._probe(key_hash):
+            entry = self._read_slot(offset)
+            if entry is not None and entry[1] == key_hash and \
+                    entry[2] == key:
+                self._write(offset, None)
+
+    def clear(self):
+        for index in xrange(self.slots):
+            offset = _FILE_HEADER_SIZE + index * self.slot_size
+            if _SEQUENCE.unpack_from(self._map, offset)[0]:
+                self._write(offset, None)
+
+    def _probe(self, key_hash):
+        first = key_hash % self.slots
+        for step in xrange(min(self.probes, self.slots)):
+            yield _FILE_HEADER_SIZE + \
+                ((first + step) % self.slots) * self.slot_size
+
+    def _choose_slot(self, key, key_hash):
+        """
+        the slot already holding key, else a free or expired one, else the
+        one expiring first
+        """
+        now = time.time()
+        candidate = None
+        candidate_expires = None
+        for offset in self._probe(key_hash):
+            entry = self._read_slot(offset)
+            if entry is None:
+                expires = 0.0
+            else:
+                if entry[1] == key_hash and entry[2] == key:
+                    return offset
+                expires = entry[0] if entry[0] >= now else 0.0
+            if candidate is None or expires < candidate_expires:
+                candidate, candidate_expires = offset, expires
+        return candidate
+
+    def _read_slot(self, offset, retries=100):
+        """
+        consistent copy of a slot as (expires, hash, key, value), None for
+        empty slots and slots being written
+        """
+        data = self._map
+        for _ in xrange(retries):
+            sequence, expires, key_hash, key_length, value_length = \
+                _SLOT_HEADER.unpack_from(data, offset)
+            if sequence & 1:
+                continue
+            if expires == 0.0:
+                return None
+            start = offset + _SLOT_HEADER.size
+            if key_length + value_length > self._capacity:
+                continue
+            key = data[start:start + key_length]
+            value = data[start + key_length:
+                         start + key_length + value_length]
+            if _SEQUENCE.unpack_from(data, offset)[0] == sequence:
+                return expires, key_hash, key, value
+        return None
+
+    def _write(self, offset, entry):
+        with self._lock:
+            self._write_locked(offset, entry)
+
+    def _write_locked(self, offset, entry):
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, offset)
+        try:
+            data = self._map
+            sequence = _SEQUENCE.unpack_from(data, offset)[0]
+            # an odd sequence was left behind by a writer that died
+            sequence = (sequence | 1) & 0xffffffff
+            _SEQUENCE.pack_into(data, offset, sequence)
+            if entry is None:
+                _SLOT_HEADER.pack_into(data, offset, sequence, 0.0, 0, 0, 0)
+            else:
+                expires, key_hash, key, value = entry
+                start = offset + _SLOT_HEADER.size
+                data[start:start + len(key) + len(value)] = key + value
+                _SLOT_HEADER.pack_into(data, offset, sequence, expires,
+                                       key_hash, len(key), len(value))
+            _SEQUENCE.pack_into(data, offset, (sequence + 1) & 0xffffffff)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, offset)
+
+
+def _hash(key):
+    return struct.unpack('<Q', hashlib.md5(key).digest()[:8])[0]
@@ -0,0 +1,362 @@
+import threading
+import time
+from bisect import bisect_left
+
+
+# upper bounds (in seconds) of the latency histogram buckets
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram(object):
+    """
+    Fixed bucket histogram with Prometheus style cumulative export
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        """
+        returns the histogram as a dict with cumulative bucket counts keyed
+        by the bucket upper bound ('+Inf' for the overflow bucket)
+        """
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return {'buckets': buckets, 'sum': self.sum, 'count': self.count}
+
+
+class OperationMetrics(object):
+    """
+    Counters recorded for a single WebHDFS operation (CREATE, OPEN, ...)
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.count = 0
+        self.errors = dict()
+        self.latency = Histogram(buckets)
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'errors': dict(self.errors),
+            'latency': self.latency.snapshot(),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out
+        }
+
+
+class OperationTimer(object):
+    """
+    Context manager measuring a single client call. The call is counted,
+    timed and, if it raises, its exception class is recorded as an error.
+    Bytes of a streamed body counted after the call returned are added to
+    the operation's totals as they are read.
+    """
+
+    __slots__ = ('registry', 'operation', 'start', 'bytes_in', 'bytes_out',
+                 'finished')
+
+    def __init__(self, registry, operation):
+        self.registry = registry
+        self.operation = operation
+        self.start = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.finished = False
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.time() - self.start
+        error = exc_type.__name__ if exc_type is not None else None
+        self.registry.record(self.operation, elapsed, error=error,
+                             bytes_in=self.bytes_in, bytes_out=self.bytes_out)
+        self.finished = True
+        return False
+
+    def add_bytes_in(self, data):
+        self.count_bytes_in(_payload_size(data))
+
+    def add_bytes_out(self, data):
+        self.count_bytes_out(_payload_size(data))
+
+    def count_bytes_in(self, count):
+        if self.finished:
+            self.registry.add_bytes(self.operation, bytes_in=count)
+        else:
+            self.bytes_in += count
+
+    def count_bytes_out(self, count):
+        if self.finished:
+            self.registry.add_bytes(self.operation, bytes_out=count)
+        else:
+            self.bytes_out += count
+
+
+class _NullTimer(object):
+    """
+    Stand-in used by the clients when no registry is configured so that
+    disabled metrics cost a single attribute lookup per call
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def add_bytes_in(self, data):
+        pass
+
+    def add_bytes_out(self, data):
+        pass
+
+    def count_bytes_in(self, count):
+        pass
+
+    def count_bytes_out(self, count):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry(object):
+    """
+    Thread safe registry of per-operation client metrics
+
+    To record metrics pass a registry to the client:
+
+    >>> from pywebhdfs.metrics import MetricsRegistry
+    >>> metrics = MetricsRegistry()
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', metrics=metrics)
+    >>> hdfs.list_dir('user/hdfs')
+    >>> metrics.snapshot()['LISTSTATUS']['count']
+    1
+    >>> print(metrics.to_prometheus())
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._operations = dict()
+        self._gauges = dict()
+        self._counters = dict()
+        self._histograms = dict()
+        self._lock = threading.Lock()
+
+    def timer(self, operation):
+        """
+        returns a context manager measuring one call of the operation
+        """
+        return OperationTimer(self, operation)
+
+    def record(self, operation, elapsed, error=None, bytes_in=0,
+               bytes_out=0):
+        """
+        record a completed call of the operation
+
+        :param operation: the WebHDFS operation name, see operations.py
+        :param elapsed: wall time of the call in seconds
+        :param error: exception class name if the call failed
+        :param bytes_in: number of bytes received
+        :param bytes_out: number of bytes sent
+        """
+        with self._lock:
+            metrics = self._operations.get(operation)
+            if metrics is None:
+                metrics = OperationMetrics(self.buckets)
+                self._operations[operation] = metrics
+            metrics.count += 1
+            metrics.latency.observe(elapsed)
+            metrics.bytes_in += bytes_in
+            metrics.bytes_out += bytes_out
+            if error is not None:
+                metrics.errors[error] = metrics.errors.get(error, 0) + 1
+
+    def add_bytes(self, operation, bytes_in=0, bytes_out=0):
+        """
+        add bytes transferred by a call of the operation that was already
+        recorded, e.g. the body of a streamed read consumed after the call
+        returned
+        """
+        with self._lock:
+            metrics = self._operations.get(operation)
+            if metrics is None:
+                metrics = OperationMetrics(self.buckets)
+                self._operations[operation] = metrics
+            metrics.bytes_in += bytes_in
+            metrics.bytes_out += bytes_out
+
+    def set_gauge(self, name, value):
+        """
+        set a named gauge, used by components such as the writers for
+        values like queue depths
+        """
+        with self._lock:
+            self._gauges[name] = value
+
+    def increment(self, name, amount=1):
+        """
+        add amount to a named counter, created at zero on first use
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, value, buckets=None):
+        """
+        add a sample to a named histogram, created with buckets (the
+        registry's latency buckets by default) on first use
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = Histogram(buckets or self.buckets)
+                self._histograms[name] = histogram
+            histogram.observe(value)
+
+    def gauges(self):
+        with self._lock:
+            return dict(self._gauges)
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def histograms(self):
+        with self._lock:
+            return dict((name, histogram.snapshot())
+                        for name, histogram in self._histograms.items())
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self._gauges.clear()
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """
+        returns a point in time copy of all metrics as a dict keyed by
+        operation name
+        """
+        with self._lock:
+            return dict((operation, metrics.snapshot())
+                        for operation, metrics in self._operations.items())
+
+    def to_prometheus(self, prefix='pywebhdfs'):
+        """
+        returns all metrics in the Prometheus text exposition format
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def family(name, metric_type, help_text):
+            lines.append('# HELP {0}_{1} {2}'.format(prefix, name, help_text))
+            lines.append('# TYPE {0}_{1} {2}'.format(prefix, name, metric_type))
+
+        def sample(name, labels, value):
+            label_text = ','.join('{0}="{1}"'.format(key, _escape(val))
+                                  for key, val in labels)
+            if label_text:
+                label_text = '{' + label_text + '}'
+            lines.append('{0}_{1}{2} {3}'.format(
+                prefix, name, label_text, _format_value(value)))
+
+        operations = sorted(snapshot)
+
+        family('operations_total', 'counter', 'Number of client calls.')
+        for op in operations:
+            sample('operations_total', [('operation', op)],
+                   snapshot[op]['count'])
+
+        family('operation_errors_total', 'counter',
+               'Number of failed client calls by exception class.')
+        for op in operations:
+            for error, count in sorted(snapshot[op]['errors'].items()):
+                sample('operation_errors_total',
+                       [('operation', op), ('exception', error)], count)
+
+        family('operation_latency_seconds', 'histogram',
+               'Wall time of client calls.')
+        for op in operations:
+            latency = snapshot[op]['latency']
+            for bound, count in latency['buckets']:
+                sample('operation_latency_seconds_bucket',
+                       [('operation', op), ('le', _format_value(bound))],
+                       count)
+            sample('operation_latency_seconds_sum', [('operation', op)],
+                   latency['sum'])
+            sample('operation_latency_seconds_count', [('operation', op)],
+                   latency['count'])
+
+        family('operation_bytes_in_total', 'counter',
+               'Bytes received from WebHDFS.')
+        for op in operations:
+            sample('operation_bytes_in_total', [('operation', op)],
+                   snapshot[op]['bytes_in'])
+
+        family('operation_bytes_out_total', 'counter',
+               'Bytes sent to WebHDFS.')
+        for op in operations:
+            sample('operation_bytes_out_total', [('operation', op)],
+                   snapshot[op]['bytes_out'])
+
+        for name, value in sorted(self.gauges().items()):
+            family(name, 'gauge', 'Gauge {0}.'.format(name))
+            sample(name, [], value)
+
+        for name, value in sorted(self.counters().items()):
+            family(name, 'counter', 'Counter {0}.'.format(name))
+            sample(name, [], value)
+
+        for name, histogram in sorted(self.histograms().items()):
+            family(name, 'histogram', 'Histogram {0}.'.format(name))
+            for bound, count in histogram['buckets']:
+                sample(name + '_bucket', [('le', _format_value(bound))],
+                       count)
+            sample(name + '_sum', [], histogram['sum'])
+            sample(name + '_count', [], histogram['count'])
+
+        return '\n'.join(lines) + '\n'
+
+
+def _payload_size(data):
+    """
+    size of a request or response payload, file like objects and other
+    payloads without a length count as zero here, the clients count
+    streamed payloads chunk by chunk as they are sent or read
+    """
+    try:
+        return len(data)
+    except (TypeError, AttributeError):
+        # instances of old style classes such as StringIO raise the latter
+        return 0
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')\
+        .replace('\n', '\\n')
@@ -8,3 +8,6 @@ GETFILESTATUS = 'GETFILESTATUS'
 LISTSTATUS = 'LISTSTATUS'
 SETOWNER = 'SETOWNER'
 GETACLSTATUS = 'GETACLSTATUS'
+CONCAT = 'CONCAT'
+GETCONTENTSUMMARY = 'GETCONTENTSUMMARY'
+GETQUOTAUSAGE = 'GETQUOTAUSAGE'
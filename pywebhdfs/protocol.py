@@ -0,0 +1,666 @@
+"""
+Sans-IO core of the WebHDFS protocol
+
+The clients in pywebhdfs.webhdfs (requests) and pywebhdfs.tornado.webhdfs
+(Tornado) are thin drivers around this module. WebHdfsProtocol turns a
+client call into a Call, a small state machine that hands out Request
+descriptions and consumes Response descriptions without performing any
+I/O itself:
+
+    call = protocol.call(operations.CREATE, path, data, params)
+    with call:
+        request = call.start()
+        while request is not None:
+            sleep(call.pause)              # set by the rate limiter
+            authorize(request)
+            call.sending()                 # starts the request's clock
+            try:
+                response = send(request)   # the driver's transport
+            except TransportError as e:
+                request = call.fail(e)     # None when e is final
+                if request is None:
+                    raise
+                continue
+            request = call.receive(response)
+        sleep(call.pause)
+    return call.result
+
+URI building, header construction, the two step redirect flow of data
+operations, status checking and result parsing all live here so that
+they are written (and optimized) once for every driver. A request body
+that is not a string and a streamed response body are not seen whole by
+the Call: the driver reports every chunk it sends or reads with
+call.sent(count) and call.received(count), which return the seconds the
+rate limiter wants it to wait before going on.
+"""
+import httplib
+import json
+import time
+from urllib import quote
+
+from pywebhdfs import errors, operations, tracing
+from pywebhdfs.health import datanode_of
+from pywebhdfs.metrics import NULL_TIMER
+from pywebhdfs.tracing import NULL_SPAN
+
+
+# how the namenode answer of an operation is handled
+NO_REDIRECT = None
+# the namenode redirects to a datanode which receives the request body
+TWO_STEP = 'two_step'
+# the namenode redirects to a datanode which serves the response
+FOLLOW = 'follow'
+
+# how the final response of an operation is turned into its result
+RESULT_TRUE = 'true'
+RESULT_JSON = 'json'
+RESULT_BODY = 'body'
+
+# how an operation uses the client's metadata cache
+CACHE_NONE = None
+# the result is served from and stored in the cache
+CACHE_RESULT = 'result'
+# the operation changes the namespace, cached results it affects are dropped
+CACHE_INVALIDATE = 'invalidate'
+
+OCTET_STREAM = 'application/octet-stream'
+
+# characters left as is when percent-encoding paths and parameter values
+SAFE_PATH = '/'
+SAFE_VALUE = '/'
+
+# number of encoded paths remembered per client, the cache is emptied when
+# it grows past this size
+PATH_CACHE_SIZE = 10000
+
+
+class OperationSpec(object):
+    """
+    Static description of a WebHDFS operation
+    """
+
+    __slots__ = ('operation', 'method', 'expected_status', 'redirect',
+                 'result', 'caching')
+
+    def __init__(self, operation, method, expected_status, redirect,
+                 result, caching=CACHE_NONE):
+        self.operation = operation
+        self.method = method
+        self.expected_status = expected_status
+        self.redirect = redirect
+        self.result = result
+        self.caching = caching
+
+
+SPECS = dict((spec.operation, spec) for spec in [
+    OperationSpec(operations.CREATE, 'PUT', httplib.CREATED, TWO_STEP,
+                  RESULT_TRUE, CACHE_INVALIDATE),
+    OperationSpec(operations.APPEND, 'POST', httplib.OK, TWO_STEP,
+                  RESULT_TRUE, CACHE_INVALIDATE),
+    OperationSpec(operations.OPEN, 'GET', httplib.OK, FOLLOW, RESULT_BODY),
+    OperationSpec(operations.MKDIRS, 'PUT', httplib.OK, NO_REDIRECT,
+                  RESULT_TRUE, CACHE_INVALIDATE),
+    OperationSpec(operations.RENAME, 'PUT', httplib.OK, NO_REDIRECT,
+                  RESULT_TRUE, CACHE_INVALIDATE),
+    OperationSpec(operations.DELETE, 'DELETE', httplib.OK, NO_REDIRECT,
+                  RESULT_TRUE, CACHE_INVALIDATE),
+    OperationSpec(operations.GETFILESTATUS, 'GET', httplib.OK, NO_REDIRECT,
+                  RESULT_JSON, CACHE_RESULT),
+    OperationSpec(operations.LISTSTATUS, 'GET', httplib.OK, NO_REDIRECT,
+                  RESULT_JSON, CACHE_RESULT),
+    OperationSpec(operations.SETOWNER, 'PUT', httplib.OK, NO_REDIRECT,
+                  RESULT_TRUE, CACHE_INVALIDATE),
+    OperationSpec(operations.GETACLSTATUS, 'GET', httplib.OK, NO_REDIRECT,
+                  RESULT_JSON, CACHE_RESULT),
+    OperationSpec(operations.GETCONTENTSUMMARY, 'GET', httplib.OK,
+                  NO_REDIRECT, RESULT_JSON),
+    OperationSpec(operations.GETQUOTAUSAGE, 'GET', httplib.OK, NO_REDIRECT,
+                  RESULT_JSON)
+])
+
+CACHED_OPERATIONS = tuple(spec.operation for spec in SPECS.values()
+                          if spec.caching is CACHE_RESULT)
+
+
+_STATUS_ERRORS = {
+    httplib.BAD_REQUEST: errors.BadRequest,
+    httplib.UNAUTHORIZED: errors.Unauthorized,
+    httplib.NOT_FOUND: errors.FileNotFound,
+    httplib.METHOD_NOT_ALLOWED: errors.MethodNotAllowed
+}
+
+
+# data operations sent to another datanode after failing on one, the
+# namenode honours excludedatanodes for both
+REPEATABLE_OPERATIONS = frozenset([operations.CREATE, operations.OPEN])
+
+
+# RemoteException classes telling the client to retry later
+RETRIABLE_EXCEPTIONS = frozenset(['RetriableException'])
+
+
+def raise_for_status(resp_code, message=None):
+    """
+    raise the pywebhdfs exception matching an unexpected HTTP status
+    """
+    if resp_code == httplib.SERVICE_UNAVAILABLE or \
+            remote_exception(message) in RETRIABLE_EXCEPTIONS:
+        raise errors.RetriableException(msg=message)
+    raise _STATUS_ERRORS.get(resp_code, errors.PyWebHdfsException)(
+        msg=message)
+
+
+def remote_exception(message):
+    """
+    class name of the RemoteException in an error body, None if the body
+    is not one
+    """
+    if not message or 'RemoteException' not in message:
+        return None
+    try:
+        return json.loads(message)['RemoteException'].get('exception')
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+class Request(object):
+    """
+    An HTTP request for the driver to send
+
+    phase is tracing.NAMENODE or tracing.DATANODE, follow_redirects tells
+    the driver whether its transport may follow redirects on its own.
+    When stream is set the driver hands the body of a successful (200)
+    response to the Call unread, as a file like object or through a
+    callback, instead of buffering it. timeout, when set, bounds the
+    seconds the driver waits for the response.
+    """
+
+    __slots__ = ('method', 'uri', 'headers', 'body', 'follow_redirects',
+                 'phase', 'stream', 'timeout')
+
+    def __init__(self, method, uri, headers, body=None,
+                 follow_redirects=True, phase=tracing.NAMENODE,
+                 stream=False, timeout=None):
+        self.method = method
+        self.uri = uri
+        self.headers = headers
+        self.body = body
+        self.follow_redirects = follow_redirects
+        self.phase = phase
+        self.stream = stream
+        self.timeout = timeout
+
+
+class Response(object):
+    """
+    An HTTP response received by the driver
+
+    headers must support case-insensitive lookup. decode_json optionally
+    replaces json.loads(body) with the transport's own decoder, connect
+    and ttfb are the connection setup and time to first byte in seconds
+    when the transport reports them.
+    """
+
+    __slots__ = ('status', 'headers', 'body', 'decode_json', 'connect',
+                 'ttfb')
+
+    def __init__(self, status, headers, body, decode_json=None,
+                 connect=None, ttfb=None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.decode_json = decode_json
+        self.connect = connect
+        self.ttfb = ttfb
+
+    def json(self):
+        if self.decode_json is not None:
+            return self.decode_json()
+        return json.loads(self.body)
+
+
+class Call(object):
+    """
+    State machine of a single client call, see the module documentation
+    """
+
+    __slots__ = ('protocol', 'spec', 'path', 'data', 'params', 'timer',
+                 'span', 'stream', 'location', 'locate', 'result', 'pause',
+                 '_request', '_sent_at', '_throttled', '_resume_at',
+                 '_redirects', '_failed')
+
+    def __init__(self, protocol, spec, path, data, params, timer, span,
+                 stream=False, location=None, locate=False):
+        self.protocol = protocol
+        self.spec = spec
+        self.path = path
+        self.data = data
+        self.params = params
+        self.timer = timer
+        self.span = span
+        self.stream = stream
+        # datanode URL to send a data operation to without asking the
+        # namenode, and whether to only ask the namenode for that URL
+        self.location = location
+        self.locate = locate
+        self.result = None
+        # seconds the driver waits before sending the request it was just
+        # handed, or before returning the result, set by the rate limiter
+        self.pause = 0.0
+        self._request = None
+        self._sent_at = None
+        # seconds the driver waited on the rate limiter while the request
+        # was in flight, and the time until which the waits asked for by
+        # a streamed response run when the driver cannot hold it back
+        self._throttled = 0.0
+        self._resume_at = 0.0
+        # namenode requests repeated to route around datanodes, and the
+        # datanodes this call failed on
+        self._redirects = 0
+        self._failed = []
+
+    @property
+    def traced(self):
+        return self.span is not NULL_SPAN
+
+    def __enter__(self):
+        self.timer.__enter__()
+        self.span.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.span.__exit__(exc_type, exc_value, traceback)
+        self.timer.__exit__(exc_type, exc_value, traceback)
+        return False
+
+    def start(self):
+        """
+        returns the first request of the call, made to the namenode (or to
+        the datanode at location), or None when the result was found in the
+        metadata cache
+        """
+        if self.location is not None:
+            return self._issue(self._to_datanode(self.location))
+        spec = self.spec
+        if spec.caching is CACHE_RESULT and not self.params:
+            cache = self.protocol.metadata_cache
+            if cache is not None:
+                cached = cache.get(cache_key(spec.operation, self.path,
+                                             self.protocol.cache_namespace))
+                if cached is not None:
+                    self.result = json.loads(cached)
+                    return None
+        return self._issue(self._namenode_request(self.params))
+
+    def receive(self, response):
+        """
+        consume the response to the last request and return the next
+        request, or None once the call is complete and result is set
+        """
+        request = self._request
+        self._record_response(request, response)
+
+        spec = self.spec
+        if request.phase == tracing.DATANODE and \
+                self.protocol.datanode_health is not None:
+            failed = response.status >= httplib.INTERNAL_SERVER_ERROR
+            self._record_datanode(request, failed)
+            if failed and self._may_repeat():
+                return self._route_around()
+        if request.phase == tracing.NAMENODE and \
+                spec.redirect is not NO_REDIRECT:
+            if self.locate:
+                return self._located(response)
+            if response.status == httplib.TEMPORARY_REDIRECT:
+                return self._issue(self._redirect(response))
+            if spec.redirect is TWO_STEP or \
+                    response.status != spec.expected_status:
+                raise_for_status(response.status, response.body)
+        elif response.status != spec.expected_status:
+            raise_for_status(response.status, response.body)
+
+        result = spec.result
+        if result is RESULT_TRUE:
+            self.result = True
+        elif result is RESULT_JSON:
+            self.result = response.json()
+        else:
+            self.result = response.body
+        if spec.caching is not CACHE_NONE and \
+                self.protocol.metadata_cache is not None:
+            self._update_cache(response)
+        limiter = self.protocol.rate_limiter
+        self.pause = limiter.response_delay(spec.operation, response) \
+            if limiter is not None else 0.0
+        self.pause = max(self.pause, self._resume_at - time.time())
+        return None
+
+    def _update_cache(self, response):
+        cache = self.protocol.metadata_cache
+        if self.spec.caching is CACHE_RESULT:
+            # calls with parameters may return a different view of the path
+            if not self.params:
+                cache.set(cache_key(self.spec.operation, self.path,
+                                    self.protocol.cache_namespace),
+                          _encode(response.body))
+            return
+        paths = [self.path]
+        if 'destination' in self.params:
+            paths.append(self.params['destination'])
+        for path in paths:
+            for key in invalidated_keys(path, self.protocol.cache_namespace):
+                cache.delete(key)
+
+    def fail(self, error):
+        """
+        consume the error the driver's transport raised sending the last
+        request, returns the next request or None when the driver should
+        re-raise it
+        """
+        request = self._request
+        if request.phase != tracing.DATANODE or \
+                self.protocol.datanode_health is None:
+            return None
+        self._record_datanode(request, True)
+        if self._may_repeat():
+            return self._route_around()
+        return None
+
+    def sending(self):
+        """
+        the driver is about to send the last request handed out, after
+        its pause and authentication, which are not part of the request's
+        timing
+        """
+        request = self._request
+        self.span.request_start(request.method, request.uri)
+        self._sent_at = time.time()
+        self._throttled = 0.0
+
+    def sent(self, count):
+        """
+        consume the size of a chunk of a streamed request body the driver
+        is sending, returns the seconds to wait before sending more, which
+        are not part of the request's timing
+        """
+        self.timer.count_bytes_out(count)
+        delay = self._transfer_delay(count)
+        self._throttled += delay
+        return delay
+
+    def received(self, count):
+        """
+        consume the size of a chunk of a streamed response body, read by
+        the driver or by the caller holding the result, returns the
+        seconds to wait before reading more; a driver that cannot wait
+        while the response arrives waits in the pause after the call
+        """
+        self.timer.count_bytes_in(count)
+        delay = self._transfer_delay(count)
+        if delay:
+            self._resume_at = max(self._resume_at, time.time() + delay)
+        return delay
+
+    def _transfer_delay(self, count):
+        limiter = self.protocol.rate_limiter
+        if limiter is None:
+            return 0.0
+        return limiter.transfer_delay(self.spec.operation, count)
+
+    def _located(self, response):
+        """
+        take the datanode URL from the namenode's noredirect answer (or
+        its redirect, from namenodes predating noredirect) as the result
+        """
+        if response.status == httplib.TEMPORARY_REDIRECT:
+            location = response.headers['location']
+        elif response.status == httplib.OK:
+            location = response.json()['Location']
+        else:
+            raise_for_status(response.status, response.body)
+        self.span.redirect(location)
+        # the probe of a recovering datanode is taken when the location
+        # is used, not when it is handed out
+        health = self.protocol.datanode_health
+        if health is not None and \
+                not health.available(datanode_of(location), probe=False) and \
+                self._redirects < health.max_redirects:
+            return self._issue(self._exclude_request())
+        self.result = location
+        return None
+
+    def _namenode_request(self, params):
+        spec = self.spec
+        if self.locate:
+            params = dict(params)
+            params['noredirect'] = True
+        uri = self.protocol.create_uri(self.path, spec.operation, params)
+        return Request(spec.method, uri, {}, None,
+                       spec.redirect is NO_REDIRECT, stream=self.stream)
+
+    def _redirect(self, response):
+        """
+        request to the datanode named by the Location of the namenode's
+        redirect, or the namenode request again when the datanode's
+        circuit is open
+        """
+        # Get the address provided in the location header of the
+        # initial response from the namenode and make the request
+        # to the datanode
+        location = response.headers['location']
+        self.span.redirect(location)
+        return self._to_datanode(location)
+
+    def _to_datanode(self, location):
+        timeout = None
+        health = self.protocol.datanode_health
+        if health is not None:
+            if not health.available(datanode_of(location)) and \
+                    self._redirects < health.max_redirects:
+                return self._exclude_request()
+            timeout = health.timeout
+        if self.spec.redirect is TWO_STEP:
+            return Request(self.spec.method, location,
+                           {'Content-Type': OCTET_STREAM}, self.data, False,
+                           tracing.DATANODE, timeout=timeout)
+        return Request(self.spec.method, location, {}, None, False,
+                       tracing.DATANODE, self.stream, timeout)
+
+    def _record_datanode(self, request, failed):
+        self.protocol.datanode_health.record(
+            datanode_of(request.uri), self._elapsed(), failed)
+        if failed:
+            self._failed.append(datanode_of(request.uri))
+
+    def _may_repeat(self):
+        """
+        whether a call that failed on its datanode can be sent again: the
+        body must still be available and an append may have been applied
+        in part
+        """
+        return self.spec.operation in REPEATABLE_OPERATIONS and \
+            (self.data is None or isinstance(self.data, basestring)) and \
+            self._redirects < self.protocol.datanode_health.max_redirects
+
+    def _route_around(self):
+        return self._issue(self._exclude_request())
+
+    def _exclude_request(self):
+        """
+        the namenode request of the call asking for a datanode other than
+        the unhealthy ones
+        """
+        self._redirects += 1
+        excluded = set(self.protocol.datanode_health.excluded())
+        excluded.update(self._failed)
+        params = dict(self.params)
+        params['excludedatanodes'] = ','.join(sorted(excluded))
+        return self._namenode_request(params)
+
+    def _issue(self, request):
+        self._request = request
+        limiter = self.protocol.rate_limiter
+        if limiter is not None:
+            self.pause = limiter.request_delay(self.spec.operation, request)
+        if request.body is not None:
+            self.timer.add_bytes_out(request.body)
+        # replaced by sending(), for drivers that do not call it
+        self._sent_at = time.time()
+        self._throttled = 0.0
+        return request
+
+    def _elapsed(self):
+        """
+        seconds the last request took on the network, without the waits
+        on the rate limiter while it was sent
+        """
+        return max(time.time() - self._sent_at - self._throttled, 0.0)
+
+    def _record_response(self, request, response):
+        self.timer.add_bytes_in(response.body)
+        if self.span is NULL_SPAN:
+            return
+        elapsed = self._elapsed()
+        if request.phase == tracing.DATANODE and response.ttfb is not None:
+            connect = response.connect or 0.0
+            self.span.response(
+                request.phase, response.status, elapsed,
+                datanode_connect=response.connect,
+                datanode_ttfb=response.ttfb,
+                datanode_transfer=elapsed - connect - response.ttfb)
+        else:
+            self.span.response(request.phase, response.status, elapsed)
+
+
+_INTEGER_TYPES = (int, long)
+
+
+def _encode(value):
+    """
+    byte string form of a path or parameter value, unicode is sent as UTF-8
+    """
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+def quote_path(path):
+    """
+    percent-encode an HDFS path for use in a request URI
+    """
+    return quote(_encode(path), SAFE_PATH)
+
+
+def quote_value(value):
+    """
+    percent-encode a query parameter value, booleans are sent the way
+    WebHDFS expects them ('true'/'false')
+    """
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if type(value) in _INTEGER_TYPES:
+        return str(value)
+    return quote(_encode(value), SAFE_VALUE)
+
+
+def normalize_path(path):
+    """
+    path with a single leading slash and no trailing slash, paths are
+    passed to the clients with or without the leading slash
+    """
+    return '/' + _encode(path).strip('/')
+
+
+def cache_key(operation, path, namespace=''):
+    """
+    metadata cache key of the result of operation on path, namespace
+    (see WebHdfsProtocol.cache_namespace) keeps the entries of different
+    namenodes and users apart in a shared cache
+    """
+    key = operation + ' ' + normalize_path(path)
+    return namespace + ' ' + key if namespace else key
+
+
+def invalidated_keys(path, namespace=''):
+    """
+    metadata cache keys made stale by a change to path: its own results
+    and the status and listing of its parent directory
+
+    Entries below a renamed or deleted directory are left to expire.
+    """
+    path = normalize_path(path)
+    operation_paths = [(operation, path) for operation in CACHED_OPERATIONS]
+    if path != '/':
+        parent = path.rsplit('/', 1)[0] or '/'
+        operation_paths.append((operations.GETFILESTATUS, parent))
+        operation_paths.append((operations.LISTSTATUS, parent))
+    return [cache_key(operation, operation_path, namespace)
+            for operation, operation_path in operation_paths]
+
+
+class WebHdfsProtocol(object):
+    """
+    Per-client protocol state: the base URI, the authentication parameter
+    shared by every request, the optional metadata cache, rate limiter and
+    datanode health tracker
+    """
+
+    def __init__(self, base_uri, user_name=None, metadata_cache=None,
+                 rate_limiter=None, datanode_health=None):
+        self.base_uri = base_uri
+        self.user_name = user_name
+        self.metadata_cache = metadata_cache
+        self.rate_limiter = rate_limiter
+        self.datanode_health = datanode_health
+        # metadata cache entries are shared between the clients of one
+        # namenode and user only
+        self.cache_namespace = base_uri + ' ' + _encode(user_name or '')
+        # configure authorization based on provided credentials
+        self._auth_param = '&user.name={0}'.format(quote_value(user_name)) \
+            if user_name else ''
+        self._paths = dict()
+
+    def quote_path(self, path):
+        """
+        quote_path() remembering the encoded form of recently used paths
+        """
+        try:
+            return self._paths[path]
+        except KeyError:
+            pass
+        quoted = quote_path(path)
+        if len(self._paths) >= PATH_CACHE_SIZE:
+            self._paths.clear()
+        self._paths[path] = quoted
+        return quoted
+
+    def create_uri(self, path, operation, params):
+        """
+        construct the WebHDFS request uri based on the <PATH>,
+        <OPERATION>, and any provided optional arguments
+        """
+        uri = self.base_uri + self.quote_path(path) + '?op=' + operation
+        # setup any optional parameters
+        for key, value in params.items():
+            uri += '&' + key + '=' + quote_value(value)
+        return uri + self._auth_param
+
+    def call(self, operation, path, data=None, params=None, timer=NULL_TIMER,
+             span=NULL_SPAN, stream=False, location=None, locate=False):
+        """
+        returns the Call for one client call of the operation, stream asks
+        the driver not to buffer the body of the result
+
+        A data operation (CREATE, APPEND, OPEN) with a location is sent
+        straight to that datanode URL, with locate its result is the
+        datanode URL the namenode answers noredirect=true with.
+        """
+        spec = SPECS[operation]
+        if (location is not None or locate) and \
+                spec.redirect is NO_REDIRECT:
+            raise ValueError('{0} is not sent to a datanode'.format(
+                operation))
+        return Call(self, spec, path, data, params or {}, timer, span,
+                    stream, location, locate)
@@ -0,0 +1,132 @@
+"""
+Client side rate limiting of WebHDFS calls
+
+A RateLimiter passed to a client as rate_limiter= caps the rate of
+namenode metadata calls and the bandwidth of data transfers:
+
+    >>> limiter = RateLimiter(metadata_rate=50, data_rate=20 * 2 ** 20,
+    >>>                       operation_rates={operations.LISTSTATUS: 5})
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', user_name='hdfs',
+    >>>                        rate_limiter=limiter)
+
+Metadata operations (everything but OPEN, CREATE and APPEND) take one
+token of the metadata bucket, or of their own bucket from
+operation_rates, per namenode request. Data operations take one token of
+the data bucket per byte sent or received by a datanode: string bodies
+before the request is sent, buffered downloads once the body is
+received, and streamed bodies (files, iterators, read_stream, read_into
+and the readers built on them) chunk by chunk as they are sent or read.
+A limiter may be shared by any number of clients, threads and
+coroutines.
+
+The buckets never block: reserving tokens returns how long the caller
+has to wait for them, and the clients sleep (or yield gen.sleep in
+Tornado) for that long. Tornado cannot hold back a response body that
+streams in, so the wait a streamed download ran up is taken once its
+body was received. With a metrics registry the waits are recorded in
+the <name>_metadata_wait_seconds and <name>_data_wait_seconds histograms.
+"""
+import threading
+import time
+
+from pywebhdfs import operations, tracing
+
+
+DATA_OPERATIONS = frozenset([operations.OPEN, operations.CREATE,
+                             operations.APPEND])
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket refilled with rate tokens per second up to
+    burst tokens (one second worth of tokens by default)
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """
+        take tokens, returns the seconds to wait before using them
+
+        The tokens are taken even when they are not available yet: the
+        bucket goes into debt, which later callers wait for, so requests
+        larger than the burst are allowed and the long term rate holds.
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens +
+                               (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class RateLimiter(object):
+    """
+    Token buckets of a client's metadata calls and data transfers, None
+    rates are not limited
+    """
+
+    def __init__(self, metadata_rate=None, data_rate=None,
+                 metadata_burst=None, data_burst=None, operation_rates=None,
+                 metrics=None, name='rate_limit'):
+        self.metadata = TokenBucket(metadata_rate, metadata_burst) \
+            if metadata_rate is not None else None
+        self.data = TokenBucket(data_rate, data_burst) \
+            if data_rate is not None else None
+        self.operations = dict((operation, TokenBucket(rate))
+                               for operation, rate in
+                               (operation_rates or {}).items())
+        self.metrics = metrics
+        self.name = name
+
+    def request_delay(self, operation, request):
+        """
+        seconds to wait before sending a protocol Request of the operation
+        """
+        if operation in DATA_OPERATIONS:
+            if self.data is None or request.phase != tracing.DATANODE or \
+                    not isinstance(request.body, str):
+                return 0.0
+            return self._reserve(self.data, len(request.body), 'data')
+        if request.phase != tracing.NAMENODE:
+            return 0.0
+        bucket = self.operations.get(operation, self.metadata)
+        if bucket is None:
+            return 0.0
+        return self._reserve(bucket, 1, 'metadata')
+
+    def response_delay(self, operation, response):
+        """
+        seconds to wait after receiving the final protocol Response of the
+        operation
+        """
+        if self.data is None or operation != operations.OPEN or \
+                not isinstance(response.body, str):
+            return 0.0
+        return self._reserve(self.data, len(response.body), 'data')
+
+    def transfer_delay(self, operation, count):
+        """
+        seconds to wait after sending or reading a chunk of count bytes of
+        a streamed body of the operation
+        """
+        if self.data is None or operation not in DATA_OPERATIONS:
+            return 0.0
+        return self._reserve(self.data, count, 'data')
+
+    def _reserve(self, bucket, tokens, kind):
+        delay = bucket.reserve(tokens)
+        if self.metrics is not None:
+            self.metrics.observe(
+                '{0}_{1}_wait_seconds'.format(self.name, kind), delay)
+        return delay
@@ -0,0 +1,155 @@
+"""
+Input splits and record iteration for processing one HDFS file in parallel
+
+A large text file is cut into byte range splits, usually one per HDFS
+block, and every worker reads only its own range with ranged OPEN calls:
+
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', user_name='hdfs')
+    >>> splits = hdfs.get_splits('user/hdfs/events.log')
+    >>> # in worker number i
+    >>> for line in hdfs.iter_lines('user/hdfs/events.log', split=splits[i]):
+    >>>     process(line)
+
+Records are assigned to splits the way Hadoop's LineRecordReader does it:
+a split (offset, length) yields every record that starts after offset and
+at or before offset + length, plus the record at position 0 for the first
+split. Every split except the first skips the partial record it starts
+in, and every split reads past its end to finish its last record, so each
+record is read exactly once across all splits.
+"""
+from pywebhdfs import compression
+
+
+# Hadoop's FileInputFormat lets the last split grow up to 10% over the
+# split size instead of creating a tiny trailing split
+SPLIT_SLOP = 1.1
+
+DEFAULT_DELIMITER = '\n'
+# bytes requested beyond the end of a split to finish its last record,
+# more is fetched if the record is longer
+READ_AHEAD = 64 * 1024
+
+
+def compute_splits(length, split_size):
+    """
+    returns the (offset, length) splits of a file of length bytes
+    """
+    if split_size <= 0:
+        raise ValueError('split_size must be positive')
+    splits = []
+    offset = 0
+    remaining = length
+    while remaining / float(split_size) > SPLIT_SLOP:
+        splits.append((offset, split_size))
+        offset += split_size
+        remaining -= split_size
+    if remaining > 0:
+        splits.append((offset, remaining))
+    return splits
+
+
+def get_splits(hdfs, path, split_size=None):
+    """
+    splits of an HDFS file sized by the file's block size unless
+    split_size is given. Compressed files (by extension) cannot be split
+    and come back as a single split.
+    """
+    status = hdfs.get_file_dir_status(path)['FileStatus']
+    length = status['length']
+    if compression.codec_for_path(path) is not None:
+        return [(0, length)] if length else []
+    return compute_splits(length, split_size or status['blockSize'])
+
+
+def iter_records(hdfs, path, split=None, delimiter=DEFAULT_DELIMITER,
+                 codec=compression.AUTO,
+                 chunk_size=compression.DEFAULT_CHUNK_SIZE):
+    """
+    generator of the records of an HDFS file, or of one split of it,
+    without their delimiter
+
+    With the default newline delimiter a trailing carriage return is
+    stripped as well, like Hadoop does for CRLF line endings. Compressed
+    files are decompressed while reading and can only be read whole.
+    """
+    codec = compression.resolve(codec, path)
+    if split is None:
+        chunks = _stream_chunks(hdfs.read_stream(path, codec=codec),
+                                chunk_size)
+        records = _records(chunks, delimiter, 0, False, None)
+    else:
+        if codec is not None:
+            raise ValueError(
+                'compressed file {0} cannot be read by split'.format(path))
+        offset, length = split
+        # a record starting right at offset belongs to the previous split,
+        # start early enough to see the delimiter that ends before it
+        start = max(0, offset - len(delimiter) + 1) if offset else 0
+        chunks = _range_chunks(hdfs, path, start, offset + length - start,
+                               chunk_size)
+        records = _records(chunks, delimiter, start, offset != 0,
+                           offset + length)
+
+    if delimiter != DEFAULT_DELIMITER:
+        return records
+    return (record[:-1] if record.endswith('\r') else record
+            for record in records)
+
+
+def _stream_chunks(stream, chunk_size):
+    try:
+        for chunk in iter(lambda: stream.read(chunk_size), ''):
+            yield chunk
+    finally:
+        stream.close()
+
+
+def _range_chunks(hdfs, path, offset, length, chunk_size):
+    """
+    chunks of the file from offset on, the first request covers length
+    bytes plus READ_AHEAD and later ones READ_AHEAD more each while the
+    caller keeps reading
+    """
+    size = length + READ_AHEAD
+    while True:
+        received = 0
+        for chunk in _stream_chunks(
+                hdfs.read_stream(path, codec=None, offset=offset,
+                                 length=size), chunk_size):
+            received += len(chunk)
+            yield chunk
+        if received < size:
+            return
+        offset += received
+        size = READ_AHEAD
+
+
+def _records(chunks, delimiter, position, skip_first, end):
+    """
+    split chunks of data starting at file offset position into records,
+    skipping the first (partial) one if asked and stopping after the
+    record that starts at or before end
+    """
+    buffer = ''
+    # index in buffer of the start of the current record
+    index = 0
+    for chunk in chunks:
+        buffer = buffer[index:] + chunk
+        index = 0
+        while True:
+            found = buffer.find(delimiter, index)
+            if found < 0:
+                break
+            record_start = position
+            record = buffer[index:found]
+            position += found + len(delimiter) - index
+            index = found + len(delimiter)
+            if skip_first:
+                skip_first = False
+            elif end is None or record_start <= end:
+                yield record
+            if end is not None and position > end:
+                return
+    record = buffer[index:]
+    if record and not skip_first and (end is None or position <= end):
+        yield record
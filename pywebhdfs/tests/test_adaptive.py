@@ -0,0 +1,132 @@
+import httplib
+import threading
+import time
+import unittest
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import bulk, errors, operations, protocol
+from pywebhdfs.adaptive import AdaptiveLimiter
+from pywebhdfs.fakehdfs import FakeWebHdfsServer, NAMENODE
+from pywebhdfs.metrics import MetricsRegistry
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+class WhenTestingAdaptiveLimiter(unittest.TestCase):
+
+    def test_fast_calls_grow_the_limit_by_about_one_per_round(self):
+        limiter = AdaptiveLimiter(initial=2, maximum=3, target_latency=10)
+        for _ in xrange(2):
+            limiter.release(limiter.acquire())
+        self.assertEqual(2, limiter.limit)
+        limiter.release(limiter.acquire())
+        self.assertEqual(3, limiter.limit)
+        for _ in xrange(10):
+            limiter.release(limiter.acquire())
+        self.assertEqual(3, limiter.limit)
+
+    def test_slow_calls_decrease_once_per_round_trip(self):
+        metrics = MetricsRegistry()
+        limiter = AdaptiveLimiter(initial=8, target_latency=0.01,
+                                  metrics=metrics)
+        started = [limiter.acquire() for _ in xrange(4)]
+        time.sleep(0.02)
+        for start in started:
+            limiter.release(start)
+        self.assertEqual(4, limiter.limit)
+        self.assertEqual(4, metrics.gauges()['adaptive_concurrency_limit'])
+        self.assertEqual(0,
+                         metrics.gauges()['adaptive_concurrency_in_flight'])
+
+    def test_overload_errors_decrease_down_to_the_minimum(self):
+        limiter = AdaptiveLimiter(initial=4, minimum=2)
+        for _ in xrange(3):
+            limiter.release(limiter.acquire(),
+                            errors.RetriableException(msg='busy'))
+        self.assertEqual(2, limiter.limit)
+        limiter.release(limiter.acquire(), errors.FileNotFound(msg='gone'))
+        self.assertEqual(2, limiter.limit)
+
+    def test_try_acquire_respects_the_limit(self):
+        limiter = AdaptiveLimiter(initial=1)
+        started = limiter.try_acquire()
+        self.assertIsNotNone(started)
+        self.assertIsNone(limiter.try_acquire())
+        limiter.release(started)
+        self.assertIsNotNone(limiter.try_acquire())
+
+    def test_bulk_run_stays_within_the_limit(self):
+        limiter = AdaptiveLimiter(initial=2, maximum=2)
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def call(task):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return task
+
+        outcomes = bulk.run(call, range(8), concurrency=limiter)
+        self.assertEqual([(task, None) for task in range(8)], outcomes)
+        self.assertEqual(2, running[1])
+
+
+class WhenTestingRetriableErrors(unittest.TestCase):
+
+    def test_503_and_retriable_remote_exceptions(self):
+        self.assertRaises(errors.RetriableException,
+                          protocol.raise_for_status,
+                          httplib.SERVICE_UNAVAILABLE, 'busy')
+        body = ('{"RemoteException": {"exception": "RetriableException", '
+                '"message": "NameNode still not started"}}')
+        self.assertRaises(errors.RetriableException,
+                          protocol.raise_for_status,
+                          httplib.FORBIDDEN, body)
+        self.assertRaises(errors.Unauthorized, protocol.raise_for_status,
+                          httplib.UNAUTHORIZED, body.replace('Retriable',
+                                                             'Access'))
+
+    def test_overloaded_namenode_shrinks_the_limit(self):
+        server = FakeWebHdfsServer().start()
+        try:
+            webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                      **server.client_kwargs())
+            server.inject_fault(operation=operations.MKDIRS, role=NAMENODE,
+                                status=httplib.SERVICE_UNAVAILABLE,
+                                exception='RetriableException')
+            limiter = AdaptiveLimiter(initial=4, target_latency=10)
+            results = webhdfs.make_dirs_many(['a', 'b', 'c'],
+                                             concurrency=limiter)
+            failed = [result for result in results if not result.ok]
+            self.assertEqual(1, len(failed))
+            self.assertIsInstance(failed[0].error, errors.RetriableException)
+            self.assertEqual(2, limiter.limit)
+        finally:
+            server.stop()
+
+
+class WhenTestingAdaptiveLimiterWithTornado(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingAdaptiveLimiterWithTornado, self).setUp()
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingAdaptiveLimiterWithTornado, self).tearDown()
+
+    @gen_test
+    def test_bulk_calls_release_their_slots(self):
+        limiter = AdaptiveLimiter(initial=2, maximum=4, target_latency=10)
+        results = yield self.webhdfs.make_dirs_many(
+            ['d/{0}'.format(i) for i in xrange(6)], concurrency=limiter)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(0, limiter.in_flight)
+        self.assertEqual(4, limiter.limit)
@@ -0,0 +1,61 @@
+import unittest
+
+from pywebhdfs import arrays
+from pywebhdfs.fakehdfs import FakeWebHdfsServer
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+numpy = arrays.numpy
+
+
+class WhenTestingRecordRanges(unittest.TestCase):
+
+    def test_ranges_hold_whole_records(self):
+        self.assertEqual([(0, 24), (24, 24), (48, 12)],
+                         arrays.record_ranges(5, 12, 30))
+        self.assertEqual([(0, 12), (12, 12)],
+                         arrays.record_ranges(2, 12, 5))
+        self.assertEqual([], arrays.record_ranges(0, 12, 30))
+
+
+class WhenTestingReadInto(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+        self.path = 'user/hdfs/data.bin'
+        self.webhdfs.create_file(self.path, '0123456789')
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_read_into_fills_buffer(self):
+        buffer = bytearray(4)
+        self.assertEqual(4, self.webhdfs.read_into(self.path, buffer, 3))
+        self.assertEqual('3456', str(buffer))
+
+    def test_read_into_stops_at_end_of_file(self):
+        buffer = bytearray(8)
+        self.assertEqual(2, self.webhdfs.read_into(self.path, buffer, 8))
+        self.assertEqual('89', str(buffer[:2]))
+
+    @unittest.skipIf(numpy is None, 'numpy missing')
+    def test_read_array_with_parallel_ranges(self):
+        expected = numpy.arange(600, dtype='<i4').reshape(-1, 3)
+        self.webhdfs.create_file(self.path, 'HEAD' + expected.tostring(),
+                                 overwrite=True)
+
+        array = self.webhdfs.read_array(self.path, '<i4', (-1, 3), offset=4,
+                                        threads=3, part_size=100)
+        self.assertEqual((200, 3), array.shape)
+        self.assertTrue((expected == array).all())
+
+        array = self.webhdfs.read_array(self.path, '<i4', (10, 3), offset=4)
+        self.assertTrue((expected[:10] == array).all())
+
+    @unittest.skipIf(numpy is None, 'numpy missing')
+    def test_partial_records_raise(self):
+        with self.assertRaises(ValueError):
+            self.webhdfs.read_array(self.path, '<i4', (-1, 2))
+        with self.assertRaises(ValueError):
+            self.webhdfs.read_array(self.path, 'u1', (11,))
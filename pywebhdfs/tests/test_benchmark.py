@@ -0,0 +1,52 @@
+import json
+import unittest
+
+from pywebhdfs import benchmark
+
+
+class WhenTestingBenchmarkHelpers(unittest.TestCase):
+
+    def test_percentile_uses_nearest_rank(self):
+        samples = [0.5, 0.1, 0.3, 0.2, 0.4]
+        self.assertEqual(0.3, benchmark.percentile(samples, 0.5))
+        self.assertEqual(0.5, benchmark.percentile(samples, 0.99))
+        self.assertIsNone(benchmark.percentile([], 0.5))
+
+    def test_compare_reports_slower_results(self):
+        baseline = {'results': [
+            {'name': 'sync.read_file', 'ops_per_sec': 100.0, 'p99_ms': 10.0},
+            {'name': 'sync.list_dir', 'ops_per_sec': 100.0, 'p99_ms': 10.0}]}
+        current = {'results': [
+            {'name': 'sync.read_file', 'ops_per_sec': 80.0, 'p99_ms': 10.5},
+            {'name': 'sync.list_dir', 'ops_per_sec': 95.0, 'p99_ms': 10.5},
+            {'name': 'sync.new_op', 'ops_per_sec': 1.0, 'p99_ms': 1.0}]}
+
+        regressions = benchmark.compare(baseline, current, threshold=0.1)
+        self.assertEqual(1, len(regressions))
+        self.assertTrue(regressions[0].startswith('sync.read_file'))
+
+
+class WhenTestingBenchmarkRun(unittest.TestCase):
+
+    def test_run_reports_every_client_operation(self):
+        report = benchmark.run(iterations=2, payload_sizes=[1024],
+                               concurrency=[2])
+        names = set(result['name'] for result in report['results'])
+
+        for kind in ('sync', 'tornado'):
+            for operation in ('create_file', 'append_file', 'read_file',
+                              'make_dir', 'rename_file_dir',
+                              'delete_file_dir', 'get_file_dir_status',
+                              'list_dir', 'set_owner'):
+                self.assertIn('{0}.{1}'.format(kind, operation), names)
+            self.assertIn('{0}.read.1024b.c2'.format(kind), names)
+            self.assertIn('{0}.write.1024b.c2'.format(kind), names)
+        self.assertIn('uri.create_uri.params', names)
+        self.assertIn('uri.legacy.params', names)
+        self.assertIn('core.create', names)
+        self.assertIn('core.open', names)
+
+        result = report['results'][0]
+        for key in ('ops_per_sec', 'p50_ms', 'p99_ms', 'maxrss_kb'):
+            self.assertIsNotNone(result[key])
+        json.dumps(report)
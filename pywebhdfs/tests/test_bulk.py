@@ -0,0 +1,172 @@
+import unittest
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import bulk, errors, operations
+from pywebhdfs.fakehdfs import FakeWebHdfsServer, NAMENODE
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+class WhenTestingBatches(unittest.TestCase):
+
+    def test_repeated_paths_are_called_once(self):
+        batch = bulk.path_batch(['a', '/a/', 'b', 'a'])
+        self.assertEqual(['a', 'b'], batch.tasks)
+        results = batch.results([(1, None), (2, None)])
+        self.assertEqual(['a', '/a/', 'b', 'a'], [r.path for r in results])
+        self.assertEqual([1, 1, 2, 1], [r.result for r in results])
+
+    def test_parents_of_other_directories_are_skipped(self):
+        batch = bulk.make_dirs_batch(['x', 'x/y', 'x/y/z', 'w', 'x/v'])
+        self.assertEqual(['x/y/z', 'w', 'x/v'], batch.tasks)
+
+    def test_children_of_recursive_deletes_are_skipped(self):
+        paths = ['x/y/z', 'x', 'x/y', 'w']
+        self.assertEqual(['x', 'w'],
+                         bulk.delete_batch(paths, recursive=True).tasks)
+        self.assertEqual(paths,
+                         bulk.delete_batch(paths, recursive=False).tasks)
+
+    def test_errors_are_returned_per_task(self):
+        def check(task):
+            if task < 0:
+                raise ValueError(task)
+            return task * 2
+
+        outcomes = bulk.run(check, [1, -1, 3], concurrency=2)
+        self.assertEqual([(2, None), (6, None)], [outcomes[0], outcomes[2]])
+        self.assertIsInstance(outcomes[1][1], ValueError)
+
+
+class WhenTestingStatusLookup(unittest.TestCase):
+
+    def test_crowded_directories_are_listed(self):
+        lookup = bulk.StatusLookup(['d/a', 'd/b', 'e/a', '/', 'd/c'],
+                                   list_threshold=3)
+        self.assertEqual([(operations.GETFILESTATUS, 'd'),
+                          (operations.GETFILESTATUS, 'e/a'),
+                          (operations.GETFILESTATUS, '/')], lookup.tasks)
+        retry = lookup.resolve(lookup.tasks[:1], [(_directory(20), None)])
+        self.assertEqual([(operations.LISTSTATUS, 'd')], retry)
+
+        lookup = bulk.StatusLookup(['d/a', 'd/b', 'd/c'], list_threshold=3,
+                                   list_ratio=None)
+        self.assertEqual([(operations.LISTSTATUS, 'd')], lookup.tasks)
+
+    def test_few_children_of_large_directories_are_not_listed(self):
+        lookup = bulk.StatusLookup(['d', 'd/a', 'd/b'], list_threshold=2)
+        self.assertEqual([(operations.GETFILESTATUS, 'd')], lookup.tasks)
+        retry = lookup.resolve(lookup.tasks, [(_directory(1000), None)])
+        self.assertEqual([(operations.GETFILESTATUS, 'd/a'),
+                          (operations.GETFILESTATUS, 'd/b')], retry)
+        self.assertEqual((_directory(1000), None), lookup.outcomes[0])
+
+    def test_children_of_missing_directories_are_missing(self):
+        lookup = bulk.StatusLookup(['d/a', 'd/b'], list_threshold=2)
+        missing = errors.FileNotFound('missing')
+        self.assertEqual([], lookup.resolve(lookup.tasks,
+                                            [(None, missing)]))
+        self.assertEqual([(None, missing)] * 2, lookup.outcomes)
+
+    def test_unlistable_directories_fall_back_to_status(self):
+        lookup = bulk.StatusLookup(['d/a', 'd/b'], list_threshold=2,
+                                   list_ratio=None)
+        retry = lookup.resolve(lookup.tasks,
+                               [(None, errors.Unauthorized('denied'))])
+        self.assertEqual([(operations.GETFILESTATUS, 'd/a'),
+                          (operations.GETFILESTATUS, 'd/b')], retry)
+        self.assertEqual([], lookup.resolve(retry, [('a', None),
+                                                    ('b', None)]))
+        self.assertEqual([('a', None), ('b', None)], lookup.outcomes)
+
+
+def _directory(children):
+    return {'FileStatus': {'type': 'DIRECTORY', 'childrenNum': children}}
+
+
+class WhenTestingBulkOperations(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_make_dirs_and_status(self):
+        results = self.webhdfs.make_dirs_many(
+            ['data', 'data/a', 'data/b', 'data/a'], concurrency=4)
+        self.assertTrue(all(r.ok and r.result for r in results))
+        self.assertEqual(2, self.server.call_count(operations.MKDIRS,
+                                                   NAMENODE))
+
+        results = self.webhdfs.status_many(['data/a', 'missing'])
+        self.assertEqual('DIRECTORY', results[0].result['FileStatus']['type'])
+        self.assertFalse(results[1].ok)
+        self.assertIsInstance(results[1].error, errors.FileNotFound)
+
+    def test_status_from_listing_matches_file_status(self):
+        paths = ['data/file{0}'.format(index) for index in range(4)]
+        for path in paths:
+            self.webhdfs.create_file(path, path)
+
+        results = self.webhdfs.status_many(paths + ['data/missing'],
+                                           list_threshold=3)
+        self.assertEqual(1, self.server.call_count(operations.LISTSTATUS,
+                                                   NAMENODE))
+        # the status of data, which has 4 children
+        self.assertEqual(1, self.server.call_count(operations.GETFILESTATUS,
+                                                   NAMENODE))
+        expected = self.webhdfs.get_file_dir_status(paths[2])
+        self.assertEqual(expected, results[2].result)
+        self.assertIsInstance(results[4].error, errors.FileNotFound)
+
+    def test_rename_set_owner_and_delete(self):
+        for name in ('one', 'two'):
+            self.webhdfs.create_file('data/' + name, name)
+
+        results = self.webhdfs.rename_many([('data/one', '/data/uno'),
+                                            ('data/two', '/data/dos')])
+        self.assertEqual(['data/one', 'data/two'], [r.path for r in results])
+        self.assertTrue(all(r.ok for r in results))
+
+        results = self.webhdfs.set_owner_many(
+            ['data/uno', 'data/missing', 'data/dos'], 'etl', 'etl')
+        self.assertEqual([True, False, True], [r.ok for r in results])
+
+        results = self.webhdfs.delete_many(['data/uno', 'data'],
+                                           recursive=True)
+        self.assertEqual([True, True], [r.result for r in results])
+        self.assertEqual(1, self.server.call_count(operations.DELETE,
+                                                   NAMENODE))
+
+
+class WhenTestingBulkOperationsWithTornado(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingBulkOperationsWithTornado, self).setUp()
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingBulkOperationsWithTornado, self).tearDown()
+
+    @gen_test
+    def test_bulk_calls(self):
+        results = yield self.webhdfs.make_dirs_many(['a/b', 'a', 'c'],
+                                                    concurrency=2)
+        self.assertTrue(all(r.ok for r in results))
+
+        results = yield self.webhdfs.status_many(['a/b', 'c', 'missing'])
+        self.assertEqual([True, True, False], [r.ok for r in results])
+
+        results = yield self.webhdfs.delete_many(['a/b', 'a', 'c'],
+                                                 recursive=True)
+        self.assertEqual([True, True, True], [r.result for r in results])
+        self.assertEqual(2, self.server.call_count(operations.DELETE,
+                                                   NAMENODE))
@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from pywebhdfs import errors, operations
+from pywebhdfs.cache import ContentCache
+from pywebhdfs.fakehdfs import FakeWebHdfsServer, DATANODE, NAMENODE
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+class WhenTestingContentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.directory = tempfile.mkdtemp()
+        self.cache = ContentCache(self.directory, max_bytes=1000)
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       content_cache=self.cache,
+                                       **self.server.client_kwargs())
+        self.path = 'user/hdfs/reference.csv'
+        self.webhdfs.create_file(self.path, 'a,b\n1,2\n')
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def downloads(self):
+        return self.server.call_count(operations.OPEN, DATANODE)
+
+    def test_second_read_is_served_from_disk(self):
+        self.assertEqual('a,b\n1,2\n', self.webhdfs.read_file(self.path))
+        self.assertEqual('a,b\n1,2\n', self.webhdfs.read_file(self.path))
+        self.assertEqual(1, self.downloads())
+        self.assertEqual({'hits': 1, 'misses': 1, 'bytes_saved': 8},
+                         self.cache.stats())
+
+    def test_modified_file_is_downloaded_again(self):
+        self.webhdfs.read_file(self.path)
+        time.sleep(0.01)
+        self.webhdfs.create_file(self.path, 'changed', overwrite=True)
+        self.assertEqual('changed', self.webhdfs.read_file(self.path))
+        self.assertEqual(2, self.downloads())
+        data_files = [name for name in os.listdir(self.directory)
+                      if name.endswith('.data')]
+        self.assertEqual(1, len(data_files))
+
+    def test_ttl_skips_validation(self):
+        cache = ContentCache(self.directory, max_bytes=1000, ttl=60)
+        cache.read(self.webhdfs, self.path)
+        cache.read(self.webhdfs, self.path)
+        self.assertEqual(1, self.server.call_count(operations.GETFILESTATUS,
+                                                   NAMENODE))
+
+    def test_entries_are_shared_between_cache_instances(self):
+        self.webhdfs.read_file(self.path)
+        other = ContentCache(self.directory, max_bytes=1000)
+        self.assertEqual('a,b\n1,2\n', other.read(self.webhdfs, self.path))
+        self.assertEqual(1, self.downloads())
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for name in ('one', 'two', 'three'):
+            self.webhdfs.create_file(name, 'x' * 400)
+        self.cache.read(self.webhdfs, 'one')
+        time.sleep(0.01)
+        self.cache.read(self.webhdfs, 'two')
+        time.sleep(0.01)
+        self.cache.read(self.webhdfs, 'one')
+        time.sleep(0.01)
+        self.cache.read(self.webhdfs, 'three')
+
+        self.assertLessEqual(self.cache.evict(), 1000)
+        self.cache.read(self.webhdfs, 'one')
+        self.cache.read(self.webhdfs, 'two')
+        self.assertEqual(4, self.downloads())
+        self.assertEqual([], [name for name in os.listdir(self.directory)
+                              if name.endswith('.lock')])
+
+    def test_concurrent_readers_download_once(self):
+        threads = [threading.Thread(target=self.cache.read,
+                                    args=(self.webhdfs, self.path))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, self.downloads())
+        self.assertEqual(1, self.cache.stats()['misses'])
+        self.assertEqual([], [name for name in os.listdir(self.directory)
+                              if name.endswith('.lock')])
+
+    def test_mmap_of_cached_file(self):
+        mapped = self.cache.mmap(self.webhdfs, self.path)
+        self.assertEqual('a,b', mapped[:3])
+        mapped.close()
+
+    def test_ranged_reads_bypass_the_cache(self):
+        self.assertEqual('b', self.webhdfs.read_file(self.path, offset=2,
+                                                     length=1))
+        self.assertEqual({'hits': 0, 'misses': 0, 'bytes_saved': 0},
+                         self.cache.stats())
+
+    def test_changes_made_by_the_client_drop_entries(self):
+        cache = ContentCache(self.directory, max_bytes=1000, ttl=60)
+        webhdfs = PyWebHdfsClient(user_name='hdfs', content_cache=cache,
+                                  **self.server.client_kwargs())
+        webhdfs.read_file(self.path)
+        webhdfs.create_file(self.path, 'old', overwrite=True)
+        self.assertEqual('old', webhdfs.read_file(self.path))
+        webhdfs.append_file(self.path, ',new')
+        self.assertEqual('old,new', webhdfs.read_file(self.path))
+
+        webhdfs.rename_file_dir(self.path, '/moved.csv')
+        self.assertRaises(errors.FileNotFound, webhdfs.read_file, self.path)
+        self.assertEqual('old,new', webhdfs.read_file('moved.csv'))
+        webhdfs.delete_file_dir('moved.csv')
+        self.assertRaises(errors.FileNotFound, webhdfs.read_file,
+                          'moved.csv')
+
+    def test_entries_are_kept_apart_per_user(self):
+        cache = ContentCache(self.directory, max_bytes=1000, ttl=60)
+        cache.read(self.webhdfs, self.path)
+        other = PyWebHdfsClient(user_name='other',
+                                **self.server.client_kwargs())
+        cache.read(other, self.path)
+        self.assertEqual(2, self.downloads())
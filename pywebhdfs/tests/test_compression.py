@@ -0,0 +1,123 @@
+import gzip
+import unittest
+from StringIO import StringIO
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import compression, errors
+from pywebhdfs.fakehdfs import FakeWebHdfsServer
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+DATA = ''.join('line {0} of the log\n'.format(i) for i in range(20000))
+
+
+class WhenTestingCodecs(unittest.TestCase):
+
+    def test_codecs_round_trip_incrementally(self):
+        for name in ('gzip', 'deflate', 'bzip2'):
+            codec = compression.get_codec(name)
+            compressed = compression.CompressingReader(
+                DATA, codec, chunk_size=1000).read()
+            reader = compression.DecompressingReader(
+                StringIO(compressed), codec, chunk_size=100)
+            self.assertEqual(DATA[:10], reader.read(10))
+            self.assertEqual(DATA[10:], reader.read())
+
+    def test_parallel_compression_concatenates_streams(self):
+        for name in ('gzip', 'bzip2'):
+            codec = compression.get_codec(name)
+            compressed = ''.join(compression.CompressingReader(
+                StringIO(DATA), codec, threads=3, block_size=10000))
+            self.assertEqual(DATA, compression.decompress(compressed, name))
+        gzipped = compression.CompressingReader(
+            DATA, compression.get_codec('gzip'), threads=3, block_size=10000)
+        self.assertEqual(
+            DATA, gzip.GzipFile(fileobj=StringIO(gzipped.read())).read())
+
+    def test_codec_is_picked_from_extension(self):
+        self.assertEqual('gzip', compression.resolve(
+            compression.AUTO, 'logs/a.log.GZ').name)
+        self.assertEqual('bzip2', compression.resolve(
+            compression.AUTO, 'logs/a.bz2').name)
+        self.assertIsNone(compression.resolve(compression.AUTO, 'a.log'))
+        self.assertIsNone(compression.resolve(None, 'a.gz'))
+
+    def test_unknown_codec_raises(self):
+        with self.assertRaises(ValueError):
+            compression.get_codec('lzma')
+
+    @unittest.skipIf(compression.snappy is None, 'python-snappy missing')
+    def test_snappy_uses_hadoop_block_framing(self):
+        codec = compression.SnappyCodec(block_size=1000)
+        compressed = compression.CompressingReader(DATA, codec).read()
+        self.assertEqual('\x00\x00\x03\xe8', compressed[:4])
+        self.assertEqual(DATA, compression.decompress(compressed, codec))
+        with self.assertRaises(errors.PyWebHdfsException):
+            compression.decompress(compressed[:-1], codec)
+
+    @unittest.skipIf(compression.zstandard is None, 'zstandard missing')
+    def test_zstd_frames_are_concatenated(self):
+        compressed = compression.CompressingReader(
+            DATA, compression.get_codec('zstd'), threads=2,
+            block_size=10000).read()
+        self.assertEqual(DATA, compression.decompress(compressed, 'zstd'))
+
+
+class WhenTestingCompressedStreams(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_write_and_read_stream(self):
+        path = 'user/hdfs/logs/access.log.gz'
+        self.webhdfs.write_stream(path, StringIO(DATA), threads=2)
+
+        compressed = self.webhdfs.read_file(path)
+        self.assertLess(len(compressed), len(DATA))
+        stream = self.webhdfs.read_stream(path)
+        self.assertEqual(DATA, stream.read())
+
+    def test_raw_stream_without_codec(self):
+        self.webhdfs.create_file('user/hdfs/a.gz', 'not compressed')
+        stream = self.webhdfs.read_stream('user/hdfs/a.gz', codec=None,
+                                          offset=4)
+        self.assertEqual('compressed', stream.read())
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(errors.FileNotFound):
+            self.webhdfs.read_stream('user/hdfs/missing.gz')
+
+
+class WhenTestingCompressedStreamsWithTornado(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingCompressedStreamsWithTornado, self).setUp()
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingCompressedStreamsWithTornado, self).tearDown()
+
+    @gen_test
+    def test_write_and_read_stream(self):
+        path = 'user/hdfs/logs/access.log.bz2'
+        yield self.webhdfs.write_stream(path, StringIO(DATA))
+
+        chunks = []
+        yield self.webhdfs.read_stream(path, chunks.append)
+        self.assertEqual(DATA, ''.join(chunks))
+
+    @gen_test
+    def test_missing_file_raises(self):
+        with self.assertRaises(errors.FileNotFound):
+            yield self.webhdfs.read_stream('user/hdfs/missing.gz', list)
@@ -0,0 +1,130 @@
+import json
+import unittest
+
+from pywebhdfs import operations
+from pywebhdfs.container import (ContainerReader, ContainerWriter, Index,
+                                 IndexCache, index_path)
+from pywebhdfs.fakehdfs import DATANODE, FakeWebHdfsServer
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+class WhenTestingIndexCache(unittest.TestCase):
+
+    def test_least_recently_used_index_is_dropped(self):
+        cache = IndexCache(max_entries=2)
+        cache.set('a', (1, 1), 1)
+        cache.set('b', (1, 1), 2)
+        cache.get('a', (1, 1))
+        cache.set('c', (1, 1), 3)
+        self.assertIsNone(cache.get('b', (1, 1)))
+        self.assertEqual(1, cache.get('a', (1, 1)))
+        cache.discard('a')
+        self.assertIsNone(cache.get('a', (1, 1)))
+
+    def test_indexes_of_other_versions_are_not_returned(self):
+        cache = IndexCache()
+        cache.set('a', (10, 1), 1)
+        self.assertIsNone(cache.get('a', (10, 2)))
+        self.assertIsNone(cache.get('a', (10, 1)))
+
+
+class WhenTestingContainers(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+        self.path = 'packs/blobs.pack'
+        self.cache = IndexCache()
+        self.members = [('m{0}'.format(i), chr(97 + i % 26) * (i + 1))
+                        for i in xrange(40)]
+        with ContainerWriter(self.webhdfs, self.path, buffer_bytes=100,
+                             index_cache=self.cache) as writer:
+            for name, data in self.members:
+                writer.add(name, data)
+        self.reader = ContainerReader(self.webhdfs, self.path,
+                                      index_cache=self.cache)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_members_are_packed_into_one_file(self):
+        listing = self.webhdfs.list_dir('packs')['FileStatuses']
+        self.assertEqual(['blobs.pack', 'blobs.pack.index'],
+                         sorted(status['pathSuffix']
+                                for status in listing['FileStatus']))
+        length = self.webhdfs.get_file_dir_status(
+            self.path)['FileStatus']['length']
+        self.assertEqual(sum(len(data) for _, data in self.members), length)
+        index = json.loads(self.webhdfs.read_file(index_path(self.path)))
+        self.assertEqual(['m0', 0, 1], index['members'][0])
+
+    def test_members_are_read_with_one_ranged_open(self):
+        self.server.reset_calls()
+        self.assertEqual('f' * 6, self.reader.read('m5'))
+        self.assertEqual('m5', self.reader.names()[5])
+        self.assertIn('m39', self.reader)
+        self.assertEqual(40, len(self.reader))
+        # the index is loaded once, then one OPEN per member
+        self.assertEqual(2, self.server.call_count(operations.OPEN,
+                                                   DATANODE))
+        self.assertRaises(KeyError, self.reader.read, 'missing')
+
+    def test_nearby_members_are_coalesced(self):
+        self.reader.index
+        self.server.reset_calls()
+        names = ['m3', 'm1', 'm2', 'm10', 'm11', 'm1']
+        data = self.reader.read_many(names)
+        self.assertEqual(dict(self.members[i] for i in (1, 2, 3, 10, 11)),
+                         data)
+        self.assertEqual(1, self.server.call_count(operations.OPEN,
+                                                   DATANODE))
+
+        adjacent = ContainerReader(self.webhdfs, self.path, gap=0,
+                                   index_cache=self.cache)
+        self.assertEqual(data, adjacent.read_many(names))
+        self.assertEqual(3, self.server.call_count(operations.OPEN,
+                                                   DATANODE))
+
+    def test_rewriting_a_container_drops_its_cached_index(self):
+        self.reader.read('m0')
+        with ContainerWriter(self.webhdfs, self.path, overwrite=True,
+                             index_cache=self.cache) as writer:
+            writer.add('only', 'new data')
+        self.assertEqual(['only'], self.reader.names())
+        self.assertEqual('new data', self.reader.read('only'))
+
+    def test_containers_rewritten_elsewhere_are_not_read_with_old_index(self):
+        self.reader.read('m0')
+        # another process, with its own cache
+        with ContainerWriter(self.webhdfs, self.path, overwrite=True,
+                             index_cache=IndexCache()) as writer:
+            writer.add('m0', 'new data')
+        self.assertEqual('new data', self.reader.read('m0'))
+        self.assertEqual(['m0'], self.reader.names())
+
+    def test_index_not_matching_the_data_is_refused(self):
+        self.webhdfs.create_file(self.path, 'shorter', overwrite=True)
+        self.assertRaises(ValueError, self.reader.read, 'm0')
+
+    def test_duplicate_members_are_refused(self):
+        writer = ContainerWriter(self.webhdfs, 'packs/other.pack')
+        writer.add('a', 'x')
+        self.assertRaises(ValueError, writer.add, 'a', 'y')
+        self.assertEqual(['a'], writer.close().names)
+
+    def test_members_must_be_bytes(self):
+        writer = ContainerWriter(self.webhdfs, 'packs/other.pack')
+        self.assertRaises(TypeError, writer.add, 'u', u'caf\xe9')
+        self.assertEqual((0, 2), writer.add('b', bytearray('ab')))
+        self.assertEqual((2, 5), writer.add('e', u'caf\xe9'.encode('utf-8')))
+        writer.close()
+        reader = ContainerReader(self.webhdfs, 'packs/other.pack')
+        self.assertEqual('caf\xc3\xa9', reader.read('e'))
+
+    def test_index_round_trip(self):
+        index = Index(['a', 'b'], {'a': (0, 1), 'b': (1, 2)})
+        loaded = Index.from_json(index.to_json())
+        self.assertEqual((['a', 'b'], {'a': (0, 1), 'b': (1, 2)}),
+                         (loaded.names, loaded.ranges))
+        self.assertRaises(ValueError, Index.from_json, '{"version": 9}')
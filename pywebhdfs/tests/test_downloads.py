@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from pywebhdfs import errors, operations
+from pywebhdfs.downloads import parts, progress_path, write_at
+from pywebhdfs.fakehdfs import DATANODE, FakeWebHdfsServer
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+DATA = ''.join(chr(i % 251) for i in xrange(10000))
+
+
+class WhenTestingDownloadParts(unittest.TestCase):
+
+    def test_parts_cover_the_file(self):
+        self.assertEqual([(0, 4), (4, 4), (8, 2)], parts(10, 4))
+        self.assertEqual([], parts(0, 4))
+
+    def test_positioned_writes(self):
+        local = tempfile.mkdtemp()
+        try:
+            target = os.path.join(local, 'f')
+            fd = os.open(target, os.O_RDWR | os.O_CREAT)
+            try:
+                os.ftruncate(fd, 6)
+                write_at(fd, 4, bytearray('ef'))
+                write_at(fd, 0, 'abcd')
+            finally:
+                os.close(fd)
+            with open(target, 'rb') as written:
+                self.assertEqual('abcdef', written.read())
+        finally:
+            shutil.rmtree(local)
+
+
+class WhenTestingDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+        self.webhdfs.create_file('data/file.bin', DATA)
+        self.local = tempfile.mkdtemp()
+        self.target = os.path.join(self.local, 'file.bin')
+        self.server.reset_calls()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.local)
+
+    def read_target(self):
+        with open(self.target, 'rb') as target:
+            return target.read()
+
+    def test_parts_are_fetched_in_parallel(self):
+        self.assertEqual(len(DATA), self.webhdfs.download(
+            'data/file.bin', self.target, threads=3, part_size=1000))
+        self.assertEqual(DATA, self.read_target())
+        self.assertEqual(10, self.server.call_count(operations.OPEN,
+                                                    DATANODE))
+        self.assertFalse(os.path.exists(progress_path(self.target)))
+
+    def test_parts_are_streamed_in_chunks(self):
+        self.webhdfs.download('data/file.bin', self.target, threads=2,
+                              part_size=4096, chunk_size=100)
+        self.assertEqual(DATA, self.read_target())
+        self.assertEqual(3, self.server.call_count(operations.OPEN,
+                                                   DATANODE))
+
+    def test_interrupted_download_resumes(self):
+        self.server.inject_fault(operation=operations.OPEN, role=DATANODE,
+                                 count=2)
+        self.assertRaises(errors.PyWebHdfsException, self.webhdfs.download,
+                          'data/file.bin', self.target, threads=1,
+                          part_size=1000)
+        with open(progress_path(self.target)) as sidecar:
+            self.assertEqual(8, len(json.load(sidecar)['done']))
+
+        self.server.reset_calls()
+        self.webhdfs.download('data/file.bin', self.target, part_size=1000)
+        self.assertEqual(DATA, self.read_target())
+        self.assertEqual(2, self.server.call_count(operations.OPEN,
+                                                   DATANODE))
+        self.assertFalse(os.path.exists(progress_path(self.target)))
+
+    def test_changed_file_starts_over(self):
+        self.server.inject_fault(operation=operations.OPEN, role=DATANODE)
+        self.assertRaises(errors.PyWebHdfsException, self.webhdfs.download,
+                          'data/file.bin', self.target, threads=1,
+                          part_size=1000)
+        self.webhdfs.create_file('data/file.bin', DATA[:2500],
+                                 overwrite=True)
+        self.server.reset_calls()
+        self.webhdfs.download('data/file.bin', self.target, part_size=1000)
+        self.assertEqual(DATA[:2500], self.read_target())
+        self.assertEqual(3, self.server.call_count(operations.OPEN,
+                                                   DATANODE))
+
+    def test_empty_file(self):
+        self.webhdfs.create_file('data/empty', '')
+        self.assertEqual(0, self.webhdfs.download('data/empty', self.target))
+        self.assertEqual('', self.read_target())
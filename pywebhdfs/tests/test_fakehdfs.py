@@ -0,0 +1,185 @@
+import httplib
+import json
+import time
+import unittest
+
+import requests
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import errors, operations
+from pywebhdfs.fakehdfs import FakeWebHdfsServer, DATANODE, NAMENODE
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+class WhenTestingFakeWebHdfsServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer(datanodes=2).start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+        self.path = 'user/hdfs/file.txt'
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_create_and_read_through_datanode(self):
+        self.assertTrue(self.webhdfs.create_file(self.path, '0123456789'))
+
+        self.assertEqual('0123456789', self.webhdfs.read_file(self.path))
+        self.assertEqual('345', self.webhdfs.read_file(self.path, offset=3,
+                                                       length=3))
+        self.assertEqual(1, self.server.call_count(operations.CREATE,
+                                                   DATANODE))
+        self.assertEqual(2, self.server.call_count(operations.OPEN,
+                                                   DATANODE))
+
+    def test_create_streams_file_like_objects(self):
+        with open(__file__, 'rb') as source:
+            self.webhdfs.create_file(self.path, source)
+        with open(__file__, 'rb') as source:
+            self.assertEqual(source.read(), self.webhdfs.read_file(self.path))
+
+    def test_append_to_file(self):
+        self.webhdfs.create_file(self.path, 'abc')
+        self.webhdfs.append_file(self.path, 'def')
+        self.assertEqual('abcdef', self.webhdfs.read_file(self.path))
+
+    def test_data_locations_are_fetched_ahead_and_reused(self):
+        location = self.webhdfs.get_data_location(
+            self.path, operations.CREATE, overwrite=True)
+        self.assertIn('overwrite=true', location)
+        self.assertNotIn('noredirect', location)
+        self.assertEqual(0, self.server.call_count(operations.CREATE,
+                                                   DATANODE))
+
+        self.server.inject_fault(operation=operations.CREATE, role=DATANODE)
+        self.assertRaises(errors.PyWebHdfsException,
+                          self.webhdfs.create_file, self.path, 'abc',
+                          overwrite=True, location=location)
+        self.assertTrue(self.webhdfs.create_file(
+            self.path, 'abc', overwrite=True, location=location))
+        self.assertEqual(1, self.server.call_count(operations.CREATE,
+                                                   NAMENODE))
+
+        location = self.webhdfs.get_data_location(
+            self.path, operations.OPEN, offset=1)
+        self.assertEqual('bc', self.webhdfs.read_file(self.path,
+                                                      location=location))
+        location = self.webhdfs.get_data_location(self.path,
+                                                  operations.APPEND)
+        self.webhdfs.append_file(self.path, 'd', location=location)
+        self.assertEqual('abcd', self.webhdfs.read_file(self.path))
+
+    def test_namespace_operations(self):
+        self.webhdfs.make_dir('user/hdfs/dir')
+        self.webhdfs.create_file(self.path, 'abc')
+        self.webhdfs.rename_file_dir(self.path, '/user/hdfs/dir/moved.txt')
+        self.webhdfs.set_owner('user/hdfs/dir/moved.txt', 'alice', 'staff')
+
+        listing = self.webhdfs.list_dir('user/hdfs/dir')
+        status, = listing['FileStatuses']['FileStatus']
+        self.assertEqual('moved.txt', status['pathSuffix'])
+        self.assertEqual(3, status['length'])
+        self.assertEqual('alice', status['owner'])
+        self.assertEqual('staff', status['group'])
+
+        self.webhdfs.delete_file_dir('user/hdfs', recursive=True)
+        with self.assertRaises(errors.FileNotFound):
+            self.webhdfs.get_file_dir_status('user/hdfs/dir')
+
+    def test_errors_are_remote_exceptions(self):
+        response = requests.get(
+            'http://{host}:{port}/webhdfs/v1/missing?op=GETFILESTATUS'.format(
+                **self.server.client_kwargs()))
+        self.assertEqual(httplib.NOT_FOUND, response.status_code)
+        remote = response.json()['RemoteException']
+        self.assertEqual('FileNotFoundException', remote['exception'])
+        self.assertEqual('java.io.FileNotFoundException',
+                         remote['javaClassName'])
+
+    def test_file_system_errors_are_remote_exceptions(self):
+        self.webhdfs.create_file(self.path, 'abc')
+        with self.assertRaises(errors.PyWebHdfsException) as raised:
+            self.webhdfs.make_dir(self.path + '/sub')
+        self.assertIn('FileAlreadyExistsException', str(raised.exception))
+        with self.assertRaises(errors.PyWebHdfsException):
+            self.webhdfs.create_file(self.path + '/sub/file', 'abc')
+        self.assertEqual('abc', self.webhdfs.read_file(self.path))
+
+    def test_create_refuses_to_overwrite(self):
+        self.webhdfs.create_file(self.path, 'abc')
+        with self.assertRaises(errors.PyWebHdfsException):
+            self.webhdfs.create_file(self.path, 'def')
+        self.webhdfs.create_file(self.path, 'def', overwrite=True)
+        self.assertEqual('def', self.webhdfs.read_file(self.path))
+
+    def test_injected_fault_fails_matching_requests(self):
+        self.server.inject_fault(operation=operations.MKDIRS,
+                                 status=httplib.BAD_REQUEST, count=1)
+        with self.assertRaises(errors.BadRequest):
+            self.webhdfs.make_dir('user/hdfs/dir')
+        self.assertTrue(self.webhdfs.make_dir('user/hdfs/dir'))
+
+    def test_injected_datanode_fault(self):
+        self.server.inject_fault(operation=operations.CREATE, role=DATANODE,
+                                 count=None)
+        with self.assertRaises(errors.PyWebHdfsException):
+            self.webhdfs.create_file(self.path, 'abc')
+        self.assertEqual(1, self.server.call_count(operations.CREATE,
+                                                   NAMENODE))
+
+    def test_latency_delays_requests(self):
+        self.server.latency = 0.05
+        start = time.time()
+        self.webhdfs.make_dir('user/hdfs/dir')
+        self.assertGreaterEqual(time.time() - start, 0.05)
+
+    def test_concat_appends_sources(self):
+        self.webhdfs.create_file(self.path, 'abc')
+        self.webhdfs.create_file('user/hdfs/part', 'def')
+        response = requests.post(
+            'http://{host}:{port}/webhdfs/v1/{path}?op=CONCAT'
+            '&sources=/user/hdfs/part'.format(path=self.path,
+                                              **self.server.client_kwargs()))
+        self.assertEqual(httplib.OK, response.status_code)
+        self.assertEqual('abcdef', self.webhdfs.read_file(self.path))
+        self.assertEqual({}, json.loads(response.content))
+
+
+class WhenTestingFakeWebHdfsServerWithTornado(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingFakeWebHdfsServerWithTornado, self).setUp()
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingFakeWebHdfsServerWithTornado, self).tearDown()
+
+    @gen_test
+    def test_create_append_and_read(self):
+        path = 'user/hdfs/file.txt'
+        yield self.webhdfs.create_file(path, 'abc')
+        yield self.webhdfs.append_file(path, 'def')
+        data = yield self.webhdfs.read_file(path)
+        self.assertEqual('abcdef', data)
+
+        status = yield self.webhdfs.get_file_dir_status(path)
+        self.assertEqual(6, status['FileStatus']['length'])
+
+    @gen_test
+    def test_data_locations(self):
+        path = 'user/hdfs/file.txt'
+        location = yield self.webhdfs.get_data_location(path,
+                                                        operations.CREATE)
+        yield self.webhdfs.create_file(path, 'abc', location=location)
+        location = yield self.webhdfs.get_data_location(path,
+                                                        operations.OPEN)
+        data = yield self.webhdfs.read_file(path, location=location)
+        self.assertEqual('abc', data)
+        self.assertEqual(1, self.server.call_count(operations.CREATE,
+                                                   NAMENODE))
@@ -0,0 +1,102 @@
+import unittest
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import errors, globbing, operations
+from pywebhdfs.fakehdfs import FakeWebHdfsServer, NAMENODE
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+class WhenTestingGlobComponents(unittest.TestCase):
+
+    def matches(self, pattern, name):
+        return globbing.Component(pattern).regex.match(name) is not None
+
+    def test_wildcards(self):
+        self.assertTrue(self.matches('part-*.gz', 'part-00001.gz'))
+        self.assertFalse(self.matches('part-*.gz', 'part-00001.gz.tmp'))
+        self.assertTrue(self.matches('0?', '07'))
+        self.assertTrue(self.matches('[0-3][!5]', '14'))
+        self.assertFalse(self.matches('[0-3][!5]', '15'))
+        self.assertTrue(self.matches('{a*,b?}', 'bc'))
+        self.assertFalse(self.matches('{a*,b?}', 'bcd'))
+        self.assertTrue(self.matches('\\**', '*x'))
+        self.assertFalse(self.matches('\\**', 'x'))
+
+    def test_literal_alternatives_are_not_listed(self):
+        component = globbing.Component('{2025,2026,20{25,27}}')
+        self.assertTrue(component.literal)
+        self.assertEqual(['2025', '2026', '2027'], component.names)
+        self.assertEqual(['a*b'], globbing.Component('a\\*b').names)
+
+    def test_literal_levels_are_skipped(self):
+        expansion = globbing.Glob('data/{2025,2026}/*/events')
+        self.assertEqual([(operations.LISTSTATUS, 'data/2025'),
+                          (operations.LISTSTATUS, 'data/2026')],
+                         expansion.tasks)
+        self.assertEqual([(operations.GETFILESTATUS, 'data/x')],
+                         globbing.Glob('data/x').tasks)
+
+    def test_errors_other_than_missing_paths_are_raised(self):
+        expansion = globbing.Glob('data/*')
+        with self.assertRaises(errors.Unauthorized):
+            expansion.resolve(expansion.tasks,
+                              [(None, errors.Unauthorized('denied'))])
+
+
+class WhenTestingGlob(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+        for path in ('data/2026/01/events/part-0.gz',
+                     'data/2026/01/events/part-1.gz',
+                     'data/2026/01/other/part-0.gz',
+                     'data/2026/02/events/part-0.gz',
+                     'data/2026/02/events/_SUCCESS',
+                     'data/2026/03'):
+            self.webhdfs.create_file(path, 'x')
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_only_matching_directories_are_listed(self):
+        self.server.reset_calls()
+        self.assertEqual(['data/2026/01/events/part-0.gz',
+                          'data/2026/01/events/part-1.gz',
+                          'data/2026/02/events/part-0.gz'],
+                         self.webhdfs.glob('data/2026/*/events/part-*.gz'))
+        # data/2026, then the two events directories; 03 is a file
+        self.assertEqual(3, self.server.call_count(operations.LISTSTATUS,
+                                                   NAMENODE))
+        self.assertEqual(0, self.server.call_count(operations.GETFILESTATUS,
+                                                   NAMENODE))
+
+    def test_literal_patterns_and_missing_paths(self):
+        self.assertEqual(['/data/2026/03'],
+                         self.webhdfs.glob('/data/2026/0[3-9]'))
+        self.assertEqual(['data/2026/02/events/_SUCCESS'],
+                         self.webhdfs.glob('data/2026/{02,04}/*/_SUCCESS'))
+        self.assertEqual([], self.webhdfs.glob('missing/*/x'))
+
+
+class WhenTestingGlobWithTornado(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingGlobWithTornado, self).setUp()
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingGlobWithTornado, self).tearDown()
+
+    @gen_test
+    def test_glob(self):
+        yield self.webhdfs.make_dirs_many(['logs/a', 'logs/b', 'logs/c'])
+        matches = yield self.webhdfs.glob('logs/[ab]')
+        self.assertEqual(['logs/a', 'logs/b'], matches)
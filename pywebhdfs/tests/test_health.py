@@ -0,0 +1,166 @@
+import time
+import unittest
+from StringIO import StringIO
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import errors, operations
+from pywebhdfs.fakehdfs import DATANODE, FakeWebHdfsServer, NAMENODE
+from pywebhdfs.health import CLOSED, DatanodeHealth, HALF_OPEN, OPEN
+from pywebhdfs.metrics import MetricsRegistry
+from pywebhdfs.ratelimit import RateLimiter
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+class WhenTestingDatanodeHealth(unittest.TestCase):
+
+    def test_circuit_opens_on_the_error_rate(self):
+        metrics = MetricsRegistry()
+        health = DatanodeHealth(min_calls=4, error_rate=0.5,
+                                metrics=metrics)
+        for failed in (False, True, False):
+            health.record('dn1:1', 0.01, failed)
+        self.assertEqual(CLOSED, health.state('dn1:1'))
+        health.record('dn1:1', 0.01, True)
+        self.assertEqual(OPEN, health.state('dn1:1'))
+        self.assertFalse(health.available('dn1:1'))
+        self.assertTrue(health.available('dn2:1'))
+        self.assertEqual(['dn1:1'], health.excluded())
+        self.assertEqual(1, metrics.gauges()['datanode_health_open_circuits'])
+
+    def test_slow_requests_count_as_failures(self):
+        health = DatanodeHealth(min_calls=2, slow_latency=1.0)
+        health.record('dn1:1', 2.0)
+        health.record('dn1:1', 0.1)
+        self.assertEqual(OPEN, health.state('dn1:1'))
+
+    def test_a_single_probe_closes_or_reopens_the_circuit(self):
+        health = DatanodeHealth(min_calls=1, open_seconds=0.05)
+        health.record('dn1:1', 0.01, True)
+        time.sleep(0.06)
+        self.assertTrue(health.available('dn1:1'))
+        self.assertEqual(HALF_OPEN, health.state('dn1:1'))
+        self.assertFalse(health.available('dn1:1'))
+        health.record('dn1:1', 0.01, True)
+        self.assertEqual(OPEN, health.state('dn1:1'))
+
+        time.sleep(0.06)
+        self.assertTrue(health.available('dn1:1'))
+        health.record('dn1:1', 0.01)
+        self.assertEqual(CLOSED, health.state('dn1:1'))
+        self.assertEqual([], health.excluded())
+
+
+class WhenTestingDatanodeRouting(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer(datanodes=2).start()
+        self.health = DatanodeHealth(min_calls=1, timeout=0.2)
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       datanode_health=self.health,
+                                       **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_create_is_routed_around_a_failing_datanode(self):
+        sick = self.server.datanodes[0]
+        self.server.inject_fault(operation=operations.CREATE, role=DATANODE,
+                                 datanode=0, count=None)
+        self.assertTrue(self.webhdfs.create_file('a', 'data'))
+        self.assertEqual(2, self.server.call_count(operations.CREATE,
+                                                   NAMENODE))
+        self.assertEqual(2, self.server.call_count(operations.CREATE,
+                                                   DATANODE))
+        self.assertEqual([sick], self.health.excluded())
+
+        # the open circuit is avoided without contacting the datanode
+        self.server.reset_calls()
+        self.webhdfs.create_file('b', 'data')
+        self.assertEqual(1, self.server.call_count(operations.CREATE,
+                                                   DATANODE))
+        self.assertEqual('data', self.webhdfs.read_file('b'))
+
+    def test_hanging_datanode_times_out(self):
+        self.webhdfs.create_file('a', 'data')
+        self.server.reset_calls()
+        self.server.inject_fault(operation=operations.OPEN, role=DATANODE,
+                                 datanode=1, status=None, delay=0.5)
+        self.webhdfs.read_file('a')
+        self.assertEqual('data', self.webhdfs.read_file('a'))
+        self.assertEqual(3, self.server.call_count(operations.OPEN,
+                                                   DATANODE))
+        self.assertEqual([self.server.datanodes[1]], self.health.excluded())
+
+    def test_appends_are_not_repeated(self):
+        self.webhdfs.create_file('a', 'data')
+        self.server.inject_fault(operation=operations.APPEND, role=DATANODE,
+                                 count=None)
+        self.assertRaises(errors.PyWebHdfsException,
+                          self.webhdfs.append_file, 'a', 'more')
+        self.assertEqual(1, self.server.call_count(operations.APPEND,
+                                                   DATANODE))
+
+    def test_located_datanode_is_probed_when_used(self):
+        health = DatanodeHealth(min_calls=1, open_seconds=0.2)
+        webhdfs = PyWebHdfsClient(user_name='hdfs', datanode_health=health,
+                                  **self.server.client_kwargs())
+        sick = self.server.datanodes[0]
+        health.record(sick, 0.0, failed=True)
+        self.assertEqual(OPEN, health.state(sick))
+        time.sleep(0.25)
+
+        location = webhdfs.get_data_location('a', operations.CREATE)
+        self.assertIn(sick, location)
+        self.assertEqual(OPEN, health.state(sick))
+        self.assertTrue(webhdfs.create_file('a', 'data', location=location))
+        self.assertEqual(1, self.server.call_count(operations.CREATE,
+                                                   NAMENODE))
+        self.assertEqual(CLOSED, health.state(sick))
+
+    def test_rate_limited_uploads_are_not_slow_datanodes(self):
+        health = DatanodeHealth(min_calls=1, slow_latency=0.3)
+        webhdfs = PyWebHdfsClient(
+            user_name='hdfs', datanode_health=health,
+            rate_limiter=RateLimiter(data_rate=1000, data_burst=100),
+            **self.server.client_kwargs())
+        started = time.time()
+        webhdfs.create_file('a', 'x' * 500)
+        webhdfs.create_file('b', StringIO('x' * 500))
+        self.assertGreater(time.time() - started, 0.6)
+        self.assertEqual([], health.excluded())
+        for datanode in self.server.datanodes:
+            self.assertEqual(CLOSED, health.state(datanode))
+
+
+class WhenTestingDatanodeRoutingWithTornado(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingDatanodeRoutingWithTornado, self).setUp()
+        self.server = FakeWebHdfsServer(datanodes=2).start()
+        self.health = DatanodeHealth(min_calls=1, timeout=0.2)
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', datanode_health=self.health,
+            **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingDatanodeRoutingWithTornado, self).tearDown()
+
+    @gen_test
+    def test_failing_and_hanging_datanodes_are_avoided(self):
+        self.server.inject_fault(operation=operations.CREATE, role=DATANODE,
+                                 datanode=0)
+        result = yield self.webhdfs.create_file('a', 'data')
+        self.assertTrue(result)
+        self.assertEqual(2, self.server.call_count(operations.CREATE,
+                                                   NAMENODE))
+
+        self.server.inject_fault(operation=operations.OPEN, role=DATANODE,
+                                 datanode=1, status=None, delay=0.5)
+        data = yield self.webhdfs.read_file('a')
+        self.assertEqual('data', data)
+        self.assertEqual(sorted(self.server.datanodes),
+                         self.health.excluded())
@@ -0,0 +1,175 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from pywebhdfs import operations
+from pywebhdfs.fakehdfs import FakeWebHdfsServer, NAMENODE
+from pywebhdfs.metadata_cache import (InMemoryMetadataCache,
+                                      SharedMetadataCache)
+from pywebhdfs.protocol import cache_key, invalidated_keys
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+def _fill(path, count):
+    cache = SharedMetadataCache(path, slots=64, slot_size=256)
+    for index in range(count):
+        cache.set('key{0}'.format(index), 'value{0}'.format(index))
+    cache.close()
+
+
+class WhenTestingCacheKeys(unittest.TestCase):
+
+    def test_keys_ignore_leading_and_trailing_slashes(self):
+        self.assertEqual('GETFILESTATUS /user/hdfs',
+                         cache_key(operations.GETFILESTATUS, 'user/hdfs/'))
+        self.assertEqual(cache_key(operations.LISTSTATUS, '/user/hdfs'),
+                         cache_key(operations.LISTSTATUS, 'user/hdfs'))
+
+    def test_changes_invalidate_the_parent_directory(self):
+        keys = invalidated_keys('user/hdfs/file.txt')
+        self.assertIn('GETFILESTATUS /user/hdfs/file.txt', keys)
+        self.assertIn('LISTSTATUS /user/hdfs', keys)
+        self.assertIn('GETFILESTATUS /user/hdfs', keys)
+        self.assertIn('LISTSTATUS /', invalidated_keys('top'))
+
+    def test_keys_are_scoped_to_a_namespace(self):
+        namespace = 'http://nn1:50070/webhdfs/v1/ hdfs'
+        self.assertEqual(namespace + ' LISTSTATUS /a',
+                         cache_key(operations.LISTSTATUS, 'a', namespace))
+        self.assertIn(namespace + ' LISTSTATUS /',
+                      invalidated_keys('a', namespace))
+
+
+class WhenTestingInMemoryMetadataCache(unittest.TestCase):
+
+    def test_entries_expire(self):
+        cache = InMemoryMetadataCache(ttl=60)
+        cache.set('a', '1')
+        cache.set('b', '2', ttl=-1)
+        self.assertEqual('1', cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        cache.delete('a')
+        self.assertIsNone(cache.get('a'))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = InMemoryMetadataCache(max_entries=2)
+        cache.set('a', '1')
+        cache.set('b', '2')
+        cache.get('a')
+        cache.set('c', '3')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual('1', cache.get('a'))
+
+
+class WhenTestingSharedMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'metadata')
+        self.cache = SharedMetadataCache(self.path, slots=64, slot_size=256)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def test_entries_are_visible_to_other_instances(self):
+        self.cache.set('GETFILESTATUS /a', '{"FileStatus": {}}')
+        other = SharedMetadataCache(self.path)
+        self.assertEqual((64, 256), (other.slots, other.slot_size))
+        self.assertEqual('{"FileStatus": {}}', other.get('GETFILESTATUS /a'))
+        other.delete('GETFILESTATUS /a')
+        other.close()
+        self.assertIsNone(self.cache.get('GETFILESTATUS /a'))
+
+    def test_entries_written_by_other_processes(self):
+        process = multiprocessing.Process(target=_fill, args=(self.path, 20))
+        process.start()
+        process.join()
+        self.assertEqual(0, process.exitcode)
+        found = [self.cache.get('key{0}'.format(index))
+                 for index in range(20)]
+        self.assertEqual(['value{0}'.format(index) for index in range(20)],
+                         found)
+
+    def test_entries_written_by_other_threads(self):
+        def fill(first):
+            for index in range(first, 16, 4):
+                self.cache.set('key', str(index))
+                self.cache.set('key{0}'.format(index), str(index))
+        threads = [threading.Thread(target=fill, args=(first,))
+                   for first in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn(self.cache.get('key'), ('12', '13', '14', '15'))
+        self.assertEqual([str(index) for index in range(16)],
+                         [self.cache.get('key{0}'.format(index))
+                          for index in range(16)])
+
+    def test_expired_and_oversized_entries_are_not_served(self):
+        self.cache.set('old', 'value', ttl=-1)
+        self.cache.set('large', 'x' * 256)
+        self.assertIsNone(self.cache.get('old'))
+        self.assertIsNone(self.cache.get('large'))
+
+    def test_full_table_replaces_entries(self):
+        for index in range(200):
+            self.cache.set('key{0}'.format(index), str(index))
+        self.assertEqual('199', self.cache.get('key199'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key199'))
+
+    def test_other_files_are_rejected(self):
+        other = os.path.join(self.directory, 'other')
+        with open(other, 'w') as f:
+            f.write('x' * 128)
+        with self.assertRaises(ValueError):
+            SharedMetadataCache(other)
+
+
+class WhenTestingClientMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.cache = InMemoryMetadataCache()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       metadata_cache=self.cache,
+                                       **self.server.client_kwargs())
+        self.webhdfs.create_file('user/hdfs/one.txt', 'one')
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_status_and_listing_are_served_from_cache(self):
+        first = self.webhdfs.get_file_dir_status('user/hdfs/one.txt')
+        self.assertEqual(first,
+                         self.webhdfs.get_file_dir_status('user/hdfs/one.txt'))
+        self.webhdfs.list_dir('user/hdfs')
+        self.webhdfs.list_dir('user/hdfs/')
+        self.assertEqual(1, self.server.call_count(operations.GETFILESTATUS,
+                                                   NAMENODE))
+        self.assertEqual(1, self.server.call_count(operations.LISTSTATUS,
+                                                   NAMENODE))
+
+    def test_changes_made_by_the_client_invalidate_entries(self):
+        self.webhdfs.list_dir('user/hdfs')
+        self.webhdfs.rename_file_dir('user/hdfs/one.txt',
+                                     '/user/hdfs/two.txt')
+        listing = self.webhdfs.list_dir('user/hdfs')
+        names = [status['pathSuffix']
+                 for status in listing['FileStatuses']['FileStatus']]
+        self.assertEqual(['two.txt'], names)
+        self.assertEqual(2, self.server.call_count(operations.LISTSTATUS,
+                                                   NAMENODE))
+
+    def test_clients_of_other_users_do_not_share_entries(self):
+        self.webhdfs.get_file_dir_status('user/hdfs/one.txt')
+        other = PyWebHdfsClient(user_name='other', metadata_cache=self.cache,
+                                **self.server.client_kwargs())
+        other.get_file_dir_status('user/hdfs/one.txt')
+        self.assertEqual(2, self.server.call_count(operations.GETFILESTATUS,
+                                                   NAMENODE))
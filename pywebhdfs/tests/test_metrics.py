@@ -0,0 +1,205 @@
+import httplib
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import MagicMock
+from mock import patch
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import errors, operations
+from pywebhdfs.fakehdfs import FakeWebHdfsServer
+from pywebhdfs.metrics import MetricsRegistry, NULL_TIMER
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.uploads import LocalFile
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+DATA = 'x' * 200000
+
+
+class WhenTestingMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = MetricsRegistry(buckets=(0.1, 1.0))
+
+    def test_record_counts_calls_and_bytes(self):
+        self.metrics.record(operations.OPEN, 0.05, bytes_in=10)
+        self.metrics.record(operations.OPEN, 0.5, bytes_in=5)
+
+        snapshot = self.metrics.snapshot()[operations.OPEN]
+        self.assertEqual(2, snapshot['count'])
+        self.assertEqual(15, snapshot['bytes_in'])
+        self.assertEqual(0, snapshot['bytes_out'])
+        self.assertEqual([(0.1, 1), (1.0, 2), ('+Inf', 2)],
+                         snapshot['latency']['buckets'])
+
+    def test_timer_records_exception_class(self):
+        with self.assertRaises(errors.FileNotFound):
+            with self.metrics.timer(operations.GETFILESTATUS):
+                raise errors.FileNotFound('missing')
+
+        snapshot = self.metrics.snapshot()[operations.GETFILESTATUS]
+        self.assertEqual(1, snapshot['count'])
+        self.assertEqual({'FileNotFound': 1}, snapshot['errors'])
+
+    def test_bytes_counted_after_the_call_returned(self):
+        with self.metrics.timer(operations.OPEN) as timer:
+            timer.count_bytes_in(3)
+        timer.count_bytes_in(4)
+
+        snapshot = self.metrics.snapshot()[operations.OPEN]
+        self.assertEqual(1, snapshot['count'])
+        self.assertEqual(7, snapshot['bytes_in'])
+
+    def test_prometheus_export(self):
+        self.metrics.record(operations.CREATE, 2.0, error='BadRequest',
+                            bytes_out=3)
+
+        text = self.metrics.to_prometheus()
+        self.assertIn(
+            'pywebhdfs_operations_total{operation="CREATE"} 1', text)
+        self.assertIn(
+            'pywebhdfs_operation_errors_total'
+            '{operation="CREATE",exception="BadRequest"} 1', text)
+        self.assertIn(
+            'pywebhdfs_operation_latency_seconds_bucket'
+            '{operation="CREATE",le="+Inf"} 1', text)
+        self.assertIn(
+            'pywebhdfs_operation_bytes_out_total{operation="CREATE"} 3',
+            text)
+
+    def test_gauges_and_named_histograms(self):
+        self.metrics.set_gauge('writer_queue_depth', 3)
+        self.metrics.observe('writer_flush_seconds', 0.5)
+
+        self.assertEqual({'writer_queue_depth': 3}, self.metrics.gauges())
+        self.assertEqual(
+            [(0.1, 0), (1.0, 1), ('+Inf', 1)],
+            self.metrics.histograms()['writer_flush_seconds']['buckets'])
+        text = self.metrics.to_prometheus()
+        self.assertIn('pywebhdfs_writer_queue_depth 3', text)
+        self.assertIn('pywebhdfs_writer_flush_seconds_bucket{le="1.0"} 1',
+                      text)
+
+    def test_named_counters(self):
+        self.metrics.increment('read_ranges_requests_total')
+        self.metrics.increment('read_ranges_requests_total', 2)
+        self.assertEqual({'read_ranges_requests_total': 3},
+                         self.metrics.counters())
+        self.assertIn('# TYPE pywebhdfs_read_ranges_requests_total counter\n'
+                      'pywebhdfs_read_ranges_requests_total 3',
+                      self.metrics.to_prometheus())
+
+    def test_reset_clears_operations(self):
+        self.metrics.record(operations.MKDIRS, 0.01)
+        self.metrics.reset()
+        self.assertEqual({}, self.metrics.snapshot())
+
+
+class WhenTestingClientMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+        self.webhdfs = PyWebHdfsClient(host='hostname', port='00000',
+                                       user_name='username',
+                                       metrics=self.metrics)
+        self.response = MagicMock()
+        self.requests = MagicMock()
+        self.path = 'user/hdfs'
+
+    def test_client_without_registry_uses_null_timer(self):
+        webhdfs = PyWebHdfsClient()
+        self.assertIs(NULL_TIMER, webhdfs._timer(operations.OPEN))
+
+    def test_read_records_bytes_in(self):
+        self.response.status_code = httplib.OK
+        self.response.content = '010101'
+        self.requests.get.return_value = self.response
+        with patch('pywebhdfs.webhdfs.requests', self.requests):
+            self.webhdfs.read_file(self.path)
+
+        snapshot = self.metrics.snapshot()[operations.OPEN]
+        self.assertEqual(1, snapshot['count'])
+        self.assertEqual(6, snapshot['bytes_in'])
+
+    def test_failed_call_records_error(self):
+        self.response.status_code = httplib.NOT_FOUND
+        self.requests.put.return_value = self.response
+        with patch('pywebhdfs.webhdfs.requests', self.requests):
+            with self.assertRaises(errors.FileNotFound):
+                self.webhdfs.make_dir(self.path)
+
+        snapshot = self.metrics.snapshot()[operations.MKDIRS]
+        self.assertEqual({'FileNotFound': 1}, snapshot['errors'])
+
+
+class WhenTestingStreamedTransferMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.metrics = MetricsRegistry()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       metrics=self.metrics,
+                                       **self.server.client_kwargs())
+        self.local = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.local)
+
+    def bytes(self, operation, direction):
+        return self.metrics.snapshot()[operation][direction]
+
+    def test_streamed_uploads_count_bytes_out(self):
+        local_path = os.path.join(self.local, 'data')
+        with open(local_path, 'wb') as local_file:
+            local_file.write(DATA)
+        self.webhdfs.upload_many([('a', LocalFile(local_path))])
+        with open(local_path, 'rb') as local_file:
+            self.webhdfs.write_stream('b', local_file, codec=None)
+        self.webhdfs.write_stream('c', iter([DATA[:10], DATA[10:]]),
+                                  codec=None)
+        self.assertEqual(3 * len(DATA),
+                         self.bytes(operations.CREATE, 'bytes_out'))
+        self.assertEqual(DATA, self.webhdfs.read_file('c'))
+
+    def test_streamed_reads_count_bytes_in_as_they_are_read(self):
+        self.webhdfs.create_file('a', DATA)
+        stream = self.webhdfs.read_stream('a', codec=None)
+        self.assertEqual(0, self.bytes(operations.OPEN, 'bytes_in'))
+        stream.read(1000)
+        self.assertEqual(1000, self.bytes(operations.OPEN, 'bytes_in'))
+        stream.read()
+        stream.close()
+        self.webhdfs.read_into('a', bytearray(5000), offset=10)
+        self.assertEqual(len(DATA) + 5000,
+                         self.bytes(operations.OPEN, 'bytes_in'))
+
+
+class WhenTestingStreamedTransferMetricsWithTornado(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingStreamedTransferMetricsWithTornado, self).setUp()
+        self.server = FakeWebHdfsServer().start()
+        self.metrics = MetricsRegistry()
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', metrics=self.metrics,
+            **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingStreamedTransferMetricsWithTornado, self).tearDown()
+
+    @gen_test
+    def test_streamed_transfers_are_counted(self):
+        yield self.webhdfs.upload_many([('a', LocalFile(__file__))])
+        chunks = []
+        yield self.webhdfs.read_stream('a', chunks.append, codec=None)
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(os.path.getsize(__file__),
+                         snapshot[operations.CREATE]['bytes_out'])
+        self.assertEqual(os.path.getsize(__file__),
+                         snapshot[operations.OPEN]['bytes_in'])
@@ -0,0 +1,146 @@
+import httplib
+import unittest
+
+from pywebhdfs import errors, operations, tracing
+from pywebhdfs.metrics import MetricsRegistry
+from pywebhdfs.protocol import Response, WebHdfsProtocol
+from pywebhdfs.tracing import Span, Tracer
+
+
+class WhenTestingProtocolCalls(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = WebHdfsProtocol('http://host:50070/webhdfs/v1/',
+                                        'hdfs')
+        self.path = 'user/hdfs/file.txt'
+        self.location = 'http://datanode:50075/webhdfs/v1/user/hdfs/file.txt'
+        self.redirect = Response(httplib.TEMPORARY_REDIRECT,
+                                 {'location': self.location}, '')
+
+    def test_create_is_a_two_step_call(self):
+        call = self.protocol.call(operations.CREATE, self.path, 'abc',
+                                  {'overwrite': True})
+        request = call.start()
+        self.assertEqual('PUT', request.method)
+        self.assertEqual(
+            'http://host:50070/webhdfs/v1/user/hdfs/file.txt'
+            '?op=CREATE&overwrite=true&user.name=hdfs', request.uri)
+        self.assertFalse(request.follow_redirects)
+        self.assertIsNone(request.body)
+
+        request = call.receive(self.redirect)
+        self.assertEqual(self.location, request.uri)
+        self.assertEqual('abc', request.body)
+        self.assertEqual('application/octet-stream',
+                         request.headers['Content-Type'])
+        self.assertEqual(tracing.DATANODE, request.phase)
+
+        self.assertIsNone(call.receive(Response(httplib.CREATED, {}, '')))
+        self.assertTrue(call.result)
+
+    def test_create_without_redirect_raises(self):
+        call = self.protocol.call(operations.CREATE, self.path, 'abc')
+        call.start()
+        with self.assertRaises(errors.BadRequest):
+            call.receive(Response(httplib.BAD_REQUEST, {}, 'bad'))
+
+    def test_open_follows_redirect_or_accepts_namenode_data(self):
+        call = self.protocol.call(operations.OPEN, self.path)
+        call.start()
+        call.receive(self.redirect)
+        self.assertIsNone(call.receive(Response(httplib.OK, {}, 'data')))
+        self.assertEqual('data', call.result)
+
+        call = self.protocol.call(operations.OPEN, self.path)
+        call.start()
+        self.assertIsNone(call.receive(Response(httplib.OK, {}, 'data')))
+        self.assertEqual('data', call.result)
+
+    def test_locate_asks_for_the_location_as_json(self):
+        call = self.protocol.call(operations.CREATE, self.path, None,
+                                  {'overwrite': True}, locate=True)
+        request = call.start()
+        self.assertIn('&noredirect=true', request.uri)
+        self.assertIsNone(call.receive(Response(
+            httplib.OK, {}, '{"Location": "%s"}' % self.location)))
+        self.assertEqual(self.location, call.result)
+
+        # namenodes without noredirect still answer with a redirect
+        call = self.protocol.call(operations.OPEN, self.path, locate=True)
+        call.start()
+        self.assertIsNone(call.receive(self.redirect))
+        self.assertEqual(self.location, call.result)
+
+    def test_location_skips_the_namenode(self):
+        call = self.protocol.call(operations.CREATE, self.path, 'abc',
+                                  location=self.location)
+        request = call.start()
+        self.assertEqual(self.location, request.uri)
+        self.assertEqual(tracing.DATANODE, request.phase)
+        self.assertEqual('abc', request.body)
+        self.assertIsNone(call.receive(Response(httplib.CREATED, {}, '')))
+        self.assertTrue(call.result)
+
+        self.assertRaises(ValueError, self.protocol.call,
+                          operations.MKDIRS, self.path, locate=True)
+
+    def test_metadata_call_parses_json(self):
+        call = self.protocol.call(operations.GETFILESTATUS, self.path)
+        request = call.start()
+        self.assertTrue(request.follow_redirects)
+        call.receive(Response(httplib.OK, {}, '{"FileStatus": {}}'))
+        self.assertEqual({'FileStatus': {}}, call.result)
+
+    def test_missing_path_raises_file_not_found(self):
+        call = self.protocol.call(operations.LISTSTATUS, self.path)
+        call.start()
+        with self.assertRaises(errors.FileNotFound):
+            call.receive(Response(httplib.NOT_FOUND, {}, ''))
+
+    def test_call_records_metrics_and_phases(self):
+        metrics = MetricsRegistry()
+        span = Span(Tracer(), operations.CREATE, self.path)
+        call = self.protocol.call(
+            operations.CREATE, self.path, 'abc', None,
+            metrics.timer(operations.CREATE), span)
+        with call:
+            call.start()
+            call.receive(self.redirect)
+            call.receive(Response(httplib.CREATED, {}, '', ttfb=0.0))
+
+        snapshot = metrics.snapshot()[operations.CREATE]
+        self.assertEqual(1, snapshot['count'])
+        self.assertEqual(3, snapshot['bytes_out'])
+        self.assertEqual('datanode:50075', span.tags['datanode'])
+        for phase in (tracing.NAMENODE, tracing.DATANODE,
+                      tracing.DATANODE_TTFB, tracing.DATANODE_TRANSFER):
+            self.assertIn(phase, span.phases)
+
+
+class WhenTestingUriBuilding(unittest.TestCase):
+
+    def setUp(self):
+        self.protocol = WebHdfsProtocol('http://host:50070/webhdfs/v1/',
+                                        'hdfs')
+
+    def test_path_is_percent_encoded(self):
+        uri = self.protocol.create_uri(u'user/hdfs/a b%/\xe9.txt',
+                                       operations.OPEN, {})
+        self.assertEqual(
+            'http://host:50070/webhdfs/v1/user/hdfs/a%20b%25/%C3%A9.txt'
+            '?op=OPEN&user.name=hdfs', uri)
+
+    def test_only_booleans_are_lowercased(self):
+        uri = self.protocol.create_uri(
+            'user/hdfs/a', operations.RENAME,
+            {'destination': '/user/hdfs/New File'})
+        self.assertIn('&destination=/user/hdfs/New%20File&', uri)
+
+        uri = self.protocol.create_uri('user/hdfs/a', operations.CREATE,
+                                       {'overwrite': True})
+        self.assertIn('&overwrite=true&', uri)
+
+    def test_encoded_paths_are_cached(self):
+        self.protocol.create_uri('user/hdfs/a b', operations.OPEN, {})
+        self.assertEqual('user/hdfs/a%20b',
+                         self.protocol._paths['user/hdfs/a b'])
@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import operations, tracing
+from pywebhdfs.fakehdfs import FakeWebHdfsServer
+from pywebhdfs.metrics import MetricsRegistry
+from pywebhdfs.protocol import Request, Response
+from pywebhdfs.ratelimit import RateLimiter, TokenBucket
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.uploads import LocalFile
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+DATA = 'x' * 50000
+
+
+class WhenTestingTokenBucket(unittest.TestCase):
+
+    def test_burst_then_debt(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(0.0, bucket.reserve())
+        self.assertEqual(0.0, bucket.reserve())
+        self.assertAlmostEqual(0.1, bucket.reserve(), delta=0.01)
+        self.assertAlmostEqual(0.6, bucket.reserve(5), delta=0.01)
+
+    def test_rate_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+
+class WhenTestingRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.limiter = RateLimiter(metadata_rate=1, data_rate=100,
+                                   operation_rates={operations.LISTSTATUS: 1})
+
+    def test_metadata_requests_take_a_token(self):
+        namenode = Request('GET', 'uri', {})
+        self.assertEqual(0.0, self.limiter.request_delay(
+            operations.GETFILESTATUS, namenode))
+        self.assertGreater(self.limiter.request_delay(
+            operations.MKDIRS, namenode), 0.9)
+        # LISTSTATUS has a bucket of its own
+        self.assertEqual(0.0, self.limiter.request_delay(
+            operations.LISTSTATUS, namenode))
+
+    def test_data_is_charged_by_bytes(self):
+        upload = Request('PUT', 'uri', {}, 'x' * 150,
+                         phase=tracing.DATANODE)
+        self.assertEqual(0.0, self.limiter.request_delay(
+            operations.CREATE, Request('PUT', 'uri', {})))
+        self.assertAlmostEqual(0.5, self.limiter.request_delay(
+            operations.CREATE, upload), delta=0.05)
+        self.assertAlmostEqual(1.5, self.limiter.response_delay(
+            operations.OPEN, Response(200, {}, 'x' * 100)), delta=0.05)
+
+    def test_streamed_chunks_of_data_operations_are_charged(self):
+        self.assertEqual(0.0, self.limiter.transfer_delay(
+            operations.OPEN, 100))
+        self.assertAlmostEqual(0.5, self.limiter.transfer_delay(
+            operations.APPEND, 50), delta=0.05)
+        self.assertEqual(0.0, self.limiter.transfer_delay(
+            operations.GETFILESTATUS, 50))
+
+
+class WhenTestingRateLimitedClients(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.metrics = MetricsRegistry()
+        self.limiter = RateLimiter(metadata_rate=20, metadata_burst=1,
+                                   metrics=self.metrics)
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       rate_limiter=self.limiter,
+                                       **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_metadata_calls_are_spaced(self):
+        started = time.time()
+        for _ in range(5):
+            self.webhdfs.make_dir('data')
+        self.assertGreaterEqual(time.time() - started, 0.19)
+        waits = self.metrics.histograms()['rate_limit_metadata_wait_seconds']
+        self.assertEqual(5, waits['count'])
+        self.assertGreater(waits['sum'], 0.1)
+
+
+class WhenTestingRateLimitedStreams(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+        self.webhdfs.create_file('data/file', DATA)
+        self.throttled = PyWebHdfsClient(
+            user_name='hdfs', rate_limiter=RateLimiter(data_rate=100000,
+                                                       data_burst=10000),
+            **self.server.client_kwargs())
+        self.local = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.local)
+
+    def test_streamed_reads_are_throttled(self):
+        started = time.time()
+        stream = self.throttled.read_stream('data/file', codec=None)
+        self.assertEqual(DATA, stream.read())
+        self.assertGreaterEqual(time.time() - started, 0.35)
+
+        started = time.time()
+        self.throttled.read_into('data/file', bytearray(len(DATA)))
+        self.assertGreaterEqual(time.time() - started, 0.45)
+
+    def test_local_file_uploads_are_throttled(self):
+        local_path = os.path.join(self.local, 'data')
+        with open(local_path, 'wb') as local_file:
+            local_file.write(DATA)
+        started = time.time()
+        report = self.throttled.upload_many([('data/copy',
+                                              LocalFile(local_path))])
+        self.assertTrue(report.results[0].ok)
+        self.assertGreaterEqual(time.time() - started, 0.35)
+        self.assertEqual(DATA, self.webhdfs.read_file('data/copy'))
+
+
+class WhenTestingRateLimitedTornadoClient(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingRateLimitedTornadoClient, self).setUp()
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', rate_limiter=RateLimiter(data_rate=1000,
+                                                       data_burst=100),
+            **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingRateLimitedTornadoClient, self).tearDown()
+
+    @gen_test
+    def test_uploads_are_throttled(self):
+        started = time.time()
+        yield self.webhdfs.create_file('data/file', 'x' * 300)
+        self.assertGreaterEqual(time.time() - started, 0.19)
+
+    @gen_test
+    def test_local_file_uploads_and_streamed_reads_are_throttled(self):
+        local = tempfile.mkdtemp()
+        try:
+            local_path = os.path.join(local, 'data')
+            with open(local_path, 'wb') as local_file:
+                local_file.write('x' * 500)
+            started = time.time()
+            yield self.webhdfs.upload_many([('data/file',
+                                             LocalFile(local_path))])
+            self.assertGreaterEqual(time.time() - started, 0.35)
+        finally:
+            shutil.rmtree(local)
+
+        chunks = []
+        started = time.time()
+        yield self.webhdfs.read_stream('data/file', chunks.append,
+                                       codec=None)
+        self.assertGreaterEqual(time.time() - started, 0.45)
+        self.assertEqual('x' * 500, ''.join(chunks))
@@ -0,0 +1,67 @@
+import unittest
+
+from pywebhdfs import splits
+from pywebhdfs.fakehdfs import FakeWebHdfsServer
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+class WhenTestingComputeSplits(unittest.TestCase):
+
+    def test_last_split_absorbs_small_remainder(self):
+        self.assertEqual([(0, 100), (100, 105)],
+                         splits.compute_splits(205, 100))
+        self.assertEqual([(0, 100), (100, 100), (200, 20)],
+                         splits.compute_splits(220, 100))
+        self.assertEqual([(0, 50)], splits.compute_splits(50, 100))
+        self.assertEqual([], splits.compute_splits(0, 100))
+
+
+class WhenTestingRecordIteration(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+        self.path = 'user/hdfs/events.log'
+
+    def tearDown(self):
+        self.server.stop()
+
+    def read_splits(self, split_size, **kwargs):
+        records = []
+        for split in self.webhdfs.get_splits(self.path, split_size):
+            records.extend(self.webhdfs.iter_lines(
+                self.path, split=split, chunk_size=3, **kwargs))
+        return records
+
+    def test_every_line_is_read_once_across_splits(self):
+        lines = ['line {0}'.format(i) * (i % 4) for i in range(60)]
+        self.webhdfs.create_file(self.path, '\n'.join(lines) + '\n')
+
+        for split_size in (13, 100, 10000):
+            self.assertEqual(lines, self.read_splits(split_size))
+        self.assertEqual(lines, list(self.webhdfs.iter_lines(self.path)))
+
+    def test_crlf_and_missing_final_newline(self):
+        self.webhdfs.create_file(self.path, 'a\r\nbb\r\n\r\nccc')
+        self.assertEqual(['a', 'bb', '', 'ccc'], self.read_splits(2))
+
+    def test_custom_delimiter(self):
+        records = ['x' * i for i in range(1, 15)]
+        self.webhdfs.create_file(self.path, '<|>'.join(records))
+        self.assertEqual(records, self.read_splits(7, delimiter='<|>'))
+
+    def test_records_longer_than_read_ahead(self):
+        self.addCleanup(setattr, splits, 'READ_AHEAD', splits.READ_AHEAD)
+        splits.READ_AHEAD = 4
+        lines = ['a' * 50, 'b' * 3, 'c' * 50]
+        self.webhdfs.create_file(self.path, '\n'.join(lines))
+        self.assertEqual(lines, self.read_splits(10))
+
+    def test_compressed_files_are_a_single_split(self):
+        path = 'user/hdfs/events.log.gz'
+        self.webhdfs.write_stream(path, 'a\nb\n')
+        self.assertEqual(1, len(self.webhdfs.get_splits(path, 1)))
+        self.assertEqual(['a', 'b'], list(self.webhdfs.iter_lines(path)))
+        with self.assertRaises(ValueError):
+            list(self.webhdfs.iter_lines(path, split=(0, 1)))
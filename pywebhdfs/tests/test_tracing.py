@@ -0,0 +1,122 @@
+import httplib
+import time
+import unittest
+from datetime import timedelta
+
+from mock import MagicMock
+from mock import patch
+
+from pywebhdfs import errors, operations, tracing
+from pywebhdfs.fakehdfs import FakeWebHdfsServer
+from pywebhdfs.tracing import SpanRecorder, Span, Tracer
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+class WhenTestingSpans(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = MagicMock(spec=Tracer)
+        self.span = Span(self.tracer, operations.CREATE, 'user/hdfs')
+
+    def test_phases_accumulate(self):
+        self.span.auth(0.25)
+        self.span.auth(0.5)
+        self.assertEqual(0.75, self.span.phases[tracing.AUTH])
+        self.assertEqual(2, self.tracer.on_auth.call_count)
+
+    def test_redirect_tags_datanode(self):
+        self.span.redirect('http://dn1:50075/webhdfs/v1/user/hdfs?op=CREATE')
+        self.assertEqual('dn1:50075', self.span.tags['datanode'])
+
+    def test_exit_records_error_and_finishes(self):
+        with self.assertRaises(errors.BadRequest):
+            with self.span:
+                raise errors.BadRequest('bad')
+        self.assertEqual('BadRequest', self.span.error)
+        self.tracer.on_finish.assert_called_once_with(self.span)
+
+
+class WhenTestingSpanRecorder(unittest.TestCase):
+
+    def test_summary_groups_by_datanode(self):
+        recorder = SpanRecorder()
+        for elapsed in (1.0, 3.0):
+            span = Span(recorder, operations.CREATE, 'user/hdfs')
+            span.redirect('http://dn1:50075/webhdfs/v1/user/hdfs')
+            span.response(tracing.DATANODE, httplib.CREATED, elapsed)
+            span.finish()
+
+        summary = recorder.summary()['dn1:50075'][tracing.DATANODE]
+        self.assertEqual(2, summary['count'])
+        self.assertEqual(2.0, summary['mean'])
+        self.assertEqual(3.0, summary['max'])
+
+
+class WhenTestingClientTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.recorder = SpanRecorder()
+        self.webhdfs = PyWebHdfsClient(host='hostname', port='00000',
+                                       user_name='username',
+                                       tracer=self.recorder)
+        self.location = 'http://datanode:50075/webhdfs/v1/user/hdfs'
+        self.init_response = MagicMock()
+        self.init_response.status_code = httplib.TEMPORARY_REDIRECT
+        self.init_response.headers = {'location': self.location}
+        self.response = MagicMock()
+        self.response.status_code = httplib.CREATED
+        self.response.elapsed = timedelta(seconds=0)
+        self.requests = MagicMock()
+
+    def test_create_records_namenode_and_datanode_phases(self):
+        self.requests.put.side_effect = [self.init_response, self.response]
+        with patch('pywebhdfs.webhdfs.requests', self.requests):
+            self.webhdfs.create_file('user/hdfs', '010101')
+
+        span, = self.recorder.spans
+        self.assertEqual(operations.CREATE, span.operation)
+        self.assertEqual('datanode:50075', span.tags['datanode'])
+        for phase in (tracing.NAMENODE, tracing.DATANODE,
+                      tracing.DATANODE_TTFB, tracing.DATANODE_TRANSFER):
+            self.assertIn(phase, span.phases)
+        self.assertIsNone(span.error)
+
+    def test_failed_create_is_finished_with_error(self):
+        self.init_response.status_code = httplib.BAD_REQUEST
+        self.requests.put.side_effect = [self.init_response]
+        with patch('pywebhdfs.webhdfs.requests', self.requests):
+            with self.assertRaises(errors.BadRequest):
+                self.webhdfs.create_file('user/hdfs', '010101')
+
+        span, = self.recorder.spans
+        self.assertEqual('BadRequest', span.error)
+        self.assertNotIn('datanode', span.tags)
+
+
+class _SlowTickets(object):
+
+    def acquire_kerberos_ticket(self, primary, host):
+        time.sleep(0.2)
+        return 'Negotiate ticket'
+
+
+class WhenTestingTracedTimings(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.recorder = SpanRecorder()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       tracer=self.recorder,
+                                       **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_authentication_is_not_part_of_the_request_phases(self):
+        self.webhdfs.krb_instance = _SlowTickets()
+        self.webhdfs.create_file('user/hdfs/a', 'data')
+
+        span, = self.recorder.spans
+        self.assertGreaterEqual(span.phases[tracing.AUTH], 0.4)
+        self.assertLess(span.phases[tracing.NAMENODE], 0.15)
+        self.assertLess(span.phases[tracing.DATANODE], 0.15)
@@ -0,0 +1,148 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import errors, operations
+from pywebhdfs.fakehdfs import DATANODE, FakeWebHdfsServer, NAMENODE
+from pywebhdfs.metrics import MetricsRegistry
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.uploads import LocalFile, data_size, open_source
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+def _after(method, hook):
+    def wrapper(*args, **kwargs):
+        result = method(*args, **kwargs)
+        hook(*args, **kwargs)
+        return result
+    return wrapper
+
+
+class WhenTestingUploadSources(unittest.TestCase):
+
+    def test_sizes_of_buffers_and_local_files(self):
+        self.assertEqual(3, data_size(open_source('abc')))
+        self.assertEqual(2, data_size(open_source(bytearray('ab'))))
+        with open_source(LocalFile(__file__)) as local_file:
+            self.assertEqual(os.path.getsize(__file__),
+                             data_size(local_file))
+
+    def test_sizes_of_file_like_objects(self):
+        self.assertEqual(3, data_size(open_source(StringIO('abc'))))
+        data = io.BytesIO('abcd')
+        data.read(1)
+        self.assertEqual(3, data_size(open_source(data)))
+        self.assertEqual('bcd', data.read())
+
+
+class WhenTestingUploadMany(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer(datanodes=2).start()
+        self.metrics = MetricsRegistry()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       metrics=self.metrics,
+                                       **self.server.client_kwargs())
+        self.local = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.local)
+
+    def test_buffers_and_local_files_are_uploaded(self):
+        local_path = os.path.join(self.local, 'b.csv')
+        with open(local_path, 'wb') as local_file:
+            local_file.write('1,2\n')
+        files = [('in/{0}'.format(i), 'x' * i) for i in xrange(20)]
+        files.append(('in/b.csv', LocalFile(local_path)))
+        files.append(('in/c', bytearray('c')))
+
+        report = self.webhdfs.upload_many(files, concurrency=4)
+        self.assertTrue(all(result.ok for result in report.results))
+        self.assertEqual([path for path, _ in files],
+                         [result.path for result in report.results])
+        self.assertEqual(22, report.files)
+        self.assertEqual(sum(xrange(20)) + 5, report.bytes)
+        self.assertGreater(report.files_per_second, 0)
+        self.assertEqual('1,2\n', self.webhdfs.read_file('in/b.csv'))
+        self.assertEqual('x' * 7, self.webhdfs.read_file('in/7'))
+        self.assertEqual(22, self.server.call_count(operations.CREATE,
+                                                    NAMENODE))
+        self.assertEqual(22, self.server.call_count(operations.CREATE,
+                                                    DATANODE))
+        self.assertIn('upload_bytes_per_second', self.metrics.gauges())
+
+    def test_file_like_objects_are_uploaded_and_left_open(self):
+        sources = [StringIO('abc'), io.BytesIO('wxyz')]
+        report = self.webhdfs.upload_many(
+            [('in/a', sources[0]), ('in/b', sources[1])])
+        self.assertTrue(all(result.ok for result in report.results))
+        self.assertEqual(7, report.bytes)
+        self.assertEqual('abc', self.webhdfs.read_file('in/a'))
+        self.assertEqual('wxyz', self.webhdfs.read_file('in/b'))
+        self.assertFalse(any(source.closed for source in sources))
+
+    def test_failures_are_reported_per_file(self):
+        self.webhdfs.create_file('in/exists', 'old')
+        self.server.inject_fault(operation=operations.CREATE, role=DATANODE)
+        report = self.webhdfs.upload_many(
+            {'in/exists': 'new', 'in/a': 'a', 'in/b': 'b'}, concurrency=2)
+        failed = [result for result in report.results if not result.ok]
+        self.assertEqual(2, len(failed))
+        self.assertIn('in/exists', [result.path for result in failed])
+        self.assertEqual(1, report.files)
+        self.assertIsInstance(failed[0].error, errors.PyWebHdfsException)
+
+    def test_local_files_removed_after_sending_are_reported(self):
+        local_path = os.path.join(self.local, 'rotated.log')
+        with open(local_path, 'wb') as local_file:
+            local_file.write('abc')
+
+        def remove(operation, role, index):
+            # rotated away while its data is being sent
+            if role == DATANODE and os.path.exists(local_path):
+                os.remove(local_path)
+        self.server.before_request = _after(self.server.before_request,
+                                            remove)
+        report = self.webhdfs.upload_many(
+            [('in/rotated.log', LocalFile(local_path))])
+        self.assertTrue(report.results[0].ok)
+        self.assertEqual(3, report.bytes)
+        self.assertFalse(os.path.exists(local_path))
+
+    def test_at_least_one_file_is_sent_at_a_time(self):
+        report = self.webhdfs.upload_many([('in/a', 'a'), ('in/b', 'b')],
+                                          concurrency=0)
+        self.assertEqual(2, report.files)
+
+    def test_nothing_to_upload(self):
+        report = self.webhdfs.upload_many([])
+        self.assertEqual(([], 0, 0), report[:3])
+
+
+class WhenTestingUploadManyWithTornado(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingUploadManyWithTornado, self).setUp()
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingUploadManyWithTornado, self).tearDown()
+
+    @gen_test
+    def test_upload_many(self):
+        report = yield self.webhdfs.upload_many(
+            [('in/a', 'abc'), ('in/b', LocalFile(__file__))], concurrency=2)
+        self.assertTrue(all(result.ok for result in report.results))
+        self.assertEqual(3 + os.path.getsize(__file__), report.bytes)
+        data = yield self.webhdfs.read_file('in/a')
+        self.assertEqual('abc', data)
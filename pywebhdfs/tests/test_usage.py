@@ -0,0 +1,90 @@
+import unittest
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import operations
+from pywebhdfs.fakehdfs import FakeWebHdfsServer, NAMENODE
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.usage import ContentSummary, QuotaUsage
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+class WhenTestingUsageResults(unittest.TestCase):
+
+    def test_content_summary_from_json(self):
+        summary = ContentSummary.from_json({'ContentSummary': {
+            'directoryCount': 2, 'fileCount': 1, 'length': 24930,
+            'quota': -1, 'spaceConsumed': 74790, 'spaceQuota': -1,
+            'typeQuota': {}}})
+        self.assertEqual(ContentSummary(24930, 1, 2, 74790, -1, -1, {}),
+                         summary)
+
+    def test_quota_usage_from_json(self):
+        usage = QuotaUsage.from_json({'QuotaUsage': {
+            'fileAndDirectoryCount': 3, 'quota': 100,
+            'spaceConsumed': 74790, 'spaceQuota': 10 ** 9}})
+        self.assertEqual(100, usage.quota)
+        self.assertEqual({}, usage.type_quota)
+
+
+class WhenTestingUsage(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+        self.webhdfs.create_file('warehouse/a/1', 'x' * 10)
+        self.webhdfs.create_file('warehouse/a/b/2', 'x' * 20)
+        self.webhdfs.create_file('warehouse/c/3', 'x' * 30, replication=2)
+        self.webhdfs.create_file('warehouse/top', 'x' * 5)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_content_summary_and_quota_usage(self):
+        self.server.fs.set_quota('warehouse', quota=100)
+        summary = self.webhdfs.get_content_summary('warehouse')
+        self.assertEqual((65, 4, 4), (summary.length, summary.file_count,
+                                      summary.directory_count))
+        self.assertEqual(35 * 3 + 30 * 2, summary.space_consumed)
+        self.assertEqual(100, summary.quota)
+
+        usage = self.webhdfs.get_quota_usage('warehouse')
+        self.assertEqual(8, usage.file_and_directory_count)
+        self.assertEqual(summary.space_consumed, usage.space_consumed)
+
+    def test_du_summarizes_each_child(self):
+        entries = self.webhdfs.du('warehouse', concurrency=2)
+        self.assertEqual(['warehouse/a', 'warehouse/c', 'warehouse/top'],
+                         [path for path, _ in entries])
+        self.assertEqual([30, 30, 5],
+                         [summary.length for _, summary in entries])
+        self.assertEqual(15, entries[2][1].space_consumed)
+        self.assertEqual(1, self.server.call_count(operations.LISTSTATUS,
+                                                   NAMENODE))
+        self.assertEqual(2, self.server.call_count(
+            operations.GETCONTENTSUMMARY, NAMENODE))
+
+
+class WhenTestingUsageWithTornado(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingUsageWithTornado, self).setUp()
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingUsageWithTornado, self).tearDown()
+
+    @gen_test
+    def test_usage(self):
+        yield self.webhdfs.make_dirs_many(['data/x', 'data/y'])
+        summary = yield self.webhdfs.get_content_summary('data')
+        self.assertEqual(3, summary.directory_count)
+        usage = yield self.webhdfs.get_quota_usage('data')
+        self.assertEqual(3, usage.file_and_directory_count)
+        entries = yield self.webhdfs.du('data')
+        self.assertEqual(['data/x', 'data/y'], [path for path, _ in entries])
@@ -0,0 +1,83 @@
+import unittest
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from pywebhdfs import operations
+from pywebhdfs.fakehdfs import DATANODE, FakeWebHdfsServer
+from pywebhdfs.metrics import MetricsRegistry
+from pywebhdfs.tornado.webhdfs import PyWebHdfsClient as \
+    TornadoPyWebHdfsClient
+from pywebhdfs.vectored import coalesce
+from pywebhdfs.webhdfs import PyWebHdfsClient
+
+
+DATA = ''.join(chr(i % 256) for i in xrange(10000))
+
+
+class WhenTestingCoalescing(unittest.TestCase):
+
+    def test_ranges_within_the_gap_are_merged(self):
+        reads = coalesce([(500, 10), (0, 100), (120, 30), (9000, 5)],
+                         gap=20)
+        self.assertEqual([(0, 150, [1, 2]), (500, 10, [0]),
+                          (9000, 5, [3])], reads)
+
+    def test_overlapping_ranges_and_the_length_cap(self):
+        self.assertEqual([(0, 100, [0, 1])],
+                         coalesce([(0, 100), (10, 20)], gap=0))
+        self.assertEqual([(0, 60, [0]), (60, 60, [1])],
+                         coalesce([(0, 60), (60, 60)], gap=0,
+                                  max_length=100))
+
+
+class WhenTestingReadRanges(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.metrics = MetricsRegistry()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       metrics=self.metrics,
+                                       **self.server.client_kwargs())
+        self.webhdfs.create_file('table', DATA)
+        self.server.reset_calls()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_views_of_every_range_in_request_order(self):
+        ranges = [(9000, 100), (10, 5), (0, 8), (30, 40), (5000, 0),
+                  (9990, 50)]
+        views = self.webhdfs.read_ranges('table', ranges, gap=32)
+        self.assertTrue(all(isinstance(view, memoryview) for view in views))
+        self.assertEqual([DATA[offset:offset + length]
+                          for offset, length in ranges],
+                         [view.tobytes() for view in views])
+        self.assertEqual(3, self.server.call_count(operations.OPEN,
+                                                   DATANODE))
+        counters = self.metrics.counters()
+        self.assertEqual(6, counters['read_ranges_ranges_total'])
+        self.assertEqual(4, counters['read_ranges_requests_total'])
+        self.assertEqual(2, counters['read_ranges_requests_saved_total'])
+
+
+class WhenTestingReadRangesWithTornado(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenTestingReadRangesWithTornado, self).setUp()
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = TornadoPyWebHdfsClient(
+            user_name='hdfs', **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+        super(WhenTestingReadRangesWithTornado, self).tearDown()
+
+    @gen_test
+    def test_read_ranges(self):
+        yield self.webhdfs.create_file('table', DATA)
+        views = yield self.webhdfs.read_ranges(
+            'table', [(100, 10), (0, 10), (4000, 1)], gap=100)
+        self.assertEqual([DATA[100:110], DATA[0:10], DATA[4000]],
+                         [view.tobytes() for view in views])
+        self.assertEqual(2, self.server.call_count(operations.OPEN,
+                                                   DATANODE))
@@ -0,0 +1,206 @@
+import json
+import threading
+import unittest
+from Queue import Full
+
+from pywebhdfs import errors, operations
+from pywebhdfs.fakehdfs import FakeWebHdfsServer, DATANODE
+from pywebhdfs.health import DatanodeHealth
+from pywebhdfs.metrics import MetricsRegistry
+from pywebhdfs.webhdfs import PyWebHdfsClient
+from pywebhdfs.writers import PartitionedWriter, RollingWriter
+
+
+class _BlockedHdfs(object):
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.created = []
+
+    def create_file(self, path, data, **kwargs):
+        self.release.wait()
+        self.created.append((path, data))
+
+    def append_file(self, path, data, **kwargs):
+        self.release.wait()
+
+
+class WhenTestingRollingWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+        self.metrics = MetricsRegistry()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_batches_are_appended_and_rolled_by_size(self):
+        writer = RollingWriter(self.webhdfs, 'logs/{sequence:03d}.log',
+                               max_bytes=10, batch_bytes=4,
+                               metrics=self.metrics, name='shipper')
+        for index in range(6):
+            writer.write('r{0}\n'.format(index))
+        self.assertTrue(writer.close(timeout=10))
+
+        self.assertEqual(['logs/000.log', 'logs/001.log'], writer.files)
+        self.assertEqual('r0\nr1\nr2\nr3\n',
+                         self.webhdfs.read_file('logs/000.log'))
+        self.assertEqual('r4\nr5\n', self.webhdfs.read_file('logs/001.log'))
+        self.assertEqual(6, writer.records_written)
+        self.assertEqual(0, self.metrics.gauges()['shipper_queue_depth'])
+        self.assertEqual(
+            3, self.metrics.histograms()['shipper_flush_seconds']['count'])
+
+    def test_flush_writes_partial_batches(self):
+        with RollingWriter(self.webhdfs, 'logs/{time:%Y}-{sequence}.log',
+                           max_age=0, flush_interval=60) as writer:
+            writer.write('first\n')
+            self.assertTrue(writer.flush(timeout=10))
+            writer.write('second\n')
+        self.assertEqual(2, len(writer.files))
+        self.assertEqual('second\n', self.webhdfs.read_file(writer.files[1]))
+        with self.assertRaises(ValueError):
+            writer.write('late\n')
+
+    def test_failed_writes_are_retried(self):
+        self.server.inject_fault(operation=operations.APPEND, role=DATANODE)
+        self.server.inject_fault(operation=operations.CREATE, role=DATANODE)
+        writer = RollingWriter(self.webhdfs, 'logs/{sequence}.log',
+                               batch_bytes=1, retry_interval=0.01)
+        writer.write('a')
+        writer.write('b')
+        self.assertTrue(writer.close(timeout=10))
+        # the failed append is retried on a new file
+        self.assertEqual(['logs/1.log', 'logs/2.log'], writer.files)
+        self.assertEqual('a', self.webhdfs.read_file('logs/1.log'))
+        self.assertEqual('b', self.webhdfs.read_file('logs/2.log'))
+        self.assertIsNotNone(writer.last_error)
+
+    def test_timed_out_appends_are_not_repeated(self):
+        webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                  datanode_health=DatanodeHealth(timeout=0.3),
+                                  **self.server.client_kwargs())
+        writer = RollingWriter(webhdfs, 'logs/{sequence}.log',
+                               batch_bytes=1, retry_interval=0.01)
+        writer.write('a\n')
+        writer.flush(timeout=10)
+        # the append is applied once the datanode wakes up
+        self.server.inject_fault(operation=operations.APPEND, role=DATANODE,
+                                 status=None, delay=0.5)
+        writer.write('b\n')
+        self.assertTrue(writer.close(timeout=10))
+        self.assertEqual(['logs/0.log', 'logs/1.log'], writer.files)
+        self.assertEqual('b\n', self.webhdfs.read_file('logs/1.log'))
+        self.assertEqual(1, self.server.call_count(operations.APPEND,
+                                                   DATANODE))
+
+    def test_flush_after_close_is_refused(self):
+        writer = RollingWriter(self.webhdfs, 'logs/{sequence}.log')
+        writer.close(timeout=10)
+        self.assertRaises(ValueError, writer.flush, 1)
+
+    def test_writes_failing_for_good_fail_the_writer(self):
+        self.server.inject_fault(operation=operations.CREATE, role=DATANODE,
+                                 count=None)
+        writer = RollingWriter(self.webhdfs, 'logs/{sequence}.log',
+                               batch_bytes=1, retry_interval=0.01,
+                               max_attempts=3)
+        writer.write('a')
+        with self.assertRaises(errors.PyWebHdfsException):
+            writer.flush(timeout=10)
+        self.assertEqual(3, self.server.call_count(operations.CREATE,
+                                                   DATANODE))
+        with self.assertRaises(errors.PyWebHdfsException):
+            writer.write('b')
+        with self.assertRaises(errors.PyWebHdfsException):
+            writer.close(timeout=10)
+        self.assertEqual(0, writer.records_written)
+
+    def test_permanent_errors_are_not_retried(self):
+        self.server.inject_fault(operation=operations.CREATE, role=DATANODE,
+                                 status=400,
+                                 exception='IllegalArgumentException',
+                                 count=None)
+        writer = RollingWriter(self.webhdfs, 'logs/{sequence}.log',
+                               batch_bytes=1, retry_interval=0.01,
+                               max_attempts=None)
+        writer.write('a')
+        with self.assertRaises(errors.BadRequest):
+            writer.close(timeout=10)
+        self.assertEqual(1, self.server.call_count(operations.CREATE,
+                                                   DATANODE))
+
+    def test_full_queue_blocks_producers(self):
+        hdfs = _BlockedHdfs()
+        writer = RollingWriter(hdfs, 'logs/{sequence}.log', batch_bytes=1,
+                               queue_size=1)
+        writer.write('a')
+        writer.write('b', timeout=1)
+        with self.assertRaises(Full):
+            writer.write('c', timeout=0.05)
+        hdfs.release.set()
+        self.assertTrue(writer.close(timeout=10))
+        self.assertEqual([('logs/0.log', 'a')], hdfs.created)
+
+
+class WhenTestingPartitionedWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebHdfsServer().start()
+        self.webhdfs = PyWebHdfsClient(user_name='hdfs',
+                                       **self.server.client_kwargs())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_records_are_written_per_partition(self):
+        writer = PartitionedWriter(
+            self.webhdfs, 'events/{date}/{customer}-{sequence}.log',
+            threads=4, manifest='events/_manifest.json')
+        for customer in ('acme', 'initech', 'acme'):
+            writer.write({'date': '2026-10-18', 'customer': customer},
+                         customer + '\n')
+        entries = writer.close()
+
+        self.assertEqual('acme\nacme\n', self.webhdfs.read_file(
+            'events/2026-10-18/acme-0.log'))
+        self.assertEqual(
+            [{'path': 'events/2026-10-18/acme-0.log', 'records': 2,
+              'bytes': 10,
+              'partition': {'date': '2026-10-18', 'customer': 'acme'}},
+             {'path': 'events/2026-10-18/initech-0.log', 'records': 1,
+              'bytes': 8,
+              'partition': {'date': '2026-10-18', 'customer': 'initech'}}],
+            sorted(entries, key=lambda entry: entry['path']))
+        manifest = json.loads(self.webhdfs.read_file('events/_manifest.json'))
+        self.assertEqual(2, len(manifest))
+
+    def test_memory_budget_and_open_partitions_are_bounded(self):
+        metrics = MetricsRegistry()
+        writer = PartitionedWriter(self.webhdfs, 'p{hour}/{sequence}',
+                                   memory_budget=8, max_open=2, threads=2,
+                                   metrics=metrics, name='events')
+        for hour in (0, 1, 0, 2, 3, 0):
+            writer.write({'hour': hour}, 'xxx')
+            self.assertLessEqual(writer.buffered_bytes, 8)
+            self.assertLessEqual(
+                metrics.gauges()['events_open_partitions'], 2)
+        writer.close()
+
+        files = [entry['path'] for entry in writer.manifest_entries()]
+        self.assertEqual(18, sum(len(self.webhdfs.read_file(path))
+                                 for path in files))
+        # partition 0 was finished to make room and got a second file
+        self.assertIn('p0/1', files)
+
+    def test_failed_writes_keep_their_records(self):
+        writer = PartitionedWriter(self.webhdfs, 'out/{part}-{sequence}',
+                                   partition_bytes=1)
+        self.server.inject_fault(operation=operations.CREATE, role=DATANODE)
+        with self.assertRaises(errors.PyWebHdfsException):
+            writer.write({'part': 'a'}, 'data')
+        writer.close()
+        self.assertEqual(['out/a-1'], list(writer.files))
+        self.assertEqual('data', self.webhdfs.read_file('out/a-1'))
@@ -1,11 +1,19 @@
 import httplib
-import json
+import time
 
 from tornado import httpclient
-from tornado.gen import coroutine, Return
+from tornado.gen import coroutine, Return, sleep
 from tornado.httpclient import HTTPError
 
-from pywebhdfs import errors, operations
+from pywebhdfs import (adaptive, bulk, compression, globbing, operations,
+                       uploads, usage, vectored)
+from pywebhdfs.metrics import NULL_TIMER
+from pywebhdfs.protocol import Response, WebHdfsProtocol, raise_for_status
+from pywebhdfs.tracing import NULL_SPAN, Span, tornado_timings
+
+
+# seconds between checks for a free slot of an adaptive limiter
+ADAPTIVE_POLL_INTERVAL = 0.005
 
 
 class PyWebHdfsClient(object):
@@ -31,6 +39,16 @@ class PyWebHdfsClient(object):
         :param cert_store: bundle of trusted certificates to use when making https
         requests to WebHDFS. This bundle must include the namenode and datanode certs if
         SSL is enabled for HDFS
+        :param metrics: optional pywebhdfs.metrics.MetricsRegistry recording
+        per-operation counts, errors, latencies and bytes transferred
+        :param tracer: optional pywebhdfs.tracing.Tracer receiving phase
+        level timings of every call
+        :param metadata_cache: optional pywebhdfs.metadata_cache.MetadataCache
+        serving file status, listing and ACL results until they expire
+        :param rate_limiter: optional pywebhdfs.ratelimit.RateLimiter capping
+        the rate of metadata calls and the bandwidth of data transfers
+        :param datanode_health: optional pywebhdfs.health.DatanodeHealth
+        routing data operations around failing datanodes
 
         >>> hdfs = PyWebHdfsClient(host='host',port='50070', user_name='hdfs')
         """
@@ -40,11 +58,20 @@ class PyWebHdfsClient(object):
         self.user_name = user_name
         self.krb_instance = krb_instance
         self.krb_primary = kwargs.pop('krb_primary', 'HTTP')
+        self.metrics = kwargs.pop('metrics', None)
+        self.tracer = kwargs.pop('tracer', None)
+        self.metadata_cache = kwargs.pop('metadata_cache', None)
+        self.rate_limiter = kwargs.pop('rate_limiter', None)
+        self.datanode_health = kwargs.pop('datanode_health', None)
         self.request_options = self._pop_request_options(kwargs)
         self.request_options['ca_certs'] = ca_trust_bundle
 
         # create base uri to be used in request operations
         self.base_uri = base_uri_pattern.format(host=self.host, port=self.port)
+        self._protocol = WebHdfsProtocol(self.base_uri, user_name,
+                                         self.metadata_cache,
+                                         self.rate_limiter,
+                                         self.datanode_health)
 
         # create our asynchronous client
         self.http_client = httpclient.AsyncHTTPClient()
@@ -93,43 +120,20 @@ class PyWebHdfsClient(object):
         Note: The create_file function does not follow automatic redirects but
         instead uses a two step call to the API as required in the
         WebHDFS documentation
-        """
-
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
 
-        # make the initial CREATE call to the HDFS namenode
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.CREATE, **optional_args)
-        request = httpclient.HTTPRequest(
-            uri, method='PUT', follow_redirects=False, body='', headers=headers, **self.request_options)
-        # we are expecting a temporary redirect exception
-        try:
-            init_response = yield self.http_client.fetch(request)
-        except HTTPError as e:
-            init_response = e.response
-
-        if not init_response.code == httplib.TEMPORARY_REDIRECT:
-            _raise_pywebhdfs_exception(
-                init_response.code, init_response.body)
-
-        # Get the address provided in the location header of the
-        # initial response from the namenode and make the CREATE request
-        # to the datanode
-        uri = init_response.headers['location']
-        headers['Content-Type'] = 'application/octet-stream'
-        # NOTE! We need to acquire a new ticket otherwise Kerberos will suspect a replay
-        # and reject our next request
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-        request = httpclient.HTTPRequest(uri, method='PUT', body=file_data, headers=headers, **self.request_options)
-        response = yield self.http_client.fetch(request)
+        A datanode URL from get_data_location, passed as location, sends
+        the data straight to that datanode, skipping the namenode step.
+        The optional arguments are part of the location, pass the same
+        ones to both calls:
 
-        if not response.code == httplib.CREATED:
-            _raise_pywebhdfs_exception(response.code, response.body)
+        >>> location = hdfs.get_data_location(my_file, operations.CREATE)
+        >>> hdfs.create_file(my_file, my_data, location=location)
+        """
 
-        raise Return(True)
+        location = kwargs.pop('location', None)
+        result = yield self._execute(operations.CREATE, path, file_data,
+                                     kwargs, location=location)
+        raise Return(result)
 
     @coroutine
     def append_file(self, path, file_data, **kwargs):
@@ -163,43 +167,14 @@ class PyWebHdfsClient(object):
         WebHDFS documentation
 
         Append is not supported in Hadoop 1.x
-        """
-
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
-        # make the initial APPEND call to the HDFS namenode
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.APPEND, **optional_args)
-        request = httpclient.HTTPRequest(
-            uri, method='POST', follow_redirects=False, body='', headers=headers, **self.request_options)
-        # we are expecting a temporary redirect here
-        try:
-            init_response = yield self.http_client.fetch(request)
-        except HTTPError as e:
-            init_response = e.response
-
-        if not init_response.code == httplib.TEMPORARY_REDIRECT:
-            _raise_pywebhdfs_exception(
-                init_response.code, init_response.body)
-
-        # Get the address provided in the location header of the
-        # initial response from the namenode and make the APPEND request
-        # to the datanode
-        uri = init_response.headers['location']
-        headers['Content-Type'] = 'application/octet-stream'
-        # NOTE! We need to acquire a new ticket otherwise Kerberos will suspect a replay
-        # and reject our next request
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-        request = httpclient.HTTPRequest(uri, method='POST', body=file_data, headers=headers, **self.request_options)
-        response = yield self.http_client.fetch(request)
 
-        if not response.code == httplib.OK:
-            _raise_pywebhdfs_exception(response.code, response.body)
+        Accepts the location of an APPEND, see create_file
+        """
 
-        raise Return(True)
+        location = kwargs.pop('location', None)
+        result = yield self._execute(operations.APPEND, path, file_data,
+                                     kwargs, location=location)
+        raise Return(result)
 
     @coroutine
     def read_file(self, path, **kwargs):
@@ -225,21 +200,129 @@ class PyWebHdfsClient(object):
         01010101010101010101010101010101
         01010101010101010101010101010101
         01010101010101010101010101010101
+
+        Accepts the location of an OPEN, see create_file
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
+        location = kwargs.pop('location', None)
+        result = yield self._execute(operations.OPEN, path, None, kwargs,
+                                     location=location)
+        raise Return(result)
 
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.OPEN, **optional_args)
-        request = httpclient.HTTPRequest(uri, follow_redirects=True, headers=headers, **self.request_options)
-        response = yield self.http_client.fetch(request)
+    @coroutine
+    def get_data_location(self, path, operation, **kwargs):
+        """
+        Asks the namenode which datanode URL a data operation goes to,
+        without contacting the datanode
 
-        if not response.code == httplib.OK:
-            _raise_pywebhdfs_exception(response.code, response.body)
+        :param path: the HDFS file path without a leading '/'
+        :param operation: operations.CREATE, APPEND or OPEN
+        :returns: the URL to pass as location to create_file,
+        append_file or read_file
+
+        Accepts the optional arguments of the operation. The namenode
+        answers noredirect=true with the URL as JSON: fetching locations
+        ahead overlaps the namenode step of the next file with the
+        transfer of the current one, and a location can be reused to
+        retry a transfer.
+        """
 
-        raise Return(response.body)
+        location = yield self._execute(operation, path, None, kwargs,
+                                       locate=True)
+        raise Return(location)
+
+    @coroutine
+    def read_ranges(self, path, ranges, gap=vectored.DEFAULT_GAP,
+                    max_length=vectored.DEFAULT_MAX_LENGTH,
+                    concurrency=bulk.DEFAULT_CONCURRENCY):
+        """
+        Reads many byte ranges of a file, merging nearby ranges into fewer
+        requests, see the synchronous client
+
+        Returns a memoryview per range, slices of the body of the read
+        that covered it.
+        """
+
+        ranges = list(ranges)
+        reads = vectored.coalesce(ranges, gap, max_length)
+
+        @coroutine
+        def fetch(read):
+            start, length, _ = read
+            data = ''
+            if length:
+                data = yield self.read_file(path, offset=start,
+                                            length=length)
+            raise Return(data)
+
+        outcomes = yield _run_many(fetch, reads, concurrency)
+        views = vectored.split(ranges, reads, outcomes)
+        vectored.record(self.metrics, 'read_ranges', ranges, reads)
+        raise Return(views)
+
+    @coroutine
+    def read_stream(self, path, callback, codec=compression.AUTO, **kwargs):
+        """
+        Reads a file from HDFS without buffering its content, passing the
+        decompressed data to callback chunk by chunk as it arrives
+
+        :param path: the HDFS file path without a leading '/'
+        :param callback: called with every chunk of data
+        :param codec: compression codec name, a
+        pywebhdfs.compression.Codec, 'auto' to pick it from the file
+        extension or None to pass on the raw bytes
+
+        Accepts the optional arguments of read_file.
+
+        Example:
+
+        >>> yield hdfs.read_stream('user/hdfs/logs/access.log.gz',
+        >>>                        output.write)
+        """
+
+        codec = compression.resolve(codec, path)
+        decompressor = codec.decompressor() if codec is not None else None
+
+        def on_chunk(chunk):
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            if chunk:
+                callback(chunk)
+
+        yield self._execute(operations.OPEN, path, None, kwargs,
+                            streaming_callback=on_chunk)
+        if decompressor is not None:
+            tail = decompressor.flush()
+            if tail:
+                callback(tail)
+        raise Return(True)
+
+    @coroutine
+    def write_stream(self, path, file_data, codec=compression.AUTO,
+                     threads=None, **kwargs):
+        """
+        Creates a new file on HDFS from a string or file like object,
+        compressing it while it is uploaded
+
+        :param path: the HDFS file path without a leading '/'
+        :param file_data: string or file like object with the uncompressed
+        data
+        :param codec: compression codec name, a
+        pywebhdfs.compression.Codec, 'auto' to pick it from the file
+        extension or None to upload the data as is
+        :param threads: compress blocks of the data on this many threads
+
+        Accepts the optional arguments of create_file. The data is read
+        and compressed on the IOLoop thread between writes to the socket.
+        """
+
+        codec = compression.resolve(codec, path)
+        if codec is not None:
+            file_data = compression.CompressingReader(
+                file_data, codec, threads=threads)
+        result = yield self._execute(operations.CREATE, path, file_data,
+                                     kwargs)
+        raise Return(result)
 
     @coroutine
     def make_dir(self, path, **kwargs):
@@ -265,21 +348,8 @@ class PyWebHdfsClient(object):
         >>> hdfs.make_dir(my_dir, permission=755)
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.MKDIRS, **optional_args)
-
-        request = httpclient.HTTPRequest(
-            uri, method='PUT', follow_redirects=True, body='', headers=headers, **self.request_options)
-        response = yield self.http_client.fetch(request)
-
-        if not response.code == httplib.OK:
-            _raise_pywebhdfs_exception(response.code, response.body)
-
-        raise Return(True)
+        result = yield self._execute(operations.MKDIRS, path, None, kwargs)
+        raise Return(result)
 
     @coroutine
     def rename_file_dir(self, path, destination_path, **kwargs):
@@ -301,24 +371,10 @@ class PyWebHdfsClient(object):
         >>> hdfs.rename_file_dir(current_dir, destination_dir)
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
         optional_args = kwargs
-        uri = self._create_uri(path, operations.RENAME,
-                               destination=destination_path,
-                               **optional_args)
-
-        request = httpclient.HTTPRequest(
-            uri, method='PUT', follow_redirects=True, body='', headers=headers, **self.request_options)
-        response = yield self.http_client.fetch(request)
-
-        if not response.code == httplib.OK:
-            _raise_pywebhdfs_exception(response.code, response.body)
-
-        raise Return(True)
-
+        optional_args['destination'] = destination_path
+        result = yield self._execute(operations.RENAME, path, None, optional_args)
+        raise Return(result)
 
     @coroutine
     def delete_file_dir(self, path, recursive=False, **kwargs):
@@ -344,20 +400,10 @@ class PyWebHdfsClient(object):
         >>> hdfs.delete_file_dir(my_file, recursive=True)
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
         optional_args = kwargs
-        uri = self._create_uri(path, operations.DELETE, recursive=recursive, **optional_args)
-        request = httpclient.HTTPRequest(
-            uri, method='DELETE', follow_redirects=True, headers=headers, **self.request_options)
-        response = yield self.http_client.fetch(request)
-
-        if not response.code == httplib.OK:
-            _raise_pywebhdfs_exception(response.code, response.body)
-
-        raise Return(True)
+        optional_args['recursive'] = recursive
+        result = yield self._execute(operations.DELETE, path, None, optional_args)
+        raise Return(result)
 
     @coroutine
     def get_file_dir_status(self, path, **kwargs):
@@ -410,20 +456,8 @@ class PyWebHdfsClient(object):
         }
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.GETFILESTATUS, **optional_args)
-
-        request = httpclient.HTTPRequest(uri, follow_redirects=True, headers=headers, **self.request_options)
-        response = yield self.http_client.fetch(request)
-
-        if not response.code == httplib.OK:
-            _raise_pywebhdfs_exception(response.code, response.body)
-
-        raise Return(json.loads(response.body))
+        result = yield self._execute(operations.GETFILESTATUS, path, None, kwargs)
+        raise Return(result)
 
     @coroutine
     def list_dir(self, path, **kwargs):
@@ -474,19 +508,8 @@ class PyWebHdfsClient(object):
 
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.LISTSTATUS, **optional_args)
-        request = httpclient.HTTPRequest(uri, follow_redirects=True, headers=headers, **self.request_options)
-        response = yield self.http_client.fetch(request)
-
-        if not response.code == httplib.OK:
-            _raise_pywebhdfs_exception(response.code, response.body)
-
-        raise Return(json.loads(response.body))
+        result = yield self._execute(operations.LISTSTATUS, path, None, kwargs)
+        raise Return(result)
 
     @coroutine
     def set_owner(self, path, owner, group, **kwargs):
@@ -500,80 +523,345 @@ class PyWebHdfsClient(object):
 
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
         optional_args = kwargs
         optional_args['owner'] = owner
         optional_args['group'] = group
-        uri = self._create_uri(path, operations.SETOWNER, **optional_args)
-        request = httpclient.HTTPRequest(uri, method='PUT', follow_redirects=True, headers=headers,
-                                         **self.request_options)
-        response = yield self.http_client.fetch(request)
+        result = yield self._execute(operations.SETOWNER, path, None, optional_args)
+        raise Return(result)
+
+    @coroutine
+    def get_acl_status(self, path, **kwargs):
+        result = yield self._execute(operations.GETACLSTATUS, path, None, kwargs)
+        raise Return(result)
 
-        if not response.status_code == httplib.OK:
-            _raise_pywebhdfs_exception(response.status_code, response.content)
+    @coroutine
+    def get_content_summary(self, path, **kwargs):
+        result = yield self._execute(operations.GETCONTENTSUMMARY, path, None,
+                                     kwargs)
+        raise Return(usage.ContentSummary.from_json(result))
 
-        raise Return(True)
+    @coroutine
+    def get_quota_usage(self, path, **kwargs):
+        result = yield self._execute(operations.GETQUOTAUSAGE, path, None,
+                                     kwargs)
+        raise Return(usage.QuotaUsage.from_json(result))
 
     @coroutine
-    def get_acl_status(self, path, **kwargs):
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
+    def du(self, path, concurrency=bulk.DEFAULT_CONCURRENCY):
+        """
+        Returns the sorted (path, ContentSummary) of every child of path,
+        see the synchronous client
+        """
+        disk_usage = usage.DiskUsage(path)
+        tasks = disk_usage.tasks
+        while tasks:
+            outcomes = yield _run_many(
+                lambda task: self._execute(task[0], task[1], None, {}),
+                tasks, concurrency)
+            tasks = disk_usage.resolve(tasks, outcomes)
+        raise Return(disk_usage.entries)
 
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.GETACLSTATUS, **optional_args)        
-        request = httpclient.HTTPRequest(uri, follow_redirects=True, headers=headers, **self.request_options)
-        response = yield self.http_client.fetch(request)
+    @coroutine
+    def status_many(self, paths, concurrency=bulk.DEFAULT_CONCURRENCY,
+                    list_threshold=bulk.LIST_THRESHOLD,
+                    list_ratio=bulk.LIST_RATIO):
+        """
+        Gets the status of many paths with at most concurrency calls in
+        flight, listing directories with list_threshold or more requested
+        paths making up list_ratio of their children, see the synchronous
+        client
+        """
+        batch = bulk.path_batch(paths)
+        lookup = bulk.StatusLookup(batch.tasks, list_threshold, list_ratio)
+        tasks = lookup.tasks
+        while tasks:
+            outcomes = yield _run_many(
+                lambda task: self._execute(task[0], task[1], None, {}),
+                tasks, concurrency)
+            tasks = lookup.resolve(tasks, outcomes)
+        raise Return(batch.results(lookup.outcomes))
+
+    @coroutine
+    def glob(self, pattern, concurrency=bulk.DEFAULT_CONCURRENCY):
+        """
+        Returns the sorted paths matching a glob pattern, see the
+        synchronous client
+        """
+        expansion = globbing.Glob(pattern)
+        tasks = expansion.tasks
+        while tasks:
+            outcomes = yield _run_many(
+                lambda task: self._execute(task[0], task[1], None, {}),
+                tasks, concurrency)
+            tasks = expansion.resolve(tasks, outcomes)
+        raise Return(expansion.matches)
 
-        if not response.code == httplib.OK:
-            _raise_pywebhdfs_exception(response.code, response.body)
+    @coroutine
+    def make_dirs_many(self, paths, concurrency=bulk.DEFAULT_CONCURRENCY,
+                       **kwargs):
+        batch = bulk.make_dirs_batch(paths)
+        outcomes = yield _run_many(
+            lambda path: self.make_dir(path, **kwargs), batch.tasks,
+            concurrency)
+        raise Return(batch.results(outcomes))
 
-        raise Return(json.loads(response.body))
+    @coroutine
+    def rename_many(self, pairs, concurrency=bulk.DEFAULT_CONCURRENCY,
+                    **kwargs):
+        batch = bulk.rename_batch(pairs)
+        outcomes = yield _run_many(
+            lambda pair: self.rename_file_dir(pair[0], pair[1], **kwargs),
+            batch.tasks, concurrency)
+        raise Return(batch.results(outcomes, name=lambda pair: pair[0]))
+
+    @coroutine
+    def delete_many(self, paths, recursive=False,
+                    concurrency=bulk.DEFAULT_CONCURRENCY, **kwargs):
+        batch = bulk.delete_batch(paths, recursive)
+        outcomes = yield _run_many(
+            lambda path: self.delete_file_dir(path, recursive, **kwargs),
+            batch.tasks, concurrency)
+        raise Return(batch.results(outcomes))
+
+    @coroutine
+    def set_owner_many(self, paths, owner, group,
+                       concurrency=bulk.DEFAULT_CONCURRENCY, **kwargs):
+        batch = bulk.path_batch(paths)
+        outcomes = yield _run_many(
+            lambda path: self.set_owner(path, owner, group, **kwargs),
+            batch.tasks, concurrency)
+        raise Return(batch.results(outcomes))
+
+    @coroutine
+    def upload_many(self, files, concurrency=uploads.DEFAULT_CONCURRENCY,
+                    **kwargs):
+        """
+        Creates many files, see the synchronous client
+
+        Up to concurrency files are in flight, each asking the namenode
+        for its location and then sending its data, so the namenode step
+        of some files overlaps the transfer of others. Connections are
+        reused as far as the AsyncHTTPClient implementation keeps them.
+        """
+
+        items = uploads.upload_items(files)
+        sizes = [0] * len(items)
+        started = time.time()
+
+        @coroutine
+        def upload(task):
+            index, (path, source) = task
+            location = yield self._execute(operations.CREATE, path, None,
+                                           kwargs, locate=True)
+            data = uploads.open_source(source)
+            try:
+                sizes[index] = uploads.data_size(data)
+                result = yield self._execute(operations.CREATE, path, data,
+                                             kwargs, location=location)
+            finally:
+                uploads.close_source(source, data)
+            raise Return(result)
+
+        outcomes = yield _run_many(upload, list(enumerate(items)),
+                                   concurrency)
+        raise Return(uploads.report(items, outcomes, sizes, started,
+                                    self.metrics))
+
+    @coroutine
+    def _execute(self, operation, path, data, params,
+                 streaming_callback=None, location=None, locate=False):
+        """
+        internal function driving a protocol Call of the operation with
+        the asynchronous client, streaming_callback receives the body of
+        the result instead of buffering it
+        """
+        call = self._protocol.call(operation, path, data, params,
+                                   self._timer(operation),
+                                   self._span(operation, path),
+                                   streaming_callback is not None,
+                                   location, locate)
+        with call:
+            request = call.start()
+            while request is not None:
+                if call.pause:
+                    yield sleep(call.pause)
+                # NOTE! We need to acquire a new ticket for every request
+                # otherwise Kerberos will suspect a replay and reject it
+                self._authorize(request.headers, call.span)
+                call.sending()
+                try:
+                    response = yield self._send(request, call,
+                                                streaming_callback)
+                except (HTTPError, IOError) as e:
+                    # timeouts and connection errors, answers with an
+                    # error status are responses
+                    request = call.fail(e)
+                    if request is None:
+                        raise
+                    continue
+                request = call.receive(response)
+            if call.pause:
+                yield sleep(call.pause)
+        raise Return(call.result)
+
+    @coroutine
+    def _send(self, request, call, streaming_callback=None):
+        """
+        internal function sending a protocol Request of the call with the
+        asynchronous client
+        """
+        options = dict(self.request_options)
+        body = request.body
+        if hasattr(body, 'read'):
+            options['body_producer'] = _body_producer(body, call.sent)
+            body = None
+        elif body is None and request.method in ('PUT', 'POST'):
+            body = ''
+        if request.timeout is not None:
+            options['request_timeout'] = request.timeout
+        sink = None
+        if request.stream:
+            sink = _StreamingSink(streaming_callback, call.received)
+            options['header_callback'] = sink.on_header
+            options['streaming_callback'] = sink.on_chunk
+        http_request = httpclient.HTTPRequest(
+            request.uri, method=request.method, body=body,
+            headers=request.headers,
+            follow_redirects=request.follow_redirects, **options)
+        # redirects and errors are answered by the protocol, not raised
+        try:
+            response = yield self.http_client.fetch(http_request)
+        except HTTPError as e:
+            if e.response is None:
+                raise
+            response = e.response
+        connect, ttfb = tornado_timings(response) if call.traced \
+            else (None, None)
+        body = sink.body if sink is not None else response.body
+        raise Return(Response(response.code, response.headers, body, None,
+                              connect, ttfb))
+
+    def _timer(self, operation):
+        """
+        internal function returning the metrics context manager for a call
+        of the operation, a no-op when metrics are disabled
+        """
+        if self.metrics is None:
+            return NULL_TIMER
+        return self.metrics.timer(operation)
+
+    def _span(self, operation, path):
+        """
+        internal function returning the tracing span for a call of the
+        operation, a no-op when tracing is disabled
+        """
+        if self.tracer is None:
+            return NULL_SPAN
+        return Span(self.tracer, operation, path)
+
+    def _authorize(self, headers, span):
+        """
+        internal function adding a fresh Kerberos ticket to the headers
+        """
+        if self.krb_instance:
+            start = time.time()
+            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
+            span.auth(time.time() - start)
 
     def _create_uri(self, path, operation, **kwargs):
         """
         internal function used to construct the WebHDFS request uri based on
         the <PATH>, <OPERATION>, and any provided optional arguments
         """
+        return self._protocol.create_uri(path, operation, kwargs)
 
-        path_param = path
 
-        # setup the parameter represent the WebHDFS operation
-        operation_param = '?op={operation}'.format(operation=operation)
+@coroutine
+def _run_many(function, tasks, concurrency):
+    """
+    (result, error) of the coroutine function(task) for every task, with
+    at most concurrency of them running at a time, or as many as a
+    pywebhdfs.adaptive.AdaptiveLimiter allows
+    """
+    outcomes = [None] * len(tasks)
+    pending = iter(enumerate(tasks))
+    limiter = concurrency \
+        if isinstance(concurrency, adaptive.AdaptiveLimiter) else None
 
-        # configure authorization based on provided credentials
-        auth_param = str()
-        if self.user_name:
-            auth_param = '&user.name={user_name}'.format(
-                user_name=self.user_name)
+    @coroutine
+    def worker():
+        for index, task in pending:
+            started = None
+            if limiter is not None:
+                started = limiter.try_acquire()
+                while started is None:
+                    yield sleep(ADAPTIVE_POLL_INTERVAL)
+                    started = limiter.try_acquire()
+            try:
+                result = yield function(task)
+                outcomes[index] = (result, None)
+            except Exception as e:
+                outcomes[index] = (None, e)
+            if limiter is not None:
+                limiter.release(started, outcomes[index][1])
+
+    yield [worker() for _ in xrange(max(
+        adaptive.pool_size(concurrency, len(tasks)), 1))]
+    raise Return(outcomes)
+
+
+def _body_producer(fileobj, on_chunk,
+                   chunk_size=compression.DEFAULT_CHUNK_SIZE):
+    """
+    Tornado body_producer streaming a file like object as the request body,
+    reporting the size of every chunk to on_chunk and waiting for the
+    seconds it returns
+    """
+    @coroutine
+    def produce(write):
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                return
+            delay = on_chunk(len(chunk))
+            if delay:
+                yield sleep(delay)
+            yield write(chunk)
+    return produce
+
+
+class _StreamingSink(object):
+    """
+    Passes the body of a 200 response to callback as it arrives, reporting
+    the size of every chunk to received, and buffers the body of any other
+    response for the protocol to inspect
+
+    The connection cannot be held back from the callback, the waits
+    received asks for are taken by the call once the response is complete.
+    """
 
-        # setup any optional parameters
-        keyword_params = str()
-        for key in kwargs:
-            keyword_params = '{params}&{key}={value}'.format(
-                params=keyword_params, key=key, value=str(kwargs[key]).lower())
+    def __init__(self, callback, received):
+        self.callback = callback
+        self.received = received
+        self.status = None
+        self._buffered = []
 
-        # build the complete uri from the base uri and all configured params
-        uri = '{base_uri}{path}{operation}{keyword_args}{auth}'.format(
-            base_uri=self.base_uri, path=path_param,
-            operation=operation_param, keyword_args=keyword_params,
-            auth=auth_param)
+    def on_header(self, line):
+        if self.status is None and line.startswith('HTTP/'):
+            self.status = int(line.split(' ', 2)[1])
 
-        return uri
+    def on_chunk(self, chunk):
+        if self.status == httplib.OK:
+            self.received(len(chunk))
+            self.callback(chunk)
+        else:
+            self._buffered.append(chunk)
 
+    @property
+    def body(self):
+        return ''.join(self._buffered)
 
-def _raise_pywebhdfs_exception(resp_code, message=None):
 
-    if resp_code == httplib.BAD_REQUEST:
-        raise errors.BadRequest(msg=message)
-    elif resp_code == httplib.UNAUTHORIZED:
-        raise errors.Unauthorized(msg=message)
-    elif resp_code == httplib.NOT_FOUND:
-        raise errors.FileNotFound(msg=message)
-    elif resp_code == httplib.METHOD_NOT_ALLOWED:
-        raise errors.MethodNotAllowed(msg=message)
-    else:
-        raise errors.PyWebHdfsException(msg=message)
+# kept for callers importing it from here, the status mapping now lives in
+# pywebhdfs.protocol
+_raise_pywebhdfs_exception = raise_for_status
@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import deque
+from urlparse import urlparse
+
+
+# phases a client call is broken into
+NAMENODE = 'namenode'
+AUTH = 'auth'
+DATANODE = 'datanode'
+DATANODE_CONNECT = 'datanode_connect'
+DATANODE_TTFB = 'datanode_ttfb'
+DATANODE_TRANSFER = 'datanode_transfer'
+
+
+class Tracer(object):
+    """
+    Base class for tracing hooks. All hooks are no-ops, subclass and
+    override the ones you are interested in.
+
+    >>> class SlowWriteLogger(Tracer):
+    >>>     def on_finish(self, span):
+    >>>         if span.duration > 1.0:
+    >>>             print(span.operation, span.tags, span.phases)
+    >>>
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070',
+    >>>                        tracer=SlowWriteLogger())
+    """
+
+    def on_request_start(self, span, method, uri):
+        """
+        called before every HTTP request issued for the span
+        """
+
+    def on_redirect(self, span, location):
+        """
+        called when the namenode redirects the call to a datanode
+        """
+
+    def on_response(self, span, status, elapsed):
+        """
+        called when an HTTP response for the span has been received,
+        elapsed is the wall time of the request in seconds
+        """
+
+    def on_auth(self, span, elapsed):
+        """
+        called after a Kerberos service ticket has been acquired
+        """
+
+    def on_finish(self, span):
+        """
+        called once the client call has completed or failed
+        """
+
+
+class Span(object):
+    """
+    Timing breakdown of a single client call
+
+    phases maps a phase name to the seconds spent in it:
+
+    namenode: round trip(s) to the namenode
+    auth: Kerberos ticket acquisition
+    datanode: wall time of the datanode request
+    datanode_connect: connection setup to the datanode, when the transport
+    reports it (Tornado's curl client)
+    datanode_ttfb: request start until the first response byte, this
+    includes sending the body for uploads
+    datanode_transfer: receiving the response body after the first byte
+
+    tags holds the 'datanode' host:port the call was redirected to.
+    """
+
+    def __init__(self, tracer, operation, path):
+        self.tracer = tracer
+        self.operation = operation
+        self.path = path
+        self.phases = dict()
+        self.tags = dict()
+        self.error = None
+        self.start = time.time()
+        self.end = None
+
+    @property
+    def duration(self):
+        end = self.end if self.end is not None else time.time()
+        return end - self.start
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.finish()
+        return False
+
+    def add_phase(self, phase, seconds):
+        if seconds is None:
+            return
+        self.phases[phase] = self.phases.get(phase, 0.0) + max(seconds, 0.0)
+
+    def request_start(self, method, uri):
+        self.tracer.on_request_start(self, method, uri)
+
+    def redirect(self, location):
+        self.tags['datanode'] = urlparse(location).netloc
+        self.tracer.on_redirect(self, location)
+
+    def response(self, phase, status, elapsed, **breakdown):
+        """
+        record a completed request of the given phase, breakdown holds
+        optional sub phases such as datanode_ttfb
+        """
+        self.add_phase(phase, elapsed)
+        for sub_phase, seconds in breakdown.items():
+            self.add_phase(sub_phase, seconds)
+        self.tracer.on_response(self, status, elapsed)
+
+    def auth(self, elapsed):
+        self.add_phase(AUTH, elapsed)
+        self.tracer.on_auth(self, elapsed)
+
+    def finish(self):
+        self.end = time.time()
+        self.tracer.on_finish(self)
+
+
+class _NullSpan(object):
+    """
+    Stand-in used by the clients when tracing is disabled
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def add_phase(self, phase, seconds):
+        pass
+
+    def request_start(self, method, uri):
+        pass
+
+    def redirect(self, location):
+        pass
+
+    def response(self, phase, status, elapsed, **breakdown):
+        pass
+
+    def auth(self, elapsed):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class SpanRecorder(Tracer):
+    """
+    Tracer keeping the most recent finished spans in memory and
+    summarizing their phases per datanode
+
+    >>> recorder = SpanRecorder()
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', tracer=recorder)
+    >>> hdfs.create_file('user/hdfs/file.txt', data)
+    >>> recorder.summary()
+    {'dn1:50075': {'datanode_ttfb': {'count': 1, 'mean': 0.2, 'max': 0.2},
+                   'namenode': {...}}}
+    """
+
+    def __init__(self, max_spans=10000):
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def on_finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """
+        returns count, mean and max seconds of every phase grouped by the
+        datanode the spans were redirected to ('' for namenode only calls)
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        totals = dict()
+        for span in spans:
+            datanode = totals.setdefault(span.tags.get('datanode', ''), {})
+            for phase, seconds in span.phases.items():
+                stats = datanode.setdefault(
+                    phase, {'count': 0, 'total': 0.0, 'max': 0.0})
+                stats['count'] += 1
+                stats['total'] += seconds
+                stats['max'] = max(stats['max'], seconds)
+
+        for datanode in totals.values():
+            for stats in datanode.values():
+                stats['mean'] = stats.pop('total') / stats['count']
+        return totals
+
+
+def requests_timings(response):
+    """
+    (connect, ttfb) of a requests response, requests measures the time
+    until the response headers were parsed as response.elapsed but does
+    not expose connection setup
+    """
+    try:
+        ttfb = response.elapsed.total_seconds()
+    except (AttributeError, TypeError):
+        return None, None
+    if not isinstance(ttfb, float):
+        return None, None
+    return None, ttfb
+
+
+def tornado_timings(response):
+    """
+    (connect, ttfb) of a Tornado response, only the curl based client
+    fills in time_info
+    """
+    info = getattr(response, 'time_info', None) or dict()
+    if 'starttransfer' not in info:
+        return None, None
+    connect = info.get('appconnect') or info.get('connect')
+    return connect, info['starttransfer'] - info.get('pretransfer', 0.0)
@@ -0,0 +1,131 @@
+"""
+Pipelined upload of many small files
+
+create_file runs the namenode redirect, the datanode connection and the
+transfer of a file one after the other. upload_many overlaps them across
+files: the datanode location of upcoming files is asked from the namenode
+(with noredirect=true, see get_data_location) while earlier files are
+being sent, and every transfer thread keeps its connections open so
+consecutive files sent to the same datanode reuse them:
+
+    >>> report = hdfs.upload_many(
+    >>>     [('user/hdfs/in/a.json', '{"a": 1}'),
+    >>>      ('user/hdfs/in/b.csv', LocalFile('/tmp/b.csv'))],
+    >>>     concurrency=16, overwrite=True)
+    >>> report.files_per_second, report.bytes_per_second
+    >>> failed = [r for r in report.results if not r.ok]
+
+Sources are in-memory data (str, bytearray, buffer), a file like object
+read from its current position, which is left open, or a LocalFile naming
+a local path, which is streamed from disk. A failing file does not stop
+the others, the report holds a bulk.BulkResult per file in input order.
+The bytes of the report are those of the data sent, a local file counts
+with the size it had when it was opened for sending.
+"""
+import io
+import os
+import stat
+import time
+from collections import namedtuple
+
+from pywebhdfs import bulk
+
+
+DEFAULT_CONCURRENCY = 16
+
+
+class LocalFile(namedtuple('LocalFile', 'path')):
+    """
+    A local file to upload, read from disk when its turn comes
+    """
+
+    __slots__ = ()
+
+
+def data_size(data):
+    """
+    bytes of the data open_source returned, a file like object counts from
+    its position to its end, 0 when it cannot seek (a pipe or a socket)
+    """
+    if not hasattr(data, 'read'):
+        return len(data)
+    try:
+        status = os.fstat(data.fileno())
+        if stat.S_ISREG(status.st_mode):
+            return max(status.st_size - data.tell(), 0)
+    except (AttributeError, io.UnsupportedOperation, IOError, OSError):
+        # in-memory files have no descriptor
+        pass
+    try:
+        position = data.tell()
+        data.seek(0, os.SEEK_END)
+        size = data.tell() - position
+        data.seek(position)
+        return size
+    except (AttributeError, io.UnsupportedOperation, IOError, OSError):
+        return 0
+
+
+def open_source(source):
+    """
+    the data to send for an upload source, a file object for a LocalFile
+    which close_source closes
+    """
+    if isinstance(source, LocalFile):
+        return open(source.path, 'rb')
+    if isinstance(source, (bytearray, memoryview)):
+        return bytes(source)
+    return source
+
+
+def close_source(source, data):
+    """
+    close the file open_source opened for a LocalFile, the file objects
+    of the caller are left open
+    """
+    if isinstance(source, LocalFile):
+        data.close()
+
+
+class UploadReport(namedtuple('UploadReport', 'results files bytes seconds')):
+    """
+    Outcome of upload_many: a BulkResult per file, the number and bytes of
+    the files uploaded and the wall time it took
+    """
+
+    __slots__ = ()
+
+    @property
+    def files_per_second(self):
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+
+def report(items, outcomes, sizes, started, metrics=None, name='upload'):
+    """
+    UploadReport of the (result, error) outcomes of the (path, source)
+    items of an upload started at started, sizes holds the data_size of
+    every item sent. Recorded as the <name>_files_per_second and
+    <name>_bytes_per_second gauges of metrics
+    """
+    seconds = time.time() - started
+    results = [bulk.BulkResult(path, result, error)
+               for (path, _), (result, error) in zip(items, outcomes)]
+    uploaded = [size for size, result in zip(sizes, results) if result.ok]
+    upload = UploadReport(results, len(uploaded), sum(uploaded), seconds)
+    if metrics is not None:
+        metrics.set_gauge(name + '_files_per_second', upload.files_per_second)
+        metrics.set_gauge(name + '_bytes_per_second', upload.bytes_per_second)
+    return upload
+
+
+def upload_items(uploads):
+    """
+    (path, source) pairs of a dict or an iterable of pairs
+    """
+    if isinstance(uploads, dict):
+        return sorted(uploads.items())
+    return list(uploads)
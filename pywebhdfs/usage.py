@@ -0,0 +1,106 @@
+"""
+Space usage of HDFS directories computed by the namenode
+
+GETCONTENTSUMMARY and GETQUOTAUSAGE return the totals of a whole subtree
+in one call, instead of listing it recursively and summing lengths:
+
+    >>> hdfs = PyWebHdfsClient(host='host', port='50070', user_name='hdfs')
+    >>> hdfs.get_content_summary('user/hdfs/warehouse').length
+    >>> for path, summary in hdfs.du('user/hdfs/warehouse'):
+    >>>     print path, summary.length, summary.space_consumed
+
+du lists the directory once and asks for the content summary of every
+subdirectory in parallel; the sizes of plain files come from the listing.
+Quotas of -1 mean no quota is set.
+"""
+from collections import namedtuple
+
+from pywebhdfs import errors, operations
+
+
+class ContentSummary(namedtuple('ContentSummary', [
+        'length', 'file_count', 'directory_count', 'space_consumed',
+        'quota', 'space_quota', 'type_quota'])):
+    """
+    Totals of a subtree: bytes, files, directories (the subtree's root
+    included), raw bytes consumed by all replicas and its quotas
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_json(cls, response):
+        summary = response['ContentSummary']
+        return cls(summary['length'], summary['fileCount'],
+                   summary['directoryCount'], summary['spaceConsumed'],
+                   summary.get('quota', -1), summary.get('spaceQuota', -1),
+                   summary.get('typeQuota', {}))
+
+    @classmethod
+    def from_file_status(cls, status):
+        return cls(status['length'], 1, 0,
+                   status['length'] * status.get('replication', 1),
+                   -1, -1, {})
+
+
+class QuotaUsage(namedtuple('QuotaUsage', [
+        'file_and_directory_count', 'quota', 'space_consumed',
+        'space_quota', 'type_quota'])):
+    """
+    Namespace and space usage of a subtree against its quotas
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_json(cls, response):
+        usage = response['QuotaUsage']
+        return cls(usage['fileAndDirectoryCount'], usage.get('quota', -1),
+                   usage['spaceConsumed'], usage.get('spaceQuota', -1),
+                   usage.get('typeQuota', {}))
+
+
+class DiskUsage(object):
+    """
+    Plans the calls of du without performing I/O, like
+    pywebhdfs.globbing.Glob: tasks are (operation, path) calls,
+    resolve(tasks, outcomes) returns the calls still needed and entries
+    finally holds the sorted (path, ContentSummary) of every child of
+    path, or of path itself if it is a file.
+    """
+
+    def __init__(self, path):
+        self.path = path.rstrip('/')
+        self.entries = []
+        self.tasks = [(operations.LISTSTATUS, self.path)]
+
+    def resolve(self, tasks, outcomes):
+        for task, (result, error) in zip(tasks, outcomes):
+            if error is not None:
+                # a subdirectory removed after the listing is simply gone
+                if task[0] == operations.GETCONTENTSUMMARY and \
+                        isinstance(error, errors.FileNotFound):
+                    continue
+                raise error
+            if task[0] == operations.GETCONTENTSUMMARY:
+                self.entries.append((task[1],
+                                     ContentSummary.from_json(result)))
+
+        if tasks[0][0] == operations.GETCONTENTSUMMARY:
+            self.entries.sort()
+            return []
+        return self._split_listing(outcomes[0][0])
+
+    def _split_listing(self, listing):
+        summaries = []
+        for status in listing['FileStatuses']['FileStatus']:
+            name = status['pathSuffix']
+            path = self.path + '/' + name if name else self.path
+            if status['type'] == 'DIRECTORY':
+                summaries.append((operations.GETCONTENTSUMMARY, path))
+            else:
+                self.entries.append((path,
+                                     ContentSummary.from_file_status(status)))
+        if not summaries:
+            self.entries.sort()
+        return summaries
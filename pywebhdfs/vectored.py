@@ -0,0 +1,99 @@
+"""
+Vectored reads of many byte ranges of one file
+
+Columnar formats read many small ranges of the same file: column chunks,
+page headers, footers. Sending one OPEN per range pays a namenode call
+and a datanode request each time. read_ranges sorts the ranges, merges
+those less than gap bytes apart into a single read of at most
+max_length bytes and sends the merged reads concurrently:
+
+    >>> views = hdfs.read_ranges('user/hdfs/table.parquet',
+    >>>                          [(4, 1024), (2048, 512), (1 << 20, 64)],
+    >>>                          gap=64 * 1024)
+    >>> views[1].tobytes()
+
+Each merged read lands in a buffer of its own, the result of every
+requested range is a memoryview slice of that buffer, in request order,
+so no bytes are copied. Overlapping ranges share their bytes. Ranges
+past the end of the file are cut short. With a metrics registry the
+<name>_ranges_total, <name>_requests_total and
+<name>_requests_saved_total counters record how many ranges were asked
+for, how many reads were sent and the difference.
+"""
+from pywebhdfs import bulk
+
+
+# ranges this close are read together, the bytes between them are cheaper
+# to transfer than another request
+DEFAULT_GAP = 64 * 1024
+# merged reads are not grown beyond this many bytes
+DEFAULT_MAX_LENGTH = 16 * 1024 * 1024
+
+
+def coalesce(ranges, gap=DEFAULT_GAP, max_length=DEFAULT_MAX_LENGTH):
+    """
+    (offset, length, indexes) reads covering the (offset, length) ranges
+    in offset order, indexes are the positions in ranges of the ranges a
+    read covers
+    """
+    reads = []
+    for index in sorted(xrange(len(ranges)), key=lambda i: ranges[i]):
+        offset, length = ranges[index]
+        end = offset + length
+        if reads:
+            read = reads[-1]
+            merged_end = max(read[1], end)
+            if offset - read[1] <= gap and \
+                    merged_end - read[0] <= max_length:
+                read[1] = merged_end
+                read[2].append(index)
+                continue
+        reads.append([offset, end, [index]])
+    return [(start, end - start, indexes) for start, end, indexes in reads]
+
+
+def split(ranges, reads, outcomes):
+    """
+    memoryview of every range, in ranges order, sliced from the buffers of
+    the (result, error) outcomes of the coalesced reads, raises the error
+    of the first failed read
+    """
+    views = [None] * len(ranges)
+    for (start, _, indexes), (buffer, error) in zip(reads, outcomes):
+        if error is not None:
+            raise error
+        view = memoryview(buffer)
+        for index in indexes:
+            offset, length = ranges[index]
+            views[index] = view[offset - start:offset - start + length]
+    return views
+
+
+def record(metrics, name, ranges, reads):
+    if metrics is not None:
+        metrics.increment(name + '_ranges_total', len(ranges))
+        metrics.increment(name + '_requests_total', len(reads))
+        metrics.increment(name + '_requests_saved_total',
+                          len(ranges) - len(reads))
+
+
+def read_ranges(hdfs, path, ranges, gap=DEFAULT_GAP,
+                max_length=DEFAULT_MAX_LENGTH,
+                concurrency=bulk.DEFAULT_CONCURRENCY, metrics=None,
+                name='read_ranges'):
+    """
+    read the (offset, length) ranges of a file, returns a memoryview per
+    range, see the module documentation
+    """
+    ranges = list(ranges)
+    reads = coalesce(ranges, gap, max_length)
+
+    def fetch(read):
+        start, length, _ = read
+        buffer = bytearray(length)
+        received = hdfs.read_into(path, buffer, start)
+        return memoryview(buffer)[:received]
+
+    views = split(ranges, reads, bulk.run(fetch, reads, concurrency))
+    record(metrics, name, ranges, reads)
+    return views
@@ -1,8 +1,24 @@
+import Queue
 import httplib
+import threading
+import time
 
 import requests
+from requests.exceptions import RequestException
+from requests.utils import super_len
 
-from pywebhdfs import errors, operations
+from pywebhdfs import (arrays, bulk, compression, downloads, globbing,
+                       operations, splits, uploads, usage, vectored)
+# re-exported for callers using pywebhdfs.webhdfs.errors
+from pywebhdfs import errors  # noqa: F401
+from pywebhdfs.metrics import NULL_TIMER
+from pywebhdfs.protocol import Response, WebHdfsProtocol, raise_for_status
+from pywebhdfs.tracing import NULL_SPAN, Span, requests_timings
+
+
+# operations whose changes make content cache entries stale
+CONTENT_CHANGES = (operations.CREATE, operations.APPEND, operations.RENAME,
+                   operations.DELETE)
 
 
 class PyWebHdfsClient(object):
@@ -25,7 +41,18 @@ class PyWebHdfsClient(object):
         :param port: the port number for WebHDFS on the namenode
         :param user_name: WebHDFS user.name used for authentication
         :param base_uri_pattern: format string for base webhdfs URI
-
+        :param metrics: optional pywebhdfs.metrics.MetricsRegistry recording
+        per-operation counts, errors, latencies and bytes transferred
+        :param tracer: optional pywebhdfs.tracing.Tracer receiving phase
+        level timings of every call
+        :param content_cache: optional pywebhdfs.cache.ContentCache serving
+        whole file reads from local disk
+        :param metadata_cache: optional pywebhdfs.metadata_cache.MetadataCache
+        serving file status, listing and ACL results until they expire
+        :param rate_limiter: optional pywebhdfs.ratelimit.RateLimiter capping
+        the rate of metadata calls and the bandwidth of data transfers
+        :param datanode_health: optional pywebhdfs.health.DatanodeHealth
+        routing data operations around failing datanodes
 
         >>> hdfs = PyWebHdfsClient(host='host',port='50070', user_name='hdfs')
         """
@@ -35,9 +62,19 @@ class PyWebHdfsClient(object):
         self.user_name = user_name
         self.krb_instance = krb_instance
         self.krb_primary = kwargs.pop('krb_primary', 'HTTP')
+        self.metrics = kwargs.pop('metrics', None)
+        self.tracer = kwargs.pop('tracer', None)
+        self.content_cache = kwargs.pop('content_cache', None)
+        self.metadata_cache = kwargs.pop('metadata_cache', None)
+        self.rate_limiter = kwargs.pop('rate_limiter', None)
+        self.datanode_health = kwargs.pop('datanode_health', None)
 
         # create base uri to be used in request operations
         self.base_uri = base_uri_pattern.format(host=host, port=port)
+        self._protocol = WebHdfsProtocol(self.base_uri, user_name,
+                                         self.metadata_cache,
+                                         self.rate_limiter,
+                                         self.datanode_health)
 
     def create_file(self, path, file_data, **kwargs):
         """
@@ -75,36 +112,19 @@ class PyWebHdfsClient(object):
         Note: The create_file function does not follow automatic redirects but
         instead uses a two step call to the API as required in the
         WebHDFS documentation
-        """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
+        A datanode URL from get_data_location, passed as location, sends
+        the data straight to that datanode, skipping the namenode step.
+        The optional arguments are part of the location, pass the same
+        ones to both calls:
 
-        # make the initial CREATE call to the HDFS namenode
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.CREATE, **optional_args)
-        init_response = requests.put(uri, allow_redirects=False, headers=headers)
-
-        if not init_response.status_code == httplib.TEMPORARY_REDIRECT:
-            _raise_pywebhdfs_exception(
-                init_response.status_code, init_response.content)
-
-        # Get the address provided in the location header of the
-        # initial response from the namenode and make the CREATE request
-        # to the datanode
-        uri = init_response.headers['location']
-        headers['Content-Type'] = 'application/octet-stream'
-        # NOTE! We need to acquire a new ticket otherwise Kerberos will suspect a replay
-        # and reject our next request
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-        response = requests.put(uri, data=file_data, headers=headers)
-
-        if not response.status_code == httplib.CREATED:
-            _raise_pywebhdfs_exception(response.status_code, response.content)
+        >>> location = hdfs.get_data_location(my_file, operations.CREATE)
+        >>> hdfs.create_file(my_file, my_data, location=location)
+        """
 
-        return True
+        location = kwargs.pop('location', None)
+        return self._execute(operations.CREATE, path, file_data, kwargs,
+                             location=location)
 
     def append_file(self, path, file_data, **kwargs):
         """
@@ -137,36 +157,13 @@ class PyWebHdfsClient(object):
         WebHDFS documentation
 
         Append is not supported in Hadoop 1.x
-        """
-
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
 
-        # make the initial APPEND call to the HDFS namenode
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.APPEND, **optional_args)
-        init_response = requests.post(uri, allow_redirects=False, headers=headers)
-
-        if not init_response.status_code == httplib.TEMPORARY_REDIRECT:
-            _raise_pywebhdfs_exception(
-                init_response.status_code, init_response.content)
-
-        # Get the address provided in the location header of the
-        # initial response from the namenode and make the APPEND request
-        # to the datanode
-        uri = init_response.headers['location']
-        headers['Content-Type'] = 'application/octet-stream'
-        # NOTE! We need to acquire a new ticket otherwise Kerberos will suspect a replay
-        # and reject our next request
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-        response = requests.post(uri, data=file_data, headers=headers)
-
-        if not response.status_code == httplib.OK:
-            _raise_pywebhdfs_exception(response.status_code, response.content)
+        Accepts the location of an APPEND, see create_file
+        """
 
-        return True
+        location = kwargs.pop('location', None)
+        return self._execute(operations.APPEND, path, file_data, kwargs,
+                             location=location)
 
     def read_file(self, path, **kwargs):
         """
@@ -182,6 +179,9 @@ class PyWebHdfsClient(object):
 
         Note: this function follows automatic redirects
 
+        With a content_cache configured, reads of whole files are served
+        from the local cache while the file is unchanged
+
         Example:
 
         >>> hdfs = PyWebHdfsClient(host='host',port='50070', user_name='hdfs')
@@ -191,21 +191,273 @@ class PyWebHdfsClient(object):
         01010101010101010101010101010101
         01010101010101010101010101010101
         01010101010101010101010101010101
+
+        Accepts the location of an OPEN, see create_file
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
+        location = kwargs.pop('location', None)
+        if self.content_cache is not None and not kwargs and \
+                location is None:
+            return self.content_cache.read(self, path)
+        return self._execute(operations.OPEN, path, None, kwargs,
+                             location=location)
 
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.OPEN, **optional_args)
+    def get_data_location(self, path, operation, **kwargs):
+        """
+        Asks the namenode which datanode URL a data operation goes to,
+        without contacting the datanode
+
+        :param path: the HDFS file path without a leading '/'
+        :param operation: operations.CREATE, APPEND or OPEN
+        :returns: the URL to pass as location to create_file,
+        append_file or read_file
+
+        Accepts the optional arguments of the operation. The namenode
+        answers noredirect=true with the URL as JSON: fetching locations
+        ahead overlaps the namenode step of the next file with the
+        transfer of the current one, and a location can be reused to
+        retry a transfer.
+
+        Example:
+
+        >>> location = hdfs.get_data_location('user/hdfs/a.txt',
+        >>>                                   operations.CREATE)
+        >>> hdfs.create_file('user/hdfs/a.txt', data, location=location)
+        """
+
+        return self._execute(operation, path, None, kwargs, locate=True)
+
+    def read_stream(self, path, codec=compression.AUTO,
+                    chunk_size=compression.DEFAULT_CHUNK_SIZE, **kwargs):
+        """
+        Opens a file on HDFS for reading without buffering its content,
+        decompressing it on the fly
+
+        :param path: the HDFS file path without a leading '/'
+        :param codec: compression codec name, a
+        pywebhdfs.compression.Codec, 'auto' to pick it from the file
+        extension or None to read the raw bytes
+        :param chunk_size: bytes read from the network at a time
+
+        Accepts the optional arguments of read_file. Returns a file like
+        object, read it to the end or close it to release the connection.
+
+        Example:
+
+        >>> stream = hdfs.read_stream('user/hdfs/logs/access.log.gz')
+        >>> for chunk in iter(lambda: stream.read(65536), ''):
+        >>>     process(chunk)
+        """
+
+        codec = compression.resolve(codec, path)
+        stream = self._execute(operations.OPEN, path, None, kwargs,
+                               stream=True)
+        if codec is None:
+            return stream
+        return compression.DecompressingReader(stream, codec, chunk_size)
+
+    def read_into(self, path, buffer, offset=0, **kwargs):
+        """
+        Reads a byte range of a file on HDFS straight into a writable
+        buffer, without an intermediate copy of the whole range
+
+        :param path: the HDFS file path without a leading '/'
+        :param buffer: writable buffer of bytes (bytearray, mmap, uint8
+        numpy array, ...), its length is the number of bytes requested
+        :param offset: file offset of the first byte to read
+
+        Returns the number of bytes read, which is less than the size of
+        buffer only at the end of the file.
+
+        Example:
+
+        >>> header = bytearray(512)
+        >>> hdfs.read_into('user/hdfs/data.bin', header)
+        512
+        """
+
+        view = memoryview(buffer)
+        if view.itemsize != 1 or view.ndim != 1:
+            raise ValueError('read_into needs a flat buffer of bytes')
+        size = len(view)
+        if size == 0:
+            return 0
+        kwargs['offset'] = offset
+        kwargs['length'] = size
+        stream = self._execute(operations.OPEN, path, None, kwargs,
+                               stream=True)
+        received = 0
+        try:
+            while received < size:
+                count = stream.readinto(
+                    view[received:received + compression.DEFAULT_CHUNK_SIZE])
+                if not count:
+                    break
+                received += count
+        finally:
+            stream.close()
+        return received
+
+    def read_array(self, path, dtype, shape=None, offset=0,
+                   threads=arrays.DEFAULT_THREADS,
+                   part_size=arrays.DEFAULT_PART_SIZE):
+        """
+        Reads a file of fixed-width binary records into a new NumPy array
+
+        :param path: the HDFS file path without a leading '/'
+        :param dtype: NumPy dtype of the items, e.g. '<f4'
+        :param shape: shape of the array, a first dimension of -1 is
+        derived from the file length. One dimensional by default
+        :param offset: bytes to skip at the start of the file
+        :param threads: number of parallel ranged reads
+        :param part_size: approximate bytes per ranged read
+
+        The array is preallocated from the file length and filled in place
+        by ranged reads cut on record (row) boundaries. Requires numpy.
+
+        Example:
 
-        response = requests.get(uri, allow_redirects=True, headers=headers)
+        >>> hdfs.read_array('user/hdfs/features.bin', '<f4', (-1, 128))
+        """
+
+        return arrays.read_array(self, path, dtype, shape, offset, threads,
+                                 part_size)
+
+    def read_ranges(self, path, ranges, gap=vectored.DEFAULT_GAP,
+                    max_length=vectored.DEFAULT_MAX_LENGTH,
+                    concurrency=bulk.DEFAULT_CONCURRENCY):
+        """
+        Reads many byte ranges of a file, merging nearby ranges into fewer
+        requests
+
+        :param path: the HDFS file path without a leading '/'
+        :param ranges: (offset, length) tuples, in any order
+        :param gap: ranges at most this many bytes apart are read together
+        :param max_length: merged reads are not grown beyond this many bytes
+        :param concurrency: number of merged reads in flight
+
+        Returns a memoryview per range, in the order of ranges, sliced
+        from the buffer of the read that covered it without copying.
+        With metrics the ranges asked for, requests sent and requests
+        saved are counted, see pywebhdfs.vectored.
+
+        Example:
+
+        >>> footer, page = hdfs.read_ranges('user/hdfs/t.parquet',
+        >>>                                 [(1000, 8), (4, 4096)])
+        >>> page.tobytes()
+        """
+
+        return vectored.read_ranges(self, path, ranges, gap, max_length,
+                                    concurrency, self.metrics)
+
+    def download(self, path, local_path, threads=downloads.DEFAULT_THREADS,
+                 part_size=downloads.DEFAULT_PART_SIZE, resume=True,
+                 chunk_size=compression.DEFAULT_CHUNK_SIZE):
+        """
+        Copies a file on HDFS to a local path with parallel ranged reads
+
+        :param path: the HDFS file path without a leading '/'
+        :param local_path: the local file to write, replaced if it exists
+        :param threads: number of parallel ranged reads
+        :param part_size: bytes per ranged read
+        :param resume: continue an interrupted download to local_path
+        :param chunk_size: bytes read from the network and written at a
+        time
+
+        The local file is preallocated and every part is streamed to its
+        offset in chunks as it arrives, without holding the file in memory.
+        Parts
+        on disk are recorded in <local_path>.progress, which is removed
+        once the local file is complete. Returns the number of bytes of
+        the file.
+
+        Example:
+
+        >>> hdfs.download('user/hdfs/big.parquet', '/data/big.parquet')
+        """
+
+        return downloads.download(self, path, local_path, threads,
+                                  part_size, resume, chunk_size)
+
+    def write_stream(self, path, file_data, codec=compression.AUTO,
+                     threads=None, **kwargs):
+        """
+        Creates a new file on HDFS from a string or file like object,
+        compressing it while it is uploaded
+
+        :param path: the HDFS file path without a leading '/'
+        :param file_data: string or file like object with the uncompressed
+        data
+        :param codec: compression codec name, a
+        pywebhdfs.compression.Codec, 'auto' to pick it from the file
+        extension or None to upload the data as is
+        :param threads: compress blocks of the data on this many threads
+
+        Accepts the optional arguments of create_file. The compressed data
+        is sent with chunked transfer encoding and never held in memory
+        as a whole.
+
+        Example:
+
+        >>> with open('access.log') as log:
+        >>>     hdfs.write_stream('user/hdfs/logs/access.log.gz', log,
+        >>>                       threads=4)
+        """
 
-        if not response.status_code == httplib.OK:
-            _raise_pywebhdfs_exception(response.status_code, response.content)
+        codec = compression.resolve(codec, path)
+        if codec is not None:
+            file_data = compression.CompressingReader(
+                file_data, codec, threads=threads)
+        return self._execute(operations.CREATE, path, file_data, kwargs)
 
-        return response.content
+    def get_splits(self, path, split_size=None):
+        """
+        Computes input splits for processing a file in parallel
+
+        :param path: the HDFS file path without a leading '/'
+        :param split_size: bytes per split, the file's block size by default
+
+        Returns a list of (offset, length) tuples for iter_lines. The last
+        split may be up to 10% larger than split_size, compressed files
+        come back as a single split.
+
+        Example:
+
+        >>> splits = hdfs.get_splits('user/hdfs/events.log')
+        [(0, 134217728), (134217728, 134217728), (268435456, 52428800)]
+        """
+
+        return splits.get_splits(self, path, split_size)
+
+    def iter_lines(self, path, split=None, delimiter=splits.DEFAULT_DELIMITER,
+                   codec=compression.AUTO,
+                   chunk_size=compression.DEFAULT_CHUNK_SIZE):
+        """
+        Iterates over the lines (or delimited records) of a file on HDFS or
+        of one split of it, reading the data with ranged requests
+
+        :param path: the HDFS file path without a leading '/'
+        :param split: (offset, length) split from get_splits, the whole file
+        by default
+        :param delimiter: record delimiter, a newline by default
+        :param codec: compression codec, see read_stream. Compressed files
+        can only be read whole
+        :param chunk_size: bytes read from the network at a time
+
+        Records are assigned to splits like Hadoop's LineRecordReader does,
+        so iterating over every split of a file yields every record once.
+        Lines are returned without their delimiter.
+
+        Example:
+
+        >>> for line in hdfs.iter_lines('user/hdfs/events.log',
+        >>>                             split=(134217728, 134217728)):
+        >>>     process(line)
+        """
+
+        return splits.iter_records(self, path, split, delimiter, codec,
+                                   chunk_size)
 
     def make_dir(self, path, **kwargs):
         """
@@ -230,19 +482,7 @@ class PyWebHdfsClient(object):
         >>> hdfs.make_dir(my_dir, permission=755)
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.MKDIRS, **optional_args)
-
-        response = requests.put(uri, allow_redirects=True, headers=headers)
-
-        if not response.status_code == httplib.OK:
-            _raise_pywebhdfs_exception(response.status_code, response.content)
-
-        return True
+        return self._execute(operations.MKDIRS, path, None, kwargs)
 
     def rename_file_dir(self, path, destination_path, **kwargs):
         """
@@ -263,21 +503,9 @@ class PyWebHdfsClient(object):
         >>> hdfs.rename_file_dir(current_dir, destination_dir)
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
         optional_args = kwargs
-        uri = self._create_uri(path, operations.RENAME,
-                               destination=destination_path,
-                               **optional_args)
-
-        response = requests.put(uri, allow_redirects=True, headers=headers)
-
-        if not response.status_code == httplib.OK:
-            _raise_pywebhdfs_exception(response.status_code, response.content)
-
-        return True
+        optional_args['destination'] = destination_path
+        return self._execute(operations.RENAME, path, None, optional_args)
 
     def delete_file_dir(self, path, recursive=False, **kwargs):
         """
@@ -302,18 +530,9 @@ class PyWebHdfsClient(object):
         >>> hdfs.delete_file_dir(my_file, recursive=True)
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
         optional_args = kwargs
-        uri = self._create_uri(path, operations.DELETE, recursive=recursive, **optional_args)
-        response = requests.delete(uri, allow_redirects=True, headers=headers)
-
-        if not response.status_code == httplib.OK:
-            _raise_pywebhdfs_exception(response.status_code, response.content)
-
-        return True
+        optional_args['recursive'] = recursive
+        return self._execute(operations.DELETE, path, None, optional_args)
 
     def get_file_dir_status(self, path, **kwargs):
         """
@@ -365,18 +584,7 @@ class PyWebHdfsClient(object):
         }
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.GETFILESTATUS, **optional_args)
-        response = requests.get(uri, allow_redirects=True, headers=headers)
-
-        if not response.status_code == httplib.OK:
-            _raise_pywebhdfs_exception(response.status_code, response.content)
-
-        return response.json()
+        return self._execute(operations.GETFILESTATUS, path, None, kwargs)
 
     def list_dir(self, path, **kwargs):
         """
@@ -426,18 +634,7 @@ class PyWebHdfsClient(object):
 
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
-        optional_args = kwargs
-        uri = self._create_uri(path, operations.LISTSTATUS, **optional_args)
-        response = requests.get(uri, allow_redirects=True, headers=headers)
-
-        if not response.status_code == httplib.OK:
-            _raise_pywebhdfs_exception(response.status_code, response.content)
-
-        return response.json()
+        return self._execute(operations.LISTSTATUS, path, None, kwargs)
 
     def set_owner(self, path, owner, group, **kwargs):
         """
@@ -450,62 +647,472 @@ class PyWebHdfsClient(object):
 
         """
 
-        headers = dict()
-        if self.krb_instance:
-            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
-
         optional_args = kwargs
         optional_args['owner'] = owner
         optional_args['group'] = group
-        uri = self._create_uri(path, operations.SETOWNER, **optional_args)
-        response = requests.put(uri, allow_redirects=True, headers=headers)
+        return self._execute(operations.SETOWNER, path, None, optional_args)
+
+    def get_content_summary(self, path, **kwargs):
+        """
+        Get the totals of a directory tree computed by the namenode
+
+        :param path: the HDFS file path without a leading '/'
+        :return: pywebhdfs.usage.ContentSummary
+
+        The function wraps the WebHDFS REST call:
+
+        GET http://<HOST>:<PORT>/webhdfs/v1/<PATH>?op=GETCONTENTSUMMARY
+
+        Example:
+
+        >>> summary = hdfs.get_content_summary('user/hdfs/warehouse')
+        >>> summary.length, summary.file_count, summary.space_consumed
+        """
+
+        return usage.ContentSummary.from_json(self._execute(
+            operations.GETCONTENTSUMMARY, path, None, kwargs))
+
+    def get_quota_usage(self, path, **kwargs):
+        """
+        Get the namespace and space usage of a directory tree against its
+        quotas
+
+        :param path: the HDFS file path without a leading '/'
+        :return: pywebhdfs.usage.QuotaUsage
+
+        The function wraps the WebHDFS REST call:
+
+        GET http://<HOST>:<PORT>/webhdfs/v1/<PATH>?op=GETQUOTAUSAGE
+
+        Unlike GETCONTENTSUMMARY the namenode does not need to count files
+        and directories separately, which is cheaper on large trees.
+        """
+
+        return usage.QuotaUsage.from_json(self._execute(
+            operations.GETQUOTAUSAGE, path, None, kwargs))
+
+    def du(self, path, concurrency=bulk.DEFAULT_CONCURRENCY):
+        """
+        Gets the space used by every child of a directory
+
+        :param path: the HDFS directory path without a leading '/'
+        :param concurrency: maximum number of calls in flight
+
+        The directory is listed once and the content summaries of its
+        subdirectories are fetched in parallel. Returns the sorted
+        (path, pywebhdfs.usage.ContentSummary) of every child.
+
+        Example:
+
+        >>> for child, summary in hdfs.du('user/hdfs/warehouse'):
+        >>>     print child, summary.length
+        """
 
-        if not response.status_code == httplib.OK:
-            _raise_pywebhdfs_exception(response.status_code, response.content)
+        disk_usage = usage.DiskUsage(path)
+        tasks = disk_usage.tasks
+        while tasks:
+            outcomes = bulk.run(
+                lambda task: self._execute(task[0], task[1], None, {}),
+                tasks, concurrency)
+            tasks = disk_usage.resolve(tasks, outcomes)
+        return disk_usage.entries
+
+    def status_many(self, paths, concurrency=bulk.DEFAULT_CONCURRENCY,
+                    list_threshold=bulk.LIST_THRESHOLD,
+                    list_ratio=bulk.LIST_RATIO):
+        """
+        Gets the status of many files and directories
 
-        return True
+        :param paths: HDFS paths without a leading '/'
+        :param concurrency: maximum number of calls in flight
+        :param list_threshold: number of requested paths in one directory
+        from which the directory may be listed once instead of getting the
+        status of each path, None to always get the status of each path
+        :param list_ratio: share of the directory's children the requested
+        paths must make up for it to be listed, checked with a status call
+        of the directory; None lists without checking
+
+        Returns a pywebhdfs.bulk.BulkResult per path, in order, holding the
+        get_file_dir_status result or the exception raised for the path,
+        whichever call was used. Repeated paths are fetched once.
+
+        Example:
+
+        >>> results = hdfs.status_many(['user/hdfs/a.txt', 'user/hdfs/b.txt'])
+        >>> sizes = dict((r.path, r.result['FileStatus']['length'])
+        >>>              for r in results if r.ok)
+        """
+
+        batch = bulk.path_batch(paths)
+        lookup = bulk.StatusLookup(batch.tasks, list_threshold, list_ratio)
+        tasks = lookup.tasks
+        while tasks:
+            outcomes = bulk.run(
+                lambda task: self._execute(task[0], task[1], None, {}),
+                tasks, concurrency)
+            tasks = lookup.resolve(tasks, outcomes)
+        return batch.results(lookup.outcomes)
+
+    def glob(self, pattern, concurrency=bulk.DEFAULT_CONCURRENCY):
+        """
+        Finds the files and directories matching a glob pattern
+
+        :param pattern: path pattern, see pywebhdfs.globbing for the syntax
+        :param concurrency: maximum number of calls in flight
+
+        Literal components are never listed and only directories matching
+        the pattern so far are listed, those of one level in parallel.
+        Returns the sorted matching paths.
+
+        Example:
+
+        >>> hdfs.glob('data/2026/*/events/part-*.gz')
+        ['data/2026/01/events/part-00000.gz', ...]
+        """
+
+        expansion = globbing.Glob(pattern)
+        tasks = expansion.tasks
+        while tasks:
+            outcomes = bulk.run(
+                lambda task: self._execute(task[0], task[1], None, {}),
+                tasks, concurrency)
+            tasks = expansion.resolve(tasks, outcomes)
+        return expansion.matches
+
+    def make_dirs_many(self, paths, concurrency=bulk.DEFAULT_CONCURRENCY,
+                       **kwargs):
+        """
+        Creates many directories, see make_dir
+
+        Directories that are parents of another directory of the batch are
+        created by its MKDIRS call and not requested separately. Returns a
+        BulkResult per path, see status_many.
+        """
+
+        batch = bulk.make_dirs_batch(paths)
+        return batch.results(bulk.run(
+            lambda path: self.make_dir(path, **kwargs), batch.tasks,
+            concurrency))
+
+    def rename_many(self, pairs, concurrency=bulk.DEFAULT_CONCURRENCY,
+                    **kwargs):
+        """
+        Renames many files or directories, see rename_file_dir
+
+        :param pairs: (path, destination_path) tuples
+
+        Returns a BulkResult per pair reporting the source path, see
+        status_many.
+        """
+
+        batch = bulk.rename_batch(pairs)
+        return batch.results(bulk.run(
+            lambda pair: self.rename_file_dir(pair[0], pair[1], **kwargs),
+            batch.tasks, concurrency), name=lambda pair: pair[0])
+
+    def delete_many(self, paths, recursive=False,
+                    concurrency=bulk.DEFAULT_CONCURRENCY, **kwargs):
+        """
+        Deletes many files or directories, see delete_file_dir
+
+        With recursive=True paths below another path of the batch are
+        removed by the delete of that path and not requested separately.
+        Returns a BulkResult per path, see status_many.
+        """
+
+        batch = bulk.delete_batch(paths, recursive)
+        return batch.results(bulk.run(
+            lambda path: self.delete_file_dir(path, recursive, **kwargs),
+            batch.tasks, concurrency))
+
+    def set_owner_many(self, paths, owner, group,
+                       concurrency=bulk.DEFAULT_CONCURRENCY, **kwargs):
+        """
+        Sets the owner and group of many paths, see set_owner
+
+        Returns a BulkResult per path, see status_many.
+        """
+
+        batch = bulk.path_batch(paths)
+        return batch.results(bulk.run(
+            lambda path: self.set_owner(path, owner, group, **kwargs),
+            batch.tasks, concurrency))
+
+    def upload_many(self, files, concurrency=uploads.DEFAULT_CONCURRENCY,
+                    **kwargs):
+        """
+        Creates many files, overlapping the namenode step of upcoming
+        files with the transfer of earlier ones
+
+        :param files: (path, source) pairs or a {path: source} dict, a
+        source is the data of the file or a uploads.LocalFile
+        :param concurrency: number of locations fetched and of files sent
+        at a time
+
+        Accepts the optional arguments of create_file. Locations are
+        fetched by concurrency threads at most concurrency files ahead of
+        the transfers, which run on concurrency threads each keeping its
+        connections open. Returns an uploads.UploadReport with a
+        BulkResult per file.
+
+        Example:
+
+        >>> report = hdfs.upload_many(
+        >>>     {'user/hdfs/in/a.json': '{"a": 1}',
+        >>>      'user/hdfs/in/b.csv': LocalFile('/tmp/b.csv')},
+        >>>     overwrite=True)
+        >>> print report.files_per_second
+        """
+
+        items = uploads.upload_items(files)
+        started = time.time()
+        outcomes = [None] * len(items)
+        sizes = [0] * len(items)
+        pending = iter(enumerate(items))
+        pending_lock = threading.Lock()
+        # locations fetched ahead of the transfers
+        located = Queue.Queue(maxsize=max(concurrency, 1))
+
+        def locate(session):
+            while True:
+                with pending_lock:
+                    entry = next(pending, None)
+                if entry is None:
+                    return
+                index, (path, _) = entry
+                try:
+                    located.put((index, self._execute(
+                        operations.CREATE, path, None, kwargs, locate=True,
+                        session=session), None))
+                except Exception as e:
+                    located.put((index, None, e))
+
+        def transfer(session):
+            for index, location, error in iter(located.get, None):
+                if error is not None:
+                    outcomes[index] = (None, error)
+                    continue
+                path, source = items[index]
+                try:
+                    data = uploads.open_source(source)
+                    try:
+                        sizes[index] = uploads.data_size(data)
+                        outcomes[index] = (self._execute(
+                            operations.CREATE, path, data, kwargs,
+                            location=location, session=session), None)
+                    finally:
+                        uploads.close_source(source, data)
+                except Exception as e:
+                    outcomes[index] = (None, e)
+
+        def run(stage):
+            session = requests.Session()
+            try:
+                stage(session)
+            finally:
+                session.close()
+
+        workers = min(max(concurrency, 1), len(items))
+        locators = [threading.Thread(target=run, args=(locate,))
+                    for _ in xrange(workers)]
+        transfers = [threading.Thread(target=run, args=(transfer,))
+                     for _ in xrange(workers)]
+        for thread in locators + transfers:
+            thread.daemon = True
+            thread.start()
+        for thread in locators:
+            thread.join()
+        for _ in transfers:
+            located.put(None)
+        for thread in transfers:
+            thread.join()
+        return uploads.report(items, outcomes, sizes, started,
+                              self.metrics)
+
+    def _execute(self, operation, path, data, params, stream=False,
+                 location=None, locate=False, session=None):
+        """
+        internal function driving a protocol Call of the operation with
+        requests, on session when given so its connections are reused
+        """
+        call = self._protocol.call(operation, path, data, params,
+                                   self._timer(operation),
+                                   self._span(operation, path), stream,
+                                   location, locate)
+        try:
+            with call:
+                request = call.start()
+                while request is not None:
+                    if call.pause:
+                        time.sleep(call.pause)
+                    # NOTE! We need to acquire a new ticket for every request
+                    # otherwise Kerberos will suspect a replay and reject it
+                    self._authorize(request.headers, call.span)
+                    call.sending()
+                    try:
+                        response = self._send(request, call, session)
+                    except RequestException as e:
+                        request = call.fail(e)
+                        if request is None:
+                            raise
+                        continue
+                    request = call.receive(response)
+                if call.pause:
+                    time.sleep(call.pause)
+        finally:
+            # even a failed call may have been applied
+            if self.content_cache is not None and not locate and \
+                    operation in CONTENT_CHANGES:
+                self.content_cache.invalidate(self, path)
+                if 'destination' in params:
+                    self.content_cache.invalidate(self, params['destination'])
+        return call.result
+
+    @staticmethod
+    def _send(request, call, session=None):
+        """
+        internal function sending a protocol Request of the call with
+        requests
+        """
+        send = getattr(session or requests, request.method.lower())
+        options = {'headers': request.headers}
+        if request.timeout is not None:
+            options['timeout'] = request.timeout
+        body = request.body
+        if body is not None and (hasattr(body, 'read') or
+                                 not hasattr(body, '__len__')):
+            # file like objects and iterators are counted as they are sent
+            body = _MeteredBody(body, call.sent)
+        if body is not None:
+            response = send(request.uri, data=body, **options)
+        elif request.stream:
+            response = send(request.uri,
+                            allow_redirects=request.follow_redirects,
+                            stream=True, **options)
+        else:
+            response = send(request.uri,
+                            allow_redirects=request.follow_redirects,
+                            **options)
+        connect, ttfb = requests_timings(response) if call.traced \
+            else (None, None)
+        if request.stream and response.status_code == httplib.OK:
+            response.raw.decode_content = True
+            body = _MeteredStream(response.raw, call.received)
+        else:
+            body = response.content
+        return Response(response.status_code, response.headers, body,
+                        response.json, connect, ttfb)
+
+    def _timer(self, operation):
+        """
+        internal function returning the metrics context manager for a call
+        of the operation, a no-op when metrics are disabled
+        """
+        if self.metrics is None:
+            return NULL_TIMER
+        return self.metrics.timer(operation)
+
+    def _span(self, operation, path):
+        """
+        internal function returning the tracing span for a call of the
+        operation, a no-op when tracing is disabled
+        """
+        if self.tracer is None:
+            return NULL_SPAN
+        return Span(self.tracer, operation, path)
+
+    def _authorize(self, headers, span):
+        """
+        internal function adding a fresh Kerberos ticket to the headers
+        """
+        if self.krb_instance:
+            start = time.time()
+            headers['Authorization'] = self.krb_instance.acquire_kerberos_ticket(self.krb_primary, self.host)
+            span.auth(time.time() - start)
 
     def _create_uri(self, path, operation, **kwargs):
         """
         internal function used to construct the WebHDFS request uri based on
         the <PATH>, <OPERATION>, and any provided optional arguments
         """
+        return self._protocol.create_uri(path, operation, kwargs)
+
+
+class _MeteredBody(object):
+    """
+    Streamed request body (a file like object or an iterable of chunks)
+    reporting the size of every chunk to on_chunk as requests sends it,
+    and sleeping for the seconds on_chunk returns
+    """
+
+    def __init__(self, body, on_chunk,
+                 chunk_size=compression.DEFAULT_CHUNK_SIZE):
+        self.body = body
+        self.on_chunk = on_chunk
+        self.chunk_size = chunk_size
+        length = super_len(body) if hasattr(body, 'read') else 0
+        if length:
+            # found by requests, which then sends a Content-Length instead
+            # of a chunked body
+            self.len = length
+
+    def read(self, size=-1):
+        data = self.body.read(size)
+        if data:
+            _pause(self.on_chunk(len(data)))
+        return data
+
+    def __iter__(self):
+        if hasattr(self.body, 'read'):
+            chunks = iter(lambda: self.body.read(self.chunk_size), '')
+        else:
+            chunks = iter(self.body)
+        for chunk in chunks:
+            _pause(self.on_chunk(len(chunk)))
+            yield chunk
+
+
+class _MeteredStream(object):
+    """
+    Streamed response body reporting the size of every chunk read from raw
+    to on_chunk, and sleeping for the seconds on_chunk returns
+    """
+
+    def __init__(self, raw, on_chunk):
+        self.raw = raw
+        self.on_chunk = on_chunk
+
+    def read(self, size=-1):
+        data = self.raw.read(None if size is None or size < 0 else size)
+        if data:
+            _pause(self.on_chunk(len(data)))
+        return data
 
-        path_param = path
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        if count:
+            _pause(self.on_chunk(count))
+        return count
 
-        # setup the parameter represent the WebHDFS operation
-        operation_param = '?op={operation}'.format(operation=operation)
+    def close(self):
+        self.raw.close()
 
-        # configure authorization based on provided credentials
-        auth_param = str()
-        if self.user_name:
-            auth_param = '&user.name={user_name}'.format(
-                user_name=self.user_name)
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
 
-        # setup any optional parameters
-        keyword_params = str()
-        for key in kwargs:
-            keyword_params = '{params}&{key}={value}'.format(
-                params=keyword_params, key=key, value=str(kwargs[key]).lower())
+    def __enter__(self):
+        return self
 
-        # build the complete uri from the base uri and all configured params
-        uri = '{base_uri}{path}{operation}{keyword_args}{auth}'.format(
-            base_uri=self.base_uri, path=path_param,
-            operation=operation_param, keyword_args=keyword_params,
-            auth=auth_param)
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
 
-        return uri
 
+def _pause(seconds):
+    if seconds:
+        time.sleep(seconds)
 
-def _raise_pywebhdfs_exception(resp_code, message=None):
 
-    if resp_code == httplib.BAD_REQUEST:
-        raise errors.BadRequest(msg=message)
-    elif resp_code == httplib.UNAUTHORIZED:
-        raise errors.Unauthorized(msg=message)
-    elif resp_code == httplib.NOT_FOUND:
-        raise errors.FileNotFound(msg=message)
-    elif resp_code == httplib.METHOD_NOT_ALLOWED:
-        raise errors.MethodNotAllowed(msg=message)
-    else:
-        raise errors.PyWebHdfsException(msg=message)
+# kept for callers importing it from here, the status mapping now lives in
+# pywebhdfs.protocol
+_raise_pywebhdfs_exception = raise_for_status
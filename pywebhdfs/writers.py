@@ -0,0 +1,518 @@
+"""
+Background writers batching records into HDFS files
+
+RollingWriter takes records from producer threads and writes them from a
+background thread, so producers never wait on HDFS unless the queue is
+full:
+
+    >>> writer = RollingWriter(hdfs, 'logs/app/{time:%Y%m%d}/{sequence}.log',
+    >>>                        max_bytes=128 * 2 ** 20, max_age=300)
+    >>> writer.write('GET /index.html 200\\n')    # on the request thread
+    >>> writer.close()                            # drains the queue
+
+Records are byte strings written as they are, include the delimiter.
+The worker collects records until batch_bytes are queued or
+flush_interval seconds passed since the first one, then writes the batch
+with append_file, or with create_file when a new file is started. A new
+file is started once the current one holds max_bytes or is max_age
+seconds old.
+
+A failed write is retried after retry_interval seconds, at most
+max_attempts times (None retries for ever); errors that cannot go away
+(bad request, unauthorized, not found) are not retried. A failed create
+and a failed append move on to the next file name, a file a write may
+have been applied to in part is never appended to again.
+A batch that could not be written fails the writer: its error is raised
+by flush(), close() and later calls to write(), and the records queued
+behind it are discarded.
+With a metrics registry the writer reports its queue depth as the
+<name>_queue_depth gauge and the duration of every batch write in the
+<name>_flush_seconds histogram.
+
+PartitionedWriter fans records out to one file per partition, e.g. per
+date, hour and customer, buffering them in memory:
+
+    >>> writer = PartitionedWriter(
+    >>>     hdfs, 'events/date={date}/hour={hour}/{customer}-{sequence}.json',
+    >>>     memory_budget=256 * 2 ** 20, max_open=200, threads=16,
+    >>>     manifest='events/_manifest.json')
+    >>> writer.write({'date': '2026-10-18', 'hour': 7, 'customer': 'acme'},
+    >>>              '{"event": "click"}\n')
+    >>> writer.close()
+
+A partition's buffer is written once it holds partition_bytes. When all
+buffers together exceed memory_budget the largest ones are written until
+half of the budget is free. Buffers are written by up to threads calls at
+a time. At most max_open partitions have an open file that is appended
+to; opening one more first finishes the least recently written one, which
+gets a new file (the next sequence number) if it receives records again.
+The manifest lists every file written with its partition, record count
+and size.
+"""
+import datetime
+import json
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+from Queue import Empty, Queue
+
+from pywebhdfs import errors
+
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+DEFAULT_BATCH_BYTES = 1024 * 1024
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_MAX_ATTEMPTS = 10
+
+# errors a RollingWriter does not retry
+PERMANENT_ERRORS = (errors.BadRequest, errors.Unauthorized,
+                    errors.FileNotFound, errors.MethodNotAllowed)
+
+DEFAULT_PARTITION_BYTES = 8 * 1024 * 1024
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+DEFAULT_MAX_OPEN = 128
+DEFAULT_THREADS = 8
+
+
+class _Marker(object):
+    """
+    Flush or close request travelling through the queue behind the records
+    queued before it
+    """
+
+    def __init__(self, close=False):
+        self.close = close
+        self.done = threading.Event()
+
+
+class RollingWriter(object):
+    """
+    Writes queued records to a sequence of HDFS files
+
+    path is a str.format template receiving the start time of the file as
+    time (a UTC datetime) and a sequence number counting the files of the
+    writer, or a callable taking both and returning the path.
+    """
+
+    def __init__(self, hdfs, path, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age=None, batch_bytes=DEFAULT_BATCH_BYTES,
+                 flush_interval=1.0, queue_size=DEFAULT_QUEUE_SIZE,
+                 retry_interval=1.0, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 metrics=None, name='rolling_writer', **create_kwargs):
+        self.hdfs = hdfs
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_attempts = max_attempts
+        self.metrics = metrics
+        self.name = name
+        self.create_kwargs = create_kwargs
+
+        self.files = []
+        self.records_written = 0
+        self.bytes_written = 0
+        self.last_error = None
+        # the error of a batch that was given up on, fails the writer
+        self.error = None
+
+        self._queue = Queue(queue_size)
+        self._closed = False
+        self._sequence = 0
+        self._current = None
+        self._current_bytes = 0
+        self._current_started = None
+        self._thread = threading.Thread(target=self._run,
+                                        name='pywebhdfs-' + name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, record, timeout=None):
+        """
+        queue a record, blocking while the queue is full (at most timeout
+        seconds, then Queue.Full is raised)
+        """
+        if self._closed:
+            raise ValueError('write to a closed writer')
+        self._raise_error()
+        self._queue.put(record, True, timeout)
+        self._report_depth()
+
+    def flush(self, timeout=None):
+        """
+        wait until every record queued so far is written, returns False if
+        that did not happen within timeout seconds
+        """
+        if self._closed:
+            raise ValueError('flush of a closed writer')
+        marker = _Marker()
+        self._queue.put(marker)
+        done = marker.done.wait(timeout)
+        self._raise_error()
+        return done
+
+    def close(self, timeout=None):
+        """
+        write the queued records and stop the worker; returns False if the
+        queue was not drained within timeout seconds
+        """
+        if self._closed:
+            return not self._thread.is_alive()
+        self._closed = True
+        marker = _Marker(close=True)
+        self._queue.put(marker)
+        self._thread.join(timeout)
+        self._raise_error()
+        return not self._thread.is_alive()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _run(self):
+        batch = []
+        size = 0
+        deadline = None
+        while True:
+            try:
+                timeout = None if deadline is None else \
+                    max(0.0, deadline - time.time())
+                item = self._queue.get(True, timeout)
+            except Empty:
+                item = None
+
+            if item is not None and not isinstance(item, _Marker):
+                if not batch:
+                    deadline = time.time() + self.flush_interval
+                batch.append(item)
+                size += len(item)
+                if size < self.batch_bytes:
+                    continue
+
+            if batch:
+                self._write_batch(batch, size)
+                batch = []
+                size = 0
+                deadline = None
+            self._report_depth()
+            if isinstance(item, _Marker):
+                item.done.set()
+                if item.close:
+                    return
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def _write_batch(self, batch, size):
+        if self.error is not None:
+            return
+        data = ''.join(batch)
+        attempts = 0
+        while True:
+            attempts += 1
+            started = time.time()
+            try:
+                self._write(data)
+            except (errors.PyWebHdfsException, IOError) as e:
+                self.last_error = e
+                if isinstance(e, PERMANENT_ERRORS) or \
+                        (self.max_attempts is not None and
+                         attempts >= self.max_attempts):
+                    self.error = e
+                    return
+            else:
+                break
+            time.sleep(self.retry_interval)
+
+        if self.metrics is not None:
+            self.metrics.observe(self.name + '_flush_seconds',
+                                 time.time() - started)
+        self.records_written += len(batch)
+        self.bytes_written += size
+
+    def _write(self, data):
+        now = time.time()
+        if self._current is not None and (
+                self._current_bytes >= self.max_bytes or
+                (self.max_age is not None and
+                 now - self._current_started >= self.max_age)):
+            self._current = None
+
+        if self._current is None:
+            path = self._next_path(now)
+            try:
+                self.hdfs.create_file(path, data, **self.create_kwargs)
+            finally:
+                # after a failure the file may exist half written, the
+                # retry never appends to it
+                self._sequence += 1
+            self.files.append(path)
+            self._current = path
+            self._current_started = now
+            self._current_bytes = len(data)
+        else:
+            try:
+                self.hdfs.append_file(self._current, data)
+            except BaseException:
+                # the append may have been applied in part (or in full,
+                # after a timeout), the retry goes to a new file
+                self._current = None
+                raise
+            self._current_bytes += len(data)
+
+    def _next_path(self, now):
+        started = datetime.datetime.utcfromtimestamp(now)
+        if callable(self.path):
+            return self.path(started, self._sequence)
+        return self.path.format(time=started, sequence=self._sequence)
+
+    def _report_depth(self):
+        if self.metrics is not None:
+            self.metrics.set_gauge(self.name + '_queue_depth',
+                                   self._queue.qsize())
+
+
+class _Partition(object):
+    """
+    Buffer and current file of one partition of a PartitionedWriter
+    """
+
+    __slots__ = ('values', 'records', 'size', 'path', 'sequence')
+
+    def __init__(self, values):
+        self.values = values
+        self.records = []
+        self.size = 0
+        self.path = None
+        self.sequence = 0
+
+
+class PartitionedWriter(object):
+    """
+    Writes records to one HDFS file per partition
+
+    path is a str.format template receiving the values of the partition
+    (a dict) and sequence, the number of files the partition got so far,
+    or a callable taking both and returning the path. write() is thread
+    safe; the calls writing buffers run in the thread of the write (or
+    flush) that triggered them, which blocks producers while HDFS catches
+    up. A failed write is raised by that call with the records kept in
+    their buffer, the next flush retries them.
+    """
+
+    def __init__(self, hdfs, path, partition_bytes=DEFAULT_PARTITION_BYTES,
+                 memory_budget=DEFAULT_MEMORY_BUDGET,
+                 max_open=DEFAULT_MAX_OPEN, threads=DEFAULT_THREADS,
+                 manifest=None, metrics=None, name='partitioned_writer',
+                 **create_kwargs):
+        self.hdfs = hdfs
+        self.path = path
+        self.partition_bytes = partition_bytes
+        self.memory_budget = memory_budget
+        self.max_open = max(1, max_open)
+        self.threads = threads
+        self.manifest = manifest
+        self.metrics = metrics
+        self.name = name
+        self.create_kwargs = create_kwargs
+
+        self.files = OrderedDict()
+        self.buffered_bytes = 0
+        self._partitions = dict()
+        # open partitions, least recently written first
+        self._open = OrderedDict()
+        self._lock = threading.RLock()
+        # guards files and buffered_bytes, updated by the pool threads
+        # while the thread that started the flush holds _lock
+        self._files_lock = threading.Lock()
+        self._pool = None
+        self._closed = False
+
+    def write(self, partition, record):
+        """
+        buffer a record of the partition, a dict of the values filling the
+        path template
+        """
+        key = tuple(sorted(partition.items()))
+        with self._lock:
+            if self._closed:
+                raise ValueError('write to a closed writer')
+            state = self._partitions.get(key)
+            if state is None:
+                state = _Partition(dict(partition))
+                self._partitions[key] = state
+            state.records.append(record)
+            state.size += len(record)
+            self.buffered_bytes += len(record)
+
+            if state.size >= self.partition_bytes:
+                self._flush([key])
+            if self.buffered_bytes > self.memory_budget:
+                self._flush(self._largest(self.memory_budget // 2))
+            self._report()
+
+    def flush(self):
+        """
+        write every buffered record
+        """
+        with self._lock:
+            self._flush([key for key, state in self._partitions.items()
+                         if state.records])
+            self._report()
+
+    def close(self):
+        """
+        write every buffered record and the manifest, returns the manifest
+        entries
+        """
+        with self._lock:
+            if not self._closed:
+                self.flush()
+                self._closed = True
+                self._open.clear()
+                if self._pool is not None:
+                    self._pool.terminate()
+                    self._pool.join()
+                    self._pool = None
+                if self.manifest is not None:
+                    self.hdfs.create_file(self.manifest, json.dumps(
+                        self.manifest_entries(), sort_keys=True),
+                        overwrite=True)
+            return self.manifest_entries()
+
+    def manifest_entries(self):
+        with self._files_lock:
+            return [dict(entry) for entry in self.files.values()]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        return False
+
+    def _largest(self, target):
+        """
+        partitions to write, largest buffer first, to get the buffered
+        bytes down to target
+        """
+        keys = []
+        remaining = self.buffered_bytes
+        for size, key in sorted(((state.size, key) for key, state in
+                                 self._partitions.items() if state.records),
+                                reverse=True):
+            if remaining <= target:
+                break
+            keys.append(key)
+            remaining -= size
+        return keys
+
+    def _flush(self, keys):
+        for start in xrange(0, len(keys), self.max_open):
+            self._flush_group(keys[start:start + self.max_open])
+
+    def _flush_group(self, keys):
+        """
+        write the buffers of at most max_open partitions, finishing the
+        least recently written open partitions to make room
+        """
+        opening = sum(1 for key in keys if key not in self._open)
+        excess = len(self._open) + opening - self.max_open
+        finished = []
+        if excess > 0:
+            finished = [key for key in self._open if key not in keys][:excess]
+        tasks = list(keys) + [key for key in finished
+                              if self._partitions[key].records]
+
+        started = time.time()
+        outcomes = self._run(self._write_partition, tasks)
+        if self.metrics is not None:
+            self.metrics.observe(self.name + '_flush_seconds',
+                                 time.time() - started)
+
+        for key in finished:
+            self._open.pop(key, None)
+            self._partitions[key].path = None
+        failure = None
+        for key, error in zip(tasks, outcomes):
+            if key in finished:
+                if error is not None and failure is None:
+                    failure = error
+                continue
+            if error is None:
+                self._open.pop(key, None)
+                self._open[key] = True
+            elif failure is None:
+                failure = error
+        if failure is not None:
+            raise failure
+
+    def _write_partition(self, key):
+        """
+        write the buffer of one partition, runs in the pool
+        """
+        state = self._partitions[key]
+        records = state.records
+        data = ''.join(records)
+        if state.path is None:
+            path = self._partition_path(state)
+            try:
+                self.hdfs.create_file(path, data, **self.create_kwargs)
+            finally:
+                # after a failure the file may exist half written, the
+                # retry never appends to it
+                state.sequence += 1
+            state.path = path
+        else:
+            self.hdfs.append_file(state.path, data)
+
+        with self._files_lock:
+            entry = self.files.get(state.path)
+            if entry is None:
+                entry = {'path': state.path, 'partition': state.values,
+                         'records': 0, 'bytes': 0}
+                self.files[state.path] = entry
+            entry['records'] += len(records)
+            entry['bytes'] += len(data)
+            state.records = []
+            state.size = 0
+            self.buffered_bytes -= len(data)
+
+    def _partition_path(self, state):
+        if callable(self.path):
+            return self.path(state.values, state.sequence)
+        values = dict(state.values)
+        values['sequence'] = state.sequence
+        return self.path.format(**values)
+
+    def _run(self, function, tasks):
+        """
+        the exception (or None) of function(task) for every task
+        """
+        def attempt(task):
+            try:
+                function(task)
+            except Exception as e:
+                return e
+            return None
+
+        if self.threads <= 1 or len(tasks) <= 1:
+            return [attempt(task) for task in tasks]
+        if self._pool is None:
+            self._pool = ThreadPool(self.threads)
+        return self._pool.map(attempt, tasks, chunksize=1)
+
+    def _report(self):
+        if self.metrics is not None:
+            self.metrics.set_gauge(self.name + '_buffered_bytes',
+                                   self.buffered_bytes)
+            self.metrics.set_gauge(self.name + '_open_partitions',
+                                   len(self._open))
@@ -24,6 +24,11 @@ setup(
         "requests",
         "tornado"
     ],
+    extras_require={
+        "numpy": ["numpy"],
+        "snappy": ["python-snappy"],
+        "zstd": ["zstandard"]
+    },
     test_suite='nose.collector',
     zip_safe=False,
     include_package_data=True,